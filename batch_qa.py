@@ -0,0 +1,48 @@
+"""
+Answers the questions of a JSON lines file with the RAG pipeline and writes the answers, the retrieved sources
+and per-item timings to a JSON lines file.
+
+Every input line is a JSON object with a 'question' and an optional 'id'. Pass --stub-llm to run offline with
+a deterministic fake chat model instead of the Groq API.
+
+Usage:
+    python batch_qa.py questions.jsonl answers.jsonl --concurrency 8 --batch-size 32
+    python batch_qa.py questions.jsonl answers.jsonl --stub-llm
+"""
+import argparse
+
+from rag_vector_store.VectorStore import VectorStore
+from rag_chatbot.RagChatBot import RagChatBot
+from rag_chatbot.BatchAnswerer import BatchAnswerer
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='JSON lines file with the questions.')
+    parser.add_argument('output', help='JSON lines file the answers are written to.')
+    parser.add_argument('--batch-size', type=int, default=32, help='Questions retrieved per batch.')
+    parser.add_argument('--concurrency', type=int, default=8, help='Maximum number of concurrent LLM calls.')
+    parser.add_argument('--max-retries', type=int, default=5, help='Retries of rate-limited LLM calls.')
+    parser.add_argument('--num-retrievals', type=int, default=3, help='Chunks retrieved per question.')
+    parser.add_argument('--retrieval-mode', choices=['dense', 'hybrid', 'lexical'], default='dense')
+    parser.add_argument('--persist-directory', default='./ChromaDBVectorStore', help='Vector store directory.')
+    parser.add_argument('--backend', choices=['chroma', 'numpy'], default='chroma', help='Vector store backend.')
+    parser.add_argument('--embedding-runtime', choices=['torch', 'quantized', 'onnx'], default=None,
+                        help='CPU runtime of the embedding model, use the runtime the store was built with.')
+    parser.add_argument('--stub-llm', action='store_true', help='Use a deterministic offline chat model.')
+    args = parser.parse_args()
+
+    # Load the existing vector store
+    Vector_Store = VectorStore(persist_directory=args.persist_directory, backend=args.backend,
+                               embedding_runtime=args.embedding_runtime)
+    Vector_Store.create_vector_store()
+
+    llm = None
+    if args.stub_llm:
+        from benchmarks.FakeChatModel import FakeChatModel
+        llm = FakeChatModel(first_token_latency=0.0, token_latency=0.0)
+
+    ChatBot = RagChatBot(Vector_Store, num_retrievals=args.num_retrievals, use_answer_cache=False, llm=llm,
+                         retrieval_mode=args.retrieval_mode)
+    BatchAnswerer(ChatBot, batch_size=args.batch_size, max_concurrency=args.concurrency,
+                  max_retries=args.max_retries).run(args.input, args.output)
@@ -0,0 +1,41 @@
+import random
+
+from unstructured.documents.elements import Element, ListItem, NarrativeText, Text, Title
+
+from benchmarks.FixtureSite import WORDS
+
+
+def generate_elements(num_pages: int = 500, seed: int = 0) -> list[Element]:
+    """
+    Generate a deterministic corpus of unstructured elements as partition_html would return them.
+
+    Every page has a title, a few sections with narrative text and list items and the same footer
+    boilerplate, so that filtering, cleaning, deduplication and chunking all have work to do.
+
+    Args:
+        num_pages (int, optional): Number of pages. The corpus has roughly 15 elements per page. Defaults to 500.
+        seed (int, optional): Seed of the generated text. Defaults to 0.
+
+    Returns:
+        list[Element]: The generated elements, tagged with the URL of their page.
+    """
+    rng = random.Random(seed)
+
+    def sentence(n_words: int) -> str:
+        return ' '.join(rng.choice(WORDS) for _ in range(n_words)).capitalize() + '.'
+
+    elements = []
+    for page in range(num_pages):
+        page_elements = [Title(f'Page {page}: {sentence(4)}')]
+        for section in range(rng.randint(2, 4)):
+            page_elements.append(Title(f'Section {section} {sentence(3)}'))
+            page_elements.extend(NarrativeText(' '.join(sentence(rng.randint(8, 16)) for _ in range(3)))
+                                 for _ in range(rng.randint(1, 3)))
+            page_elements.extend(ListItem(sentence(6)) for _ in range(rng.randint(0, 3)))
+        page_elements.append(Text('OneThousand GmbH, Berlin. All rights reserved.'))
+        page_elements.append(Text('   '))
+
+        for element in page_elements:
+            element.metadata.url = f'http://fixture/page/{page}.html'
+        elements.extend(page_elements)
+    return elements
@@ -0,0 +1,77 @@
+import asyncio
+import hashlib
+import time
+
+from collections.abc import AsyncIterator, Iterator
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from benchmarks.FixtureSite import WORDS
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    A deterministic, offline stand-in for the Groq chat model.
+
+    The answer only depends on the prompt. It is streamed word by word after a configurable time to first
+    token and per-token delay, so that latency and streaming behaviour of the chatbot can be benchmarked
+    without network access. The async path sleeps cooperatively, the sync path blocks like a real client.
+
+    Attributes:
+        first_token_latency (float): Delay in seconds before the first token.
+        token_latency (float): Delay in seconds between two tokens.
+        answer_words (int): Number of words per answer.
+        calls (int): Number of generations so far.
+    """
+
+    first_token_latency: float = 0.2
+    token_latency: float = 0.01
+    answer_words: int = 40
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return 'fake-chat-model'
+
+    def _tokens(self, messages: list[BaseMessage]) -> list[str]:
+        prompt = '\n'.join(str(message.content) for message in messages)
+        seed = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest(), 16)
+        words = [WORDS[(seed >> (5 * i)) % len(WORDS)] for i in range(self.answer_words)]
+        return [word + ' ' for word in words[:-1]] + [words[-1] + '.']
+
+    def _generate(self, messages: list[BaseMessage], stop: list[str] = None,
+                  run_manager: CallbackManagerForLLMRun = None, **kwargs) -> ChatResult:
+        text = ''.join(chunk.message.content for chunk in self._stream(messages, stop, run_manager, **kwargs))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(self, messages: list[BaseMessage], stop: list[str] = None,
+                         run_manager: AsyncCallbackManagerForLLMRun = None, **kwargs) -> ChatResult:
+        chunks = [chunk.message.content async for chunk in self._astream(messages, stop, run_manager, **kwargs)]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=''.join(chunks)))])
+
+    def _stream(self, messages: list[BaseMessage], stop: list[str] = None,
+                run_manager: CallbackManagerForLLMRun = None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        self.calls += 1
+        time.sleep(self.first_token_latency)
+        for position, token in enumerate(self._tokens(messages)):
+            if position:
+                time.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: list[BaseMessage], stop: list[str] = None,
+                       run_manager: AsyncCallbackManagerForLLMRun = None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        self.calls += 1
+        await asyncio.sleep(self.first_token_latency)
+        for position, token in enumerate(self._tokens(messages)):
+            if position:
+                await asyncio.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
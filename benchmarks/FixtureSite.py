@@ -0,0 +1,232 @@
+import datetime
+import hashlib
+import random
+import threading
+import time
+
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+WORDS = (
+    'data model client project machine learning engineer team solution breakthrough '
+    'assistant customer inquiry pipeline retrieval language insight product platform '
+    'analysis research deployment cloud strategy workshop berlin company partner'
+).split()
+
+
+class FixtureSite:
+    """
+    A synthetic, deterministic website served by a local threading HTTP server.
+
+    Page 0 is served at '/', every other page at '/page/<i>.html'. The pages form a tree with the
+    given branching factor, every page links back to the home page, to one pseudo-random other page
+    and to one external LinkedIn URL, so the crawler sees duplicate and external links. Responses carry
+    ETag and Last-Modified validators and conditional requests for unchanged pages are answered with 304.
+    If `serve_sitemap` is set, /robots.txt points to a sitemap index at /sitemap.xml whose sitemaps list every
+    page with its `lastmod`. `touch` changes a page and its `lastmod`, growing `num_pages` adds new pages.
+
+    Attributes:
+        num_pages (int): Number of pages of the site.
+        branching (int): Number of child pages linked from every page.
+        latency (float): Artificial delay in seconds added to every response.
+        seed (int): Seed for the generated text.
+        requests_served (int): Number of requests answered since the server was started.
+        not_modified_served (int): Number of 304 responses since the server was started.
+        pages_served (int): Number of full page responses since the server was started.
+        serve_sitemap (bool): Whether robots.txt and the sitemaps are served.
+        sitemap_size (int): Maximum number of pages per sitemap.
+        versions (dict): Page index -> number of times the page was changed with `touch`.
+    """
+
+    LAST_MODIFIED = datetime.datetime(2025, 2, 3, 9, 0, tzinfo=datetime.timezone.utc)
+
+    def __init__(self, num_pages: int = 2000, branching: int = 4, latency: float = 0.0, seed: int = 0,
+                 serve_sitemap: bool = False, sitemap_size: int = 500):
+        self.num_pages = num_pages
+        self.branching = branching
+        self.latency = latency
+        self.seed = seed
+        self.requests_served = 0
+        self.not_modified_served = 0
+        self.pages_served = 0
+        self.serve_sitemap = serve_sitemap
+        self.sitemap_size = sitemap_size
+        self.versions = {}
+
+        self._server = None
+        self._thread = None
+
+    @staticmethod
+    def page_path(index: int) -> str:
+        return '/' if index == 0 else f'/page/{index}.html'
+
+    def touch(self, index: int) -> None:
+        """
+        Change the content and the `lastmod` of a page.
+        """
+        self.versions[index] = self.versions.get(index, 0) + 1
+
+    def last_modified(self, index: int) -> datetime.datetime:
+        return self.LAST_MODIFIED + datetime.timedelta(days=self.versions.get(index, 0))
+
+    def robots_txt(self) -> str:
+        # The sitemap protocol requires absolute URLs in robots.txt and in sitemaps
+        return f'User-agent: *\nDisallow:\n\nSitemap: {self.base_url}sitemap.xml\n'
+
+    def sitemap_xml(self, path: str):
+        """
+        Render the sitemap index at /sitemap.xml or one of its sitemaps at /sitemap-<i>.xml, None for other paths.
+        """
+        namespace = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+        num_sitemaps = (self.num_pages + self.sitemap_size - 1) // self.sitemap_size
+        if path == '/sitemap.xml':
+            entries = ''.join(f'<sitemap><loc>{self.base_url}sitemap-{i}.xml</loc></sitemap>' for i in range(num_sitemaps))
+            return f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex {namespace}>{entries}</sitemapindex>'
+        if path.startswith('/sitemap-') and path.endswith('.xml'):
+            try:
+                sitemap = int(path[len('/sitemap-'):-len('.xml')])
+            except ValueError:
+                return None
+            if 0 <= sitemap < num_sitemaps:
+                pages = range(sitemap * self.sitemap_size, min((sitemap + 1) * self.sitemap_size, self.num_pages))
+                entries = ''.join(f'<url><loc>{self.base_url.rstrip("/")}{self.page_path(index)}</loc>'
+                                  f'<lastmod>{self.last_modified(index).isoformat()}</lastmod></url>'
+                                  for index in pages)
+                return f'<?xml version="1.0" encoding="UTF-8"?><urlset {namespace}>{entries}</urlset>'
+        return None
+
+    def page_index(self, path: str):
+        """
+        Map a request path to a page index, or None if the path is not part of the site.
+        """
+        if path == '/':
+            return 0
+        if path.startswith('/page/') and path.endswith('.html'):
+            try:
+                index = int(path[len('/page/'):-len('.html')])
+            except ValueError:
+                return None
+            if 0 < index < self.num_pages:
+                return index
+        return None
+
+    def page_html(self, index: int) -> str:
+        """
+        Render the HTML of a page. The output only depends on the page index and the seed.
+        """
+        rng = random.Random(self.seed * 1_000_003 + index)
+
+        def sentence(n_words: int) -> str:
+            return ' '.join(rng.choice(WORDS) for _ in range(n_words)).capitalize() + '.'
+
+        children = range(index * self.branching + 1, min(index * self.branching + self.branching + 1, self.num_pages))
+        links = [self.page_path(child) for child in children]
+        links.append(self.page_path(0))
+        links.append(self.page_path(rng.randrange(self.num_pages)))
+
+        sections = []
+        for section in range(rng.randint(2, 4)):
+            paragraphs = ''.join(f'<p>{" ".join(sentence(rng.randint(8, 16)) for _ in range(3))}</p>'
+                                 for _ in range(rng.randint(1, 3)))
+            sections.append(f'<h2>Section {section} of page {index}</h2>{paragraphs}')
+
+        anchors = ''.join(f'<li><a href="{link}">{link}</a></li>' for link in links)
+        return (
+            f'<html><head><title>Page {index}</title></head><body>'
+            f'<h1>Page {index}: {sentence(4)}</h1>'
+            f'<p>Revision {self.versions.get(index, 0)}.</p>'
+            f'{"".join(sections)}'
+            f'<ul>{anchors}</ul>'
+            f'<footer><p>OneThousand fixture footer. All rights reserved.</p>'
+            f'<a href="https://www.linkedin.com/company/fixture-{index % 5}">LinkedIn</a></footer>'
+            f'</body></html>'
+        )
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                site.requests_served += 1
+                if site.latency > 0:
+                    time.sleep(site.latency)
+
+                path = self.path.split('?', 1)[0].split('#', 1)[0]
+                if site.serve_sitemap and path == '/robots.txt':
+                    self.send_text(site.robots_txt(), 'text/plain')
+                    return
+                sitemap = site.sitemap_xml(path) if site.serve_sitemap else None
+                if sitemap is not None:
+                    self.send_text(sitemap, 'application/xml')
+                    return
+
+                index = site.page_index(path)
+                if index is None:
+                    self.send_error(404)
+                    return
+
+                body = site.page_html(index).encode('utf-8')
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    site.not_modified_served += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                site.pages_served += 1
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', format_datetime(site.last_modified(index), usegmt=True))
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def send_text(self, text: str, content_type: str) -> None:
+                body = text.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> str:
+        """
+        Start serving the site on a free local port in a background thread.
+
+        Returns:
+            str: The base URL of the site.
+        """
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
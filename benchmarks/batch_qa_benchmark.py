@@ -0,0 +1,133 @@
+"""
+Measures the throughput of the batch question-answering API against answering questions one by one with
+`RagChatBot.ask`.
+
+The fake chat model answers after --llm-latency seconds and rejects calls with a 429 error while more than
+--rate-limit calls are running, so concurrency levels above the limit exercise the retry and backoff path.
+Every embedding call costs --embed-call-latency seconds plus --embed-text-latency seconds per text, like a
+model running a forward pass per batch.
+
+Usage:
+    python -m benchmarks.batch_qa_benchmark --questions 500 --concurrency 1 8 32 --rate-limit 16
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from collections.abc import AsyncIterator
+
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+
+from benchmarks.FakeChatModel import FakeChatModel
+from benchmarks.retrieval_benchmark import generate_named_corpus, make_queries
+from rag_chatbot.BatchAnswerer import BatchAnswerer
+from rag_chatbot.RagChatBot import RagChatBot
+from rag_data_loading.DocumentPreprocessor import DocumentPreprocessor
+from rag_vector_store.VectorStore import VectorStore
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class RateLimitedChatModel(FakeChatModel):
+    """
+    FakeChatModel that raises a RateLimitError while more than `max_concurrent` calls are running.
+    """
+
+    max_concurrent: int = 16
+    active: int = 0
+    rejected: int = 0
+
+    async def _astream(self, *args, **kwargs) -> AsyncIterator:
+        if self.active >= self.max_concurrent:
+            self.rejected += 1
+            raise RateLimitError('Rate limit reached, retry later.')
+        self.active += 1
+        try:
+            async for chunk in super()._astream(*args, **kwargs):
+                yield chunk
+        finally:
+            self.active -= 1
+
+
+class BatchCostEmbedding(Embeddings):
+    """
+    Fake embedding with a fixed cost per call and a cost per embedded text, disabled while the store is built.
+    """
+
+    def __init__(self, embedding: Embeddings, call_latency: float = 0.0, text_latency: float = 0.0):
+        self.embedding = embedding
+        self.call_latency = call_latency
+        self.text_latency = text_latency
+        self.calls = 0
+
+    def _wait(self, num_texts: int) -> None:
+        self.calls += 1
+        time.sleep(self.call_latency + self.text_latency * num_texts)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self._wait(len(texts))
+        return self.embedding.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        self._wait(1)
+        return self.embedding.embed_query(text)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus-pages', type=int, default=300, help='Pages of the generated corpus.')
+    parser.add_argument('--questions', type=int, default=500, help='Number of questions.')
+    parser.add_argument('--sequential-questions', type=int, default=50,
+                        help='Questions answered one by one for the baseline.')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32], help='Concurrency levels.')
+    parser.add_argument('--batch-size', type=int, default=32, help='Questions retrieved per batch.')
+    parser.add_argument('--rate-limit', type=int, default=16, help='Concurrent calls accepted by the fake LLM.')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='Fake chat model latency in s.')
+    parser.add_argument('--embed-call-latency', type=float, default=0.02, help='Cost per embedding call in s.')
+    parser.add_argument('--embed-text-latency', type=float, default=0.002, help='Cost per embedded text in s.')
+    parser.add_argument('--backend', choices=['chroma', 'numpy'], default='chroma', help='Vector store backend.')
+    args = parser.parse_args()
+
+    elements, names = generate_named_corpus(args.corpus_pages)
+    documents = DocumentPreprocessor.clean_chunk_transform(elements)
+    questions = [query for query, _ in make_queries(names, args.questions)]
+    embedding = BatchCostEmbedding(DeterministicFakeEmbedding(size=768))
+
+    with tempfile.TemporaryDirectory() as directory:
+        vector_db = VectorStore(documents, persist_directory=os.path.join(directory, 'store'), embedding_cache_dir=None,
+                                embedding=embedding, backend=args.backend)
+        vector_db.create_vector_store()
+        embedding.call_latency, embedding.text_latency = args.embed_call_latency, args.embed_text_latency
+
+        input_path = os.path.join(directory, 'questions.jsonl')
+        with open(input_path, 'w', encoding='utf-8') as file:
+            for number, question in enumerate(questions):
+                file.write(json.dumps({'id': number, 'question': question}) + '\n')
+
+        llm = RateLimitedChatModel(first_token_latency=args.llm_latency, token_latency=0.0,
+                                   max_concurrent=args.rate_limit)
+        chatbot = RagChatBot(vector_db, llm=llm, use_answer_cache=False)
+
+        start = time.perf_counter()
+        for question in questions[:args.sequential_questions]:
+            chatbot.ask(question)
+        elapsed = time.perf_counter() - start
+        print(f'--- {"sequential ask":>16}: {args.sequential_questions / elapsed:.1f} questions/s ---')
+
+        for concurrency in args.concurrency:
+            embedding.calls, llm.rejected = 0, 0
+            answerer = BatchAnswerer(chatbot, batch_size=args.batch_size, max_concurrency=concurrency,
+                                     max_retries=8, initial_backoff=0.05, max_backoff=2.0)
+            report = answerer.run(input_path, os.path.join(directory, f'answers_{concurrency}.jsonl'))
+            print(f'--- {f"concurrency {concurrency}":>16}: {report["questions_per_s"]:.1f} questions/s, '
+                  f'generation p50 {report["latency_p50"]:.2f}s p95 {report["latency_p95"]:.2f}s, '
+                  f'{embedding.calls} embedding calls, {llm.rejected} rate-limited calls, '
+                  f'{report["errors"]} errors ---')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Measures prompt size, answer latency and context quality with and without context packing.
+
+The corpus names a person and a client on every page and every page is mirrored at a second URL with a slightly
+different text, like a translated navigation or an overlapping chunk, so that retrieval returns near-duplicate
+chunks. Without packing the answer prompt contains the `--k` best chunks, with packing `--pool` candidates are
+retrieved and packed into at most `--k` non-redundant chunks within `--budget` tokens. The fake chat model takes
+--prefill-latency seconds per prompt token before answering, so smaller prompts answer faster. Quality is the
+share of queries whose context mentions the name asked for.
+
+Usage:
+    python -m benchmarks.context_packing_benchmark --queries 200 --pool 12 --budget 400
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from collections.abc import Iterator
+
+from langchain.schema import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.messages import BaseMessage
+
+from benchmarks.FakeChatModel import FakeChatModel
+from benchmarks.retrieval_benchmark import generate_named_corpus, make_queries
+from rag_chatbot.RagChatBot import RagChatBot
+from rag_data_loading.DocumentPreprocessor import DocumentPreprocessor
+from rag_vector_store.VectorStore import VectorStore
+
+
+class PrefillChatModel(FakeChatModel):
+    """
+    FakeChatModel whose time to first token grows with the prompt length.
+    """
+
+    prefill_latency: float = 0.0002
+
+    def _stream(self, messages: list[BaseMessage], *args, **kwargs) -> Iterator:
+        prompt_tokens = sum(len(str(message.content)) // 4 + 1 for message in messages)
+        time.sleep(self.prefill_latency * prompt_tokens)
+        return super()._stream(messages, *args, **kwargs)
+
+
+def mirrored_documents(documents: list[Document]) -> list[Document]:
+    mirrors = [Document(page_content=f'{document.page_content} Read more.',
+                        metadata={**document.metadata, 'url': document.metadata.get('url', '') + '?lang=en'})
+               for document in documents]
+    return documents + mirrors
+
+
+def count_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus-pages', type=int, default=300, help='Pages of the generated corpus.')
+    parser.add_argument('--queries', type=int, default=200, help='Number of queries.')
+    parser.add_argument('--k', type=int, default=3, help='Chunks in the answer prompt.')
+    parser.add_argument('--pool', type=int, default=12, help='Candidates retrieved for packing.')
+    parser.add_argument('--budget', type=int, default=400, help='Token budget of the packed context.')
+    parser.add_argument('--prefill-latency', type=float, default=0.0002, help='Fake model latency per prompt token.')
+    parser.add_argument('--retrieval-mode', choices=['dense', 'hybrid', 'lexical'], default='lexical',
+                        help='Retrieval mode, the fake embeddings make dense rankings random.')
+    args = parser.parse_args()
+
+    elements, names = generate_named_corpus(args.corpus_pages)
+    documents = mirrored_documents(DocumentPreprocessor.clean_chunk_transform(elements))
+    queries = make_queries(names, args.queries)
+    llm = PrefillChatModel(first_token_latency=0.0, token_latency=0.0, prefill_latency=args.prefill_latency)
+
+    with tempfile.TemporaryDirectory() as directory:
+        vector_db = VectorStore(documents, persist_directory=os.path.join(directory, 'store'), embedding_cache_dir=None,
+                                embedding=DeterministicFakeEmbedding(size=768))
+        vector_db.create_vector_store()
+
+        for name, packing in (('unpacked', False), ('packed', True)):
+            chatbot = RagChatBot(vector_db, num_retrievals=args.k, use_answer_cache=False, llm=llm,
+                                 retrieval_mode=args.retrieval_mode, context_packing=packing,
+                                 candidate_pool=args.pool, context_token_budget=args.budget)
+            tokens, latencies, relevant, distinct = [], [], 0, []
+            for query, expected in queries:
+                start = time.perf_counter()
+                result = chatbot.ask(query)
+                latencies.append(time.perf_counter() - start)
+                tokens.append(sum(count_tokens(document.page_content) for document in result['context']))
+                relevant += any(expected in document.page_content for document in result['context'])
+                distinct.append(len({document.page_content.removesuffix(' Read more.')
+                                     for document in result['context']}))
+            print(f'--- {name:>8}: context tokens mean {statistics.mean(tokens):.0f}, '
+                  f'answer latency mean {statistics.mean(latencies) * 1000:.0f}ms, '
+                  f'distinct chunks {statistics.mean(distinct):.2f}, relevant context {relevant / len(queries):.1%} ---')
+            if chatbot.context_packer is not None:
+                stats = chatbot.context_packer.stats
+                print(f'--- packing: {stats["duplicates"]} near duplicates dropped, '
+                      f'{stats["tokens_unpacked"] - stats["tokens_packed"]} prompt tokens saved '
+                      f'({1 - stats["tokens_packed"] / max(stats["tokens_unpacked"], 1):.1%}) ---')
+
+
+if __name__ == '__main__':
+    main()
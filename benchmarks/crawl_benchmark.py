@@ -0,0 +1,114 @@
+"""
+Compares the serial `get_links` crawl with the concurrent asyncio crawl mode against a local
+synthetic site.
+
+With --recrawl, the checkpointed, sitemap-seeded crawl is measured instead: a first crawl is interrupted
+after half of the pages and resumed, then --changed pages are modified, --new pages are added and the site
+is crawled again. For every run the pages downloaded and the pages parsed for links are reported. Add
+--concurrent to measure these runs with the concurrent crawl mode.
+
+Usage:
+    python -m benchmarks.crawl_benchmark --pages 2000 --latency 0.005 --workers 32
+    python -m benchmarks.crawl_benchmark --recrawl --pages 2000 --changed 20 --new 10
+    python -m benchmarks.crawl_benchmark --recrawl --concurrent --pages 2000 --changed 20 --new 10
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.FixtureSite import FixtureSite
+from rag_data_loading.CrawlCheckpoint import CrawlCheckpoint
+from rag_data_loading.PageStore import PageStore
+from rag_data_loading.RagWebCrawler import RagWebCrawler
+
+
+class CountingCrawler(RagWebCrawler):
+    """
+    RagWebCrawler that counts the parsed pages and raises KeyboardInterrupt after `interrupt_after` pages.
+    """
+
+    def __init__(self, *args, interrupt_after: int = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.interrupt_after = interrupt_after
+        self.pages_parsed = 0
+
+    def parse_links(self, url: str, html: str):
+        if self.interrupt_after is not None and self.pages_parsed >= self.interrupt_after:
+            raise KeyboardInterrupt
+        self.pages_parsed += 1
+        return super().parse_links(url, html)
+
+
+def time_crawl(base_url: str, concurrent: bool, args) -> tuple[float, int]:
+    crawler = RagWebCrawler(base_url,
+                            external_urls=['https://www.linkedin.com/'],
+                            timeout=30,
+                            max_workers=args.workers,
+                            max_per_host=args.per_host,
+                            politeness_delay=args.delay)
+    start = time.perf_counter()
+    if concurrent:
+        crawler.get_links_concurrent()
+    else:
+        crawler.get_links()
+    return time.perf_counter() - start, len(crawler.base_links)
+
+
+def recrawl(site: FixtureSite, args) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        def run(name: str, interrupt_after: int = None) -> None:
+            crawler = CountingCrawler(site.base_url,
+                                      external_urls=['https://www.linkedin.com/'],
+                                      timeout=30,
+                                      max_workers=args.workers,
+                                      max_per_host=args.per_host,
+                                      page_store=PageStore(os.path.join(directory, 'pages')),
+                                      checkpoint=CrawlCheckpoint(os.path.join(directory, 'checkpoint')),
+                                      interrupt_after=interrupt_after)
+            served, start = site.pages_served, time.perf_counter()
+            try:
+                if args.concurrent:
+                    crawler.get_links_concurrent()
+                else:
+                    crawler.get_links()
+            except KeyboardInterrupt:
+                name += ' (interrupted)'
+            print(f'--- {name:>24}: {len(crawler.base_links)} pages known, {site.pages_served - served} downloaded, '
+                  f'{crawler.pages_parsed} parsed in {time.perf_counter() - start:.2f}s ---')
+
+        run('first crawl', interrupt_after=args.pages // 2)
+        run('resumed crawl')
+        run('unchanged recrawl')
+        for index in range(1, args.changed + 1):
+            site.touch(index * (args.pages // (args.changed + 1)))
+        site.num_pages += args.new
+        run(f'{args.changed} changed, {args.new} new')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=2000, help='Number of pages of the synthetic site.')
+    parser.add_argument('--latency', type=float, default=0.005, help='Artificial server latency per request in s.')
+    parser.add_argument('--workers', type=int, default=32, help='Concurrent crawl workers.')
+    parser.add_argument('--per-host', type=int, default=32, help='Parallel connections per host.')
+    parser.add_argument('--delay', type=float, default=0.0, help='Politeness delay per host in s.')
+    parser.add_argument('--skip-serial', action='store_true', help='Only run the concurrent crawl.')
+    parser.add_argument('--recrawl', action='store_true', help='Measure resumed and incremental crawls.')
+    parser.add_argument('--changed', type=int, default=20, help='Pages changed before the incremental crawl.')
+    parser.add_argument('--new', type=int, default=10, help='Pages added before the incremental crawl.')
+    parser.add_argument('--concurrent', action='store_true', help='Use the concurrent crawl mode for --recrawl.')
+    args = parser.parse_args()
+
+    with FixtureSite(num_pages=args.pages, latency=args.latency, serve_sitemap=args.recrawl) as site:
+        if args.recrawl:
+            recrawl(site, args)
+            return
+        modes = [('concurrent', True)] if args.skip_serial else [('serial', False), ('concurrent', True)]
+        for name, concurrent in modes:
+            elapsed, pages = time_crawl(site.base_url, concurrent, args)
+            print(f'--- {name:>10}: {pages} pages in {elapsed:.2f}s ({pages / elapsed:.1f} pages/s) ---')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Compares the CPU embedding runtimes of all-mpnet-base-v2 against the default, `HuggingFaceEmbeddings`
+with default settings: model load time, ingest throughput in chunks/s, query embedding latency and retrieval
+recall@k.
+
+Every configuration runs in a fresh process, so that thread settings and load time do not leak between them.
+The chunks of the generated corpus name a person and a client, queries ask for one of these names and count as
+recalled if a chunk mentioning the name is among the k results of an exact cosine search. Agreement is the share
+of the default's top-k chunks the configuration also returns. Configurations whose runtime is not installed
+(e.g. 'onnx' needs `optimum[onnxruntime]`, pinned in requirements.txt) are reported as skipped.
+
+Usage:
+    python -m benchmarks.embedding_benchmark --corpus-pages 300 --queries 200 --threads 4
+    python -m benchmarks.embedding_benchmark --configs default torch quantized --batch-size 64
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.retrieval_benchmark import generate_named_corpus, make_queries, percentile
+from rag_data_loading.DocumentPreprocessor import DocumentPreprocessor
+from rag_vector_store.EmbeddingBackend import EmbeddingBackend
+
+MODEL_NAME = 'sentence-transformers/all-mpnet-base-v2'
+
+CONFIGS = {
+    'default': None,
+    'torch': {'runtime': 'torch'},
+    'quantized': {'runtime': 'quantized'},
+    'onnx': {'runtime': 'onnx'},
+}
+
+
+def load_embedding(name: str, args):
+    if CONFIGS[name] is None:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=MODEL_NAME)
+    return EmbeddingBackend(MODEL_NAME, batch_size=args.batch_size, num_threads=args.threads, **CONFIGS[name])
+
+
+def run_child(args) -> None:
+    """
+    Load one configuration, embed the chunks and the queries and print the measurements as JSON.
+    """
+    with open(args.child_input, encoding='utf-8') as file:
+        data = json.load(file)
+
+    start = time.perf_counter()
+    embedding = load_embedding(args.child, args)
+    embedding.embed_query('warm up')
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chunks = np.asarray(embedding.embed_documents(data['chunks']), dtype=np.float32)
+    ingest_time = time.perf_counter() - start
+
+    latencies, queries = [], []
+    for query in data['queries']:
+        start = time.perf_counter()
+        queries.append(embedding.embed_query(query))
+        latencies.append(time.perf_counter() - start)
+
+    chunks /= np.linalg.norm(chunks, axis=1, keepdims=True)
+    queries = np.asarray(queries, dtype=np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    top_k = np.argsort(-(queries @ chunks.T), axis=1)[:, :args.k]
+    recalled = sum(any(name in data['chunks'][row] for row in rows) for rows, name in zip(top_k, data['names']))
+
+    print(json.dumps({
+        'load_time': load_time,
+        'chunks_per_s': len(data['chunks']) / ingest_time,
+        'latency_p50': percentile(latencies, 0.5),
+        'latency_p95': percentile(latencies, 0.95),
+        'recall': recalled / len(data['queries']),
+        'top_k': top_k.tolist(),
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus-pages', type=int, default=300, help='Pages of the generated corpus.')
+    parser.add_argument('--queries', type=int, default=200, help='Number of queries.')
+    parser.add_argument('--k', type=int, default=3, help='Number of retrieved chunks.')
+    parser.add_argument('--configs', nargs='+', choices=list(CONFIGS), default=list(CONFIGS),
+                        help='Configurations to compare, the first one is the reference of the agreement.')
+    parser.add_argument('--batch-size', type=int, default=32, help='Texts per forward pass.')
+    parser.add_argument('--threads', type=int, default=None, help='CPU threads, defaults to the runtime default.')
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--child-input', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args)
+        return
+
+    elements, names = generate_named_corpus(args.corpus_pages)
+    chunks = [document.page_content for document in DocumentPreprocessor.clean_chunk_transform(elements)]
+    queries = make_queries(names, args.queries)
+    print(f'--- {len(chunks)} chunks, {len(queries)} queries, batch size {args.batch_size}, '
+          f'threads {args.threads or "default"} ---')
+
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, 'input.json')
+        with open(input_path, 'w', encoding='utf-8') as file:
+            json.dump({'chunks': chunks, 'queries': [query for query, _ in queries],
+                       'names': [name for _, name in queries]}, file)
+
+        reference = None
+        for name in args.configs:
+            command = [sys.executable, '-m', 'benchmarks.embedding_benchmark', '--child', name,
+                       '--child-input', input_path, '--k', str(args.k), '--batch-size', str(args.batch_size)]
+            if args.threads is not None:
+                command += ['--threads', str(args.threads)]
+            process = subprocess.run(command, capture_output=True, text=True)
+            if process.returncode != 0:
+                error = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else 'failed'
+                print(f'--- {name:>9}: skipped, {error} ---')
+                continue
+            result = json.loads(process.stdout.strip().splitlines()[-1])
+            if reference is None:
+                reference = result['top_k']
+            agreement = np.mean([len(set(rows) & set(expected)) / len(expected)
+                                 for rows, expected in zip(result['top_k'], reference)])
+            print(f'--- {name:>9}: load {result["load_time"]:.1f}s, {result["chunks_per_s"]:.1f} chunks/s, '
+                  f'query p50 {result["latency_p50"] * 1000:.1f}ms '
+                  f'p95 {result["latency_p95"] * 1000:.1f}ms, recall@{args.k} {result["recall"]:.1%}, '
+                  f'agreement {agreement:.1%} ---')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Compares dense, hybrid (BM25 + dense with reciprocal rank fusion) and lexical-only retrieval on a generated
+corpus: recall@k and latency percentiles per mode.
+
+Every page of the corpus names a person and a client. Queries ask for one of these names, like a search for
+an employee or a customer, and count as recalled if a chunk mentioning the name is among the k results. With
+the default fake embeddings dense recall is close to chance and `--embed-latency` simulates the cost of the
+transformer query embedding; use `--embedding huggingface` for a meaningful dense and hybrid recall.
+
+Usage:
+    python -m benchmarks.retrieval_benchmark --corpus-pages 500 --queries 200 --embed-latency 0.02
+    python -m benchmarks.retrieval_benchmark --embedding huggingface
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from unstructured.documents.elements import NarrativeText
+
+from benchmarks.ElementCorpus import generate_elements
+from rag_data_loading.DocumentPreprocessor import DocumentPreprocessor
+from rag_vector_store.HybridRetriever import HybridRetriever
+from rag_vector_store.VectorStore import VectorStore
+
+
+class SlowEmbedding(Embeddings):
+    """
+    Fake embedding that takes as long as a real query embedding.
+    """
+
+    def __init__(self, embedding: Embeddings, query_latency: float):
+        self.embedding = embedding
+        self.query_latency = query_latency
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embedding.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        time.sleep(self.query_latency)
+        return self.embedding.embed_query(text)
+
+
+def make_embedding(args) -> Embeddings:
+    if args.embedding == 'fake':
+        return SlowEmbedding(DeterministicFakeEmbedding(size=768), args.embed_latency)
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name='sentence-transformers/all-mpnet-base-v2')
+
+
+SYLLABLES = ['ka', 'lor', 'vin', 'te', 'mar', 'sul', 'dra', 'ni', 'bex', 'to', 'rin', 'gal', 'fe', 'qui', 'zo']
+
+
+def generate_named_corpus(num_pages: int, seed: int = 0) -> tuple[list, list[str]]:
+    """
+    Generate the element corpus with a person and a client named on every page.
+
+    Returns:
+        tuple[list, list[str]]: The elements and the names mentioned in them.
+    """
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < 2 * num_pages:
+        names.add(''.join(rng.choice(SYLLABLES) for _ in range(4)).capitalize())
+    names = sorted(names)
+    rng.shuffle(names)
+
+    elements = []
+    for element in generate_elements(num_pages, seed=seed):
+        # The footer closes every page, name a person and a client right before it
+        if element.text.startswith('OneThousand GmbH'):
+            page = int(element.metadata.url.rsplit('/', 1)[1].split('.')[0])
+            person, client = names[2 * page], names[2 * page + 1]
+            named = NarrativeText(f'{person} leads the project for {client} and reports to the board.')
+            named.metadata.url = element.metadata.url
+            elements.append(named)
+        elements.append(element)
+    return elements, names
+
+
+def make_queries(names: list[str], num_queries: int, seed: int = 0) -> list[tuple[str, str]]:
+    """
+    Returns:
+        list[tuple[str, str]]: (query, name the query asks for).
+    """
+    rng = random.Random(seed)
+    templates = ['Who is {}?', 'What did we do for {}?', 'Tell me about {}']
+    return [(rng.choice(templates).format(name), name) for name in rng.sample(names, min(num_queries, len(names)))]
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(int(p * len(values)), len(values) - 1)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus-pages', type=int, default=500, help='Pages of the generated element corpus.')
+    parser.add_argument('--queries', type=int, default=200, help='Number of queries per mode.')
+    parser.add_argument('--k', type=int, default=3, help='Number of retrieved chunks.')
+    parser.add_argument('--embedding', choices=['fake', 'huggingface'], default='fake', help='Embedding model.')
+    parser.add_argument('--embed-latency', type=float, default=0.02,
+                        help='Simulated query embedding latency of the fake embedding in s.')
+    args = parser.parse_args()
+
+    elements, names = generate_named_corpus(args.corpus_pages)
+    documents = DocumentPreprocessor.clean_chunk_transform(elements)
+    with tempfile.TemporaryDirectory() as directory:
+        vector_db = VectorStore(documents, persist_directory=os.path.join(directory, 'store'),
+                                embedding_cache_dir=None, embedding=make_embedding(args))
+        vector_db.create_vector_store()
+        queries = make_queries(names, args.queries)
+
+        for mode in ('dense', 'hybrid', 'lexical'):
+            retriever = HybridRetriever(vector_store=vector_db.vector_store, lexical_index=vector_db.lexical_index,
+                                        k=args.k, mode=mode)
+            latencies, hits = [], 0
+            for query, name in queries:
+                start = time.perf_counter()
+                results = retriever.invoke(query)
+                latencies.append(time.perf_counter() - start)
+                hits += any(name in document.page_content for document in results)
+            print(f'--- {mode:>7}: recall@{args.k} {hits / len(queries):.1%}, '
+                  f'latency p50 {percentile(latencies, 0.5) * 1000:.2f}ms, '
+                  f'p95 {percentile(latencies, 0.95) * 1000:.2f}ms ---')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+Reproducible offline end-to-end benchmark of the crawl, preprocess, index and query stages.
+
+The crawl runs against a local synthetic website, preprocessing against a generated element corpus,
+indexing with deterministic fake embeddings (or the real model with --embedding huggingface) and queries
+against a deterministic fake chat model. Results are written to a JSON file; pass --baseline with an
+earlier result file to flag metrics that regressed by more than --tolerance.
+
+Usage:
+    python -m benchmarks.run_benchmarks --pages 1000 --output bench_results.json
+    python -m benchmarks.run_benchmarks --baseline bench_results.json --output bench_new.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from benchmarks.ElementCorpus import generate_elements
+from benchmarks.FakeChatModel import FakeChatModel
+from benchmarks.FixtureSite import FixtureSite
+from rag_chatbot.RagChatBot import RagChatBot
+from rag_data_loading.DocumentPreprocessor import DocumentPreprocessor
+from rag_data_loading.RagWebCrawler import RagWebCrawler
+from rag_vector_store.VectorStore import VectorStore
+
+
+# Metric name -> True if higher values are better
+METRICS = {
+    'crawl_pages_per_s': True,
+    'partition_pages_per_s': True,
+    'preprocess_elements_per_s': True,
+    'index_chunks_per_s': True,
+    'index_size_bytes': False,
+    'retrieval_latency_p50': False,
+    'retrieval_latency_p95': False,
+    'retrieval_latency_p99': False,
+    'query_latency_p50': False,
+    'query_latency_p95': False,
+    'query_latency_p99': False,
+}
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(int(p * len(values)), len(values) - 1)]
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def bench_crawl(args, results: dict) -> list[tuple[str, str]]:
+    with FixtureSite(num_pages=args.pages, latency=args.latency) as site:
+        crawler = RagWebCrawler(site.base_url, external_urls=['https://www.linkedin.com/'],
+                                timeout=30, max_workers=args.workers, max_per_host=args.workers)
+        start = time.perf_counter()
+        crawler.get_links_concurrent()
+        results['crawl_pages_per_s'] = len(crawler.base_links) / (time.perf_counter() - start)
+        return crawler.load_web_pages()
+
+
+def bench_partition(pages: list[tuple[str, str]], args, results: dict) -> None:
+    pages = pages[:args.partition_pages]
+    start = time.perf_counter()
+    DocumentPreprocessor.clean_chunk_transform_pages(pages, max_workers=args.ingest_workers)
+    results['partition_pages_per_s'] = len(pages) / (time.perf_counter() - start)
+
+
+def bench_preprocess(args, results: dict) -> list:
+    elements = generate_elements(args.corpus_pages)
+    start = time.perf_counter()
+    documents = DocumentPreprocessor.clean_chunk_transform(elements)
+    results['preprocess_elements_per_s'] = len(elements) / (time.perf_counter() - start)
+    results['corpus_elements'] = len(elements)
+    results['corpus_chunks'] = len(documents)
+    return documents
+
+
+def make_embedding(args):
+    if args.embedding == 'fake':
+        return DeterministicFakeEmbedding(size=768)
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name='sentence-transformers/all-mpnet-base-v2')
+
+
+def bench_index(documents: list, directory: str, args, results: dict) -> VectorStore:
+    vector_db = VectorStore(documents, persist_directory=os.path.join(directory, 'store'),
+                            embedding_cache_dir=None, embedding=make_embedding(args))
+    start = time.perf_counter()
+    vector_db.create_vector_store()
+    results['index_chunks_per_s'] = len(documents) / (time.perf_counter() - start)
+    results['index_size_bytes'] = directory_size(vector_db.persist_directory)
+    return vector_db
+
+
+def bench_query(vector_db: VectorStore, args, results: dict) -> None:
+    llm = FakeChatModel(first_token_latency=args.llm_latency, token_latency=0.0)
+    chatbot = RagChatBot(vector_db, llm=llm, use_answer_cache=False)
+    queries = [f'What did the team do for client {i} in project {i % 13}?' for i in range(args.queries)]
+
+    retrieval = []
+    for query in queries:
+        start = time.perf_counter()
+        chatbot.retriever.invoke(query)
+        retrieval.append(time.perf_counter() - start)
+
+    answers = []
+    for query in queries:
+        start = time.perf_counter()
+        chatbot.ask(query)
+        answers.append(time.perf_counter() - start)
+
+    for p, name in ((0.50, 'p50'), (0.95, 'p95'), (0.99, 'p99')):
+        results[f'retrieval_latency_{name}'] = percentile(retrieval, p)
+        results[f'query_latency_{name}'] = percentile(answers, p)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Compare metrics with a baseline run.
+
+    Returns:
+        list[str]: One message per metric that is worse than the baseline by more than the tolerance.
+    """
+    regressions = []
+    for name, higher_is_better in METRICS.items():
+        old, new = baseline.get(name), results.get(name)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if (higher_is_better and change < -tolerance) or (not higher_is_better and change > tolerance):
+            regressions.append(f'{name}: {old:.4g} -> {new:.4g} ({change:+.1%})')
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=1000, help='Pages of the synthetic website.')
+    parser.add_argument('--latency', type=float, default=0.002, help='Fixture server latency per request in s.')
+    parser.add_argument('--workers', type=int, default=32, help='Concurrent crawl workers.')
+    parser.add_argument('--partition', action='store_true', help='Also benchmark partition_html on crawled pages.')
+    parser.add_argument('--partition-pages', type=int, default=200, help='Pages used for the partition stage.')
+    parser.add_argument('--ingest-workers', type=int, default=None, help='Processes for the partition stage.')
+    parser.add_argument('--corpus-pages', type=int, default=1000, help='Pages of the generated element corpus.')
+    parser.add_argument('--embedding', choices=['fake', 'huggingface'], default='fake', help='Embedding model.')
+    parser.add_argument('--queries', type=int, default=100, help='Number of benchmark queries.')
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='Fake chat model latency in s.')
+    parser.add_argument('--output', default='bench_results.json', help='File the results are written to.')
+    parser.add_argument('--baseline', default=None, help='Earlier result file to compare with.')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed relative regression.')
+    args = parser.parse_args()
+
+    metrics = {}
+    pages = bench_crawl(args, metrics)
+    if args.partition:
+        bench_partition(pages, args, metrics)
+    documents = bench_preprocess(args, metrics)
+    with tempfile.TemporaryDirectory() as directory:
+        vector_db = bench_index(documents, directory, args, metrics)
+        bench_query(vector_db, args, metrics)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'config': vars(args),
+        'metrics': metrics,
+    }
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+
+    for name, value in metrics.items():
+        print(f'--- {name}: {value:.4g} ---')
+    print(f'--- Results written to {args.output} ---')
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            regressions = compare(metrics, json.load(file)['metrics'], args.tolerance)
+        for regression in regressions:
+            print(f'--- REGRESSION {regression} ---')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
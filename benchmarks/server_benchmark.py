@@ -0,0 +1,84 @@
+"""
+Load test of the multi-session chat server with a local fake chat model and fake embeddings.
+
+Starts the server in process, runs concurrent clients that each hold a session and send several turns,
+and reports throughput, latency percentiles and rejections.
+
+Usage:
+    python -m benchmarks.server_benchmark --clients 64 --turns 3 --max-concurrent-answers 16
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+
+import aiohttp
+
+from aiohttp import web
+
+from benchmarks.streaming_benchmark import build_chatbot
+from rag_chatbot.ChatServer import ChatServer
+
+
+async def client(session: aiohttp.ClientSession, url: str, client_id: int, turns: int,
+                 latencies: list, rejected: list) -> None:
+    session_id = None
+    for turn in range(turns):
+        payload = {'message': f'Client {client_id} asks question {turn} about project {client_id % 7}?'}
+        if session_id:
+            payload['session_id'] = session_id
+        start = time.perf_counter()
+        async with session.post(url + '/chat', json=payload) as response:
+            if response.status == 503:
+                rejected.append(client_id)
+                await asyncio.sleep(float(response.headers.get('Retry-After', 1)))
+                continue
+            response.raise_for_status()
+            session_id = (await response.json())['session_id']
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(args) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        chatbot = build_chatbot(directory, args)
+        server = ChatServer(chatbot,
+                            max_concurrent_answers=args.max_concurrent_answers,
+                            max_pending=args.max_pending)
+        runner = web.AppRunner(server.build_app())
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        url = f'http://127.0.0.1:{runner.addresses[0][1]}'
+
+        latencies, rejected = [], []
+        start = time.perf_counter()
+        async with aiohttp.ClientSession() as session:
+            await asyncio.gather(*(client(session, url, i, args.turns, latencies, rejected)
+                                   for i in range(args.clients)))
+            elapsed = time.perf_counter() - start
+            async with session.get(url + '/stats') as response:
+                stats = await response.json()
+        await runner.cleanup()
+
+    latencies.sort()
+    print(f'--- {len(latencies)} answers in {elapsed:.2f}s ({len(latencies) / elapsed:.1f} answers/s), '
+          f'{len(rejected)} rejected ---')
+    print(f'--- latency p50 {statistics.median(latencies):.3f}s, '
+          f'p95 {latencies[int(0.95 * (len(latencies) - 1))]:.3f}s, max {latencies[-1]:.3f}s ---')
+    print(f'--- server stats: {stats} ---')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=64, help='Number of concurrent client sessions.')
+    parser.add_argument('--turns', type=int, default=3, help='Questions per session.')
+    parser.add_argument('--max-concurrent-answers', type=int, default=16, help='Server cap on in-flight answers.')
+    parser.add_argument('--max-pending', type=int, default=256, help='Server cap on waiting and running answers.')
+    parser.add_argument('--first-token-latency', type=float, default=0.2, help='Fake model time to first token in s.')
+    parser.add_argument('--token-latency', type=float, default=0.005, help='Fake model delay per token in s.')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
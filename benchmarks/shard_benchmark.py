@@ -0,0 +1,126 @@
+"""
+Measures how a sharded vector store scales with the number of shards: build time, the time to rebuild one
+shard, query latency of the parallel fan-out against searching the shards one after another and against a
+single shard, the per-shard search times and recall@k against one collection holding all chunks.
+
+The generated chunks belong to --sites sites that are spread over the shards, like the sites of several tenants.
+Recall counts the share of the single-collection top-k chunks also returned by the merged shard results, with
+the exact numpy backend it is 100% unless the merge is wrong. Chroma indexes are approximate, so recall of the
+chroma backend also reflects the different HNSW graphs of one large and several small collections.
+
+Usage:
+    python -m benchmarks.shard_benchmark --chunks 20000 --shards 1 2 4 8 16 --queries 200
+    python -m benchmarks.shard_benchmark --backend chroma
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from langchain.schema import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from benchmarks.FixtureSite import WORDS
+from benchmarks.retrieval_benchmark import percentile
+from rag_vector_store.ShardedVectorStore import ShardedVectorStore
+
+
+def make_documents(num_chunks: int, num_sites: int, seed: int = 0) -> list[Document]:
+    rng = random.Random(seed)
+    return [Document(page_content=' '.join(rng.choice(WORDS) for _ in range(rng.randint(40, 120))) + f' ({i})',
+                     metadata={'url': f'http://site{i % num_sites}.fixture/page/{i // num_sites}.html'})
+            for i in range(num_chunks)]
+
+
+def split(documents: list[Document], num_shards: int) -> dict[str, list[Document]]:
+    shards = {}
+    for document in documents:
+        site = int(ShardedVectorStore.shard_name(document.metadata['url']).split('.')[0].removeprefix('site'))
+        shards.setdefault(f'shard-{site % num_shards}', []).append(document)
+    return shards
+
+
+def query_latencies(store: ShardedVectorStore, vectors: list[list[float]], k: int, shards: list[str] = None) -> list:
+    latencies = []
+    for vector in vectors:
+        start = time.perf_counter()
+        store.batch_search_by_vector([vector], k, shards)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chunks', type=int, default=20000, help='Number of generated chunks.')
+    parser.add_argument('--sites', type=int, default=48, help='Number of sites the chunks belong to.')
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4, 8, 16], help='Shard counts.')
+    parser.add_argument('--queries', type=int, default=200, help='Number of queries.')
+    parser.add_argument('--k', type=int, default=5, help='Number of retrieved chunks.')
+    parser.add_argument('--backend', choices=['chroma', 'numpy'], default='numpy', help='Vector store backend.')
+    args = parser.parse_args()
+
+    documents = make_documents(args.chunks, args.sites)
+    embedding = DeterministicFakeEmbedding(size=768)
+    rng = random.Random(1)
+    vectors = embedding.embed_documents([' '.join(rng.choice(WORDS) for _ in range(8)) for _ in range(args.queries)])
+
+    with tempfile.TemporaryDirectory() as directory:
+        reference = ShardedVectorStore(os.path.join(directory, 'reference'), embedding=embedding,
+                                       embedding_cache_dir=None, backend=args.backend, use_lexical_index=False)
+        reference.build_shard('all', documents)
+        expected = [{document.id for document, _ in ranking}
+                    for ranking in reference.batch_search_by_vector(vectors, args.k)]
+        reference.close()
+
+        for num_shards in args.shards:
+            root = os.path.join(directory, f'shards_{num_shards}')
+            shards = split(documents, num_shards)
+            store = ShardedVectorStore(root, embedding=embedding, embedding_cache_dir=None, backend=args.backend,
+                                       use_lexical_index=False, max_workers=num_shards)
+
+            start = time.perf_counter()
+            for name, shard_documents in shards.items():
+                store.build_shard(name, shard_documents)
+            build_time = time.perf_counter() - start
+
+            # Rebuild the first shard from scratch, as after re-crawling its sites
+            name = next(iter(shards))
+            start = time.perf_counter()
+            store.drop_shard(name)
+            store.build_shard(name, shards[name])
+            rebuild_time = time.perf_counter() - start
+
+            results = store.batch_search_by_vector(vectors, args.k)
+            recall = statistics.mean(len(ids & {document.id for document, _ in ranking}) / len(ids)
+                                     for ids, ranking in zip(expected, results))
+
+            fan_out, shard_times = [], {name: [] for name in shards}
+            for vector in vectors:
+                start = time.perf_counter()
+                store.batch_search_by_vector([vector], args.k)
+                fan_out.append(time.perf_counter() - start)
+                for shard_name, seconds in store.last_timings.items():
+                    shard_times[shard_name].append(seconds)
+            single = query_latencies(store, vectors, args.k, [name])
+
+            sequential_store = ShardedVectorStore(root, embedding=embedding, embedding_cache_dir=None,
+                                                  backend=args.backend, use_lexical_index=False, max_workers=1)
+            sequential_store.shards = store.shards
+            sequential = query_latencies(sequential_store, vectors, args.k)
+            sequential_store.close()
+            store.close()
+
+            shard_means = [statistics.mean(times) * 1000 for times in shard_times.values()]
+            print(f'--- {num_shards:>2} shards: build {build_time:.2f}s, rebuild one shard {rebuild_time:.2f}s, '
+                  f'recall@{args.k} {recall:.1%} ---')
+            print(f'---           fan-out p50 {percentile(fan_out, 0.5) * 1000:.2f}ms '
+                  f'p95 {percentile(fan_out, 0.95) * 1000:.2f}ms, '
+                  f'sequential p50 {percentile(sequential, 0.5) * 1000:.2f}ms, '
+                  f'one shard p50 {percentile(single, 0.5) * 1000:.2f}ms, '
+                  f'per-shard search mean {statistics.mean(shard_means):.2f}ms max {max(shard_means):.2f}ms ---')
+
+
+if __name__ == '__main__':
+    main()
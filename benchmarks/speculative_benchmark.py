@@ -0,0 +1,104 @@
+"""
+Measures per-turn latency and answer changes of speculative retrieval against the sequential history-aware
+retriever on multi-turn conversations.
+
+The corpus names a person and a client on every page, and every conversation asks about one page with
+follow-ups like "Which client does he work for?". The fake chat model rewrites follow-ups by replacing pronouns
+with the name last mentioned by the user. Answer quality is measured as the share of turns whose retrieved
+context mentions the person or client asked about, compared turn by turn between the two modes. Query embeddings
+take --embed-latency seconds to stand in for the model.
+
+Usage:
+    python -m benchmarks.speculative_benchmark --conversations 30 --llm-latency 0.3
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from benchmarks.FakeChatModel import FakeChatModel
+from benchmarks.retrieval_benchmark import SlowEmbedding, generate_named_corpus
+from rag_chatbot.RagChatBot import RagChatBot
+from rag_chatbot.SpeculativeRetriever import SpeculativeRetriever
+from rag_data_loading.DocumentPreprocessor import DocumentPreprocessor
+from rag_vector_store.VectorStore import VectorStore
+
+TURNS = ['Who is {person}?', 'Which client does he work for?', 'What did we do for {client}?',
+         'Tell me more about their project']
+
+
+class FakeRewritingChatModel(FakeChatModel):
+    """
+    FakeChatModel that rewrites follow-up questions by replacing pronouns with the name last mentioned.
+    """
+
+    names: frozenset = frozenset()
+
+    def _tokens(self, messages: list[BaseMessage]) -> list[str]:
+        if 'rephrase the follow-up question' not in str(messages[0].content):
+            return super()._tokens(messages)
+        name = next((word for message in reversed(messages[1:-1]) if isinstance(message, HumanMessage)
+                     for word in reversed(str(message.content).replace('?', '').split()) if word in self.names), '')
+        words = [name if name and word.lower() in ('he', 'she', 'their', 'they', 'it') else word
+                 for word in str(messages[-1].content).split()]
+        return [word + ' ' for word in words]
+
+
+def run_conversations(chatbot: RagChatBot, conversations: list[tuple[str, str]]) -> list[dict]:
+    turns = []
+    for person, client in conversations:
+        history = []
+        for position, template in enumerate(TURNS):
+            query = template.format(person=person, client=client)
+            start = time.perf_counter()
+            result = chatbot.ask(query, history)
+            turns.append({'position': position, 'latency': time.perf_counter() - start,
+                          'relevant': any(person in document.page_content or client in document.page_content
+                                          for document in result['context'])})
+            history += [HumanMessage(query), AIMessage(result['answer'])]
+    return turns
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus-pages', type=int, default=200, help='Pages of the generated corpus.')
+    parser.add_argument('--conversations', type=int, default=30, help='Number of conversations.')
+    parser.add_argument('--llm-latency', type=float, default=0.3, help='Fake chat model time to first token in s.')
+    parser.add_argument('--embed-latency', type=float, default=0.02, help='Query embedding latency in s.')
+    args = parser.parse_args()
+
+    elements, names = generate_named_corpus(args.corpus_pages)
+    documents = DocumentPreprocessor.clean_chunk_transform(elements)
+    conversations = [(names[2 * page], names[2 * page + 1]) for page in range(min(args.conversations, args.corpus_pages))]
+    llm = FakeRewritingChatModel(first_token_latency=args.llm_latency, token_latency=0.0, names=frozenset(names))
+
+    with tempfile.TemporaryDirectory() as directory:
+        vector_db = VectorStore(documents, persist_directory=os.path.join(directory, 'store'), embedding_cache_dir=None,
+                                embedding=SlowEmbedding(DeterministicFakeEmbedding(size=768), args.embed_latency))
+        vector_db.create_vector_store()
+
+        results = {}
+        for mode, speculative in (('sequential', False), ('speculative', True)):
+            chatbot = RagChatBot(vector_db, llm=llm, use_answer_cache=False, retrieval_mode='hybrid',
+                                 speculative_retrieval=speculative)
+            results[mode] = run_conversations(chatbot, conversations)
+            follow_ups = [turn['latency'] for turn in results[mode] if turn['position']]
+            print(f'--- {mode:>11}: follow-up latency mean {statistics.mean(follow_ups) * 1000:.0f}ms, '
+                  f'p50 {statistics.median(follow_ups) * 1000:.0f}ms, '
+                  f'relevant context {statistics.mean(turn["relevant"] for turn in results[mode]):.1%} ---')
+            if isinstance(chatbot.history_aware_retriever, SpeculativeRetriever):
+                print(f'--- speculative retriever: {chatbot.history_aware_retriever.stats} ---')
+
+    pairs = [(old, new) for old, new in zip(results['sequential'], results['speculative']) if old['position']]
+    saved = statistics.mean(old['latency'] - new['latency'] for old, new in pairs)
+    print(f'--- saved per follow-up turn: {saved * 1000:.0f}ms, relevant context lost on '
+          f'{sum(old["relevant"] and not new["relevant"] for old, new in pairs)} and gained on '
+          f'{sum(new["relevant"] and not old["relevant"] for old, new in pairs)} of {len(pairs)} follow-ups ---')
+
+
+if __name__ == '__main__':
+    main()
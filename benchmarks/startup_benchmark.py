@@ -0,0 +1,117 @@
+"""
+Measures the cold start of the query path in fresh processes: import time, time until the vector store is open,
+time until the embedding model is loaded (readiness) and time to the first answer.
+
+The 'lazy' start imports only the query path and loads the embedding model in a background thread while the
+vector store opens. The 'eager' start imports the crawling and preprocessing stack and loads the model before
+opening the store, like `main.py` did before. The fake embedding model sleeps for --model-load-time seconds
+when it is loaded to stand in for the transformer model; pass --embedding huggingface to load the real one.
+
+Usage:
+    python -m benchmarks.startup_benchmark --runs 3 --model-load-time 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+START = time.perf_counter()
+
+INGEST_MODULES = ('unstructured', 'bs4', 'rag_data_loading', 'langchain_huggingface', 'sentence_transformers', 'torch')
+
+
+def make_embedding(args):
+    from rag_vector_store.LazyEmbeddings import LazyEmbeddings
+
+    def load():
+        if args.embedding == 'huggingface':
+            from rag_vector_store.VectorStore import VectorStore
+            return VectorStore.load_embedding_model('sentence-transformers/all-mpnet-base-v2')
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        time.sleep(args.model_load_time)
+        return DeterministicFakeEmbedding(size=768)
+
+    return LazyEmbeddings(load, 'startup-benchmark')
+
+
+def build_store(directory: str, args) -> None:
+    from langchain.schema import Document
+    from rag_vector_store.VectorStore import VectorStore
+
+    documents = [Document(page_content=f'Document {i} about project {i % 7} and client {i % 11}.',
+                          metadata={'url': f'http://fixture/{i}'}) for i in range(args.chunks)]
+    vector_db = VectorStore(documents, persist_directory=directory, embedding_cache_dir=None,
+                            embedding=make_embedding(args), backend=args.backend)
+    vector_db.create_vector_store()
+
+
+def run_child(args) -> None:
+    """
+    Start the query path once and print the timings, relative to the start of the interpreter, as JSON.
+    """
+    timings = {}
+    if args.child == 'eager':
+        import rag_data_loading.RagWebCrawler  # noqa: F401
+        import rag_data_loading.DocumentPreprocessor  # noqa: F401
+    from benchmarks.FakeChatModel import FakeChatModel
+    from rag_chatbot.RagChatBot import RagChatBot
+    from rag_vector_store.VectorStore import VectorStore
+    timings['imports'] = time.perf_counter() - START
+
+    vector_db = VectorStore(persist_directory=args.child_directory, embedding_cache_dir=None,
+                            embedding=make_embedding(args), backend=args.backend)
+    vector_db.warm_up(background=args.child == 'lazy')
+    vector_db.create_vector_store()
+    chatbot = RagChatBot(vector_db, llm=FakeChatModel(first_token_latency=0.0, token_latency=0.0),
+                         use_answer_cache=False)
+    timings['store_open'] = time.perf_counter() - START
+
+    vector_db.embedding.ready.wait()
+    timings['ready'] = time.perf_counter() - START
+    chatbot.ask('What did the team do for client 3?')
+    timings['first_answer'] = time.perf_counter() - START
+    timings['ingest_modules'] = [name for name in INGEST_MODULES if name in sys.modules]
+    print(json.dumps(timings))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3, help='Cold starts per mode, the median is reported.')
+    parser.add_argument('--chunks', type=int, default=2000, help='Number of chunks in the store.')
+    parser.add_argument('--backend', choices=['chroma', 'numpy'], default='chroma', help='Vector store backend.')
+    parser.add_argument('--embedding', choices=['fake', 'huggingface'], default='fake', help='Embedding model.')
+    parser.add_argument('--model-load-time', type=float, default=3.0, help='Load time of the fake model in s.')
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--child-directory', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = os.path.join(directory, 'store')
+        build_store(store, args)
+        for mode in ('eager', 'lazy'):
+            runs = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                output = subprocess.run([sys.executable, '-m', 'benchmarks.startup_benchmark', '--child', mode,
+                                         '--child-directory', store, '--backend', args.backend,
+                                         '--embedding', args.embedding,
+                                         '--model-load-time', str(args.model_load_time)],
+                                        capture_output=True, text=True, check=True).stdout
+                process_time = time.perf_counter() - start
+                runs.append({**json.loads(output.strip().splitlines()[-1]), 'process': process_time})
+            median = {key: sorted(run[key] for run in runs)[len(runs) // 2]
+                      for key in ('imports', 'store_open', 'ready', 'first_answer', 'process')}
+            print(f'--- {mode:>5}: imports {median["imports"]:.2f}s, store open {median["store_open"]:.2f}s, '
+                  f'ready {median["ready"]:.2f}s, first answer {median["first_answer"]:.2f}s, '
+                  f'process {median["process"]:.2f}s, ingest modules loaded: '
+                  f'{", ".join(runs[0]["ingest_modules"]) or "none"} ---')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Measures time to first token of the streaming chat path against the blocking `ask` path, using a local
+fake streaming chat model and a small vector store with fake embeddings.
+
+Usage:
+    python -m benchmarks.streaming_benchmark --queries 10 --first-token-latency 0.2 --token-latency 0.01
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from langchain.schema import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from benchmarks.FakeChatModel import FakeChatModel
+from rag_chatbot.RagChatBot import RagChatBot
+from rag_vector_store.VectorStore import VectorStore
+
+
+def build_chatbot(directory: str, args) -> RagChatBot:
+    documents = [Document(page_content=f'Document {i} about project {i % 7} and client {i % 11}.',
+                          metadata={'url': f'http://fixture/{i}'}) for i in range(200)]
+    vector_db = VectorStore(documents, persist_directory=os.path.join(directory, 'store'), embedding_cache_dir=None,
+                            embedding=DeterministicFakeEmbedding(size=64))
+    vector_db.create_vector_store()
+    llm = FakeChatModel(first_token_latency=args.first_token_latency, token_latency=args.token_latency)
+    return RagChatBot(vector_db, llm=llm, use_answer_cache=False)
+
+
+async def time_streaming(chatbot: RagChatBot, query: str) -> tuple[float, float]:
+    async for event in chatbot.astream_answer(query):
+        if event['type'] == 'done':
+            return event['time_to_first_token'], event['total_time']
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=10, help='Number of queries per mode.')
+    parser.add_argument('--first-token-latency', type=float, default=0.2, help='Fake model time to first token in s.')
+    parser.add_argument('--token-latency', type=float, default=0.01, help='Fake model delay per token in s.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        chatbot = build_chatbot(directory, args)
+        queries = [f'What did the team do for client {i}?' for i in range(args.queries)]
+
+        blocking = []
+        for query in queries:
+            start = time.perf_counter()
+            chatbot.ask(query)
+            blocking.append(time.perf_counter() - start)
+
+        streaming = [asyncio.run(time_streaming(chatbot, query)) for query in queries]
+
+    print(f'--- blocking:  first output after {statistics.median(blocking):.3f}s (median) ---')
+    print(f'--- streaming: first token after {statistics.median(t for t, _ in streaming):.3f}s, '
+          f'complete after {statistics.median(t for _, t in streaming):.3f}s (median) ---')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Compares the Chroma and the memory-mapped numpy vector backends (float32 and int8): build time, open time,
+resident memory, query latency and recall@k against exact float32 search.
+
+Every backend is opened and queried in a fresh process, so that open time and memory include loading the
+backend. Embeddings are deterministic fake embeddings unless --embedding huggingface is passed. The fake
+embeddings are random vectors, a worst case for the approximate HNSW index of Chroma, so its recall is only
+meaningful with the real model.
+
+Usage:
+    python -m benchmarks.vector_backend_benchmark --chunks 20000 --queries 200
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from langchain.schema import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from benchmarks.FixtureSite import WORDS
+from rag_vector_store.VectorStore import VectorStore
+
+BACKENDS = {
+    'chroma': {'backend': 'chroma'},
+    'numpy-f32': {'backend': 'numpy'},
+    'numpy-int8': {'backend': 'numpy', 'quantize_vectors': True},
+}
+
+
+def make_embedding(name: str):
+    if name == 'fake':
+        return DeterministicFakeEmbedding(size=768)
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name='sentence-transformers/all-mpnet-base-v2')
+
+
+def make_documents(num_chunks: int, seed: int = 0) -> list[Document]:
+    rng = random.Random(seed)
+    return [Document(page_content=' '.join(rng.choice(WORDS) for _ in range(rng.randint(40, 120))) + f' ({i})',
+                     metadata={'url': f'http://fixture/page/{i // 5}.html'}) for i in range(num_chunks)]
+
+
+def open_store(directory: str, name: str, embedding: str) -> VectorStore:
+    vector_db = VectorStore(persist_directory=directory, embedding_cache_dir=None, embedding=make_embedding(embedding),
+                            use_lexical_index=False, **BACKENDS[name])
+    vector_db.create_vector_store()
+    return vector_db
+
+
+def resident_memory_mb() -> float:
+    # Linux only, the resident set size is the second field of /proc/self/statm in pages
+    with open('/proc/self/statm', encoding='utf-8') as file:
+        return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+
+def run_child(args) -> None:
+    """
+    Open one backend, answer the queries and print the measurements as JSON.
+    """
+    with open(args.child_input, encoding='utf-8') as file:
+        data = json.load(file)
+    memory_before = resident_memory_mb()
+    start = time.perf_counter()
+    vector_db = open_store(args.child_directory, args.child, args.embedding)
+    vector_db.vector_store.similarity_search(data['queries'][0], k=args.k)
+    open_time = time.perf_counter() - start
+
+    latencies, recall = [], 0.0
+    for query, expected in zip(data['queries'], data['expected']):
+        start = time.perf_counter()
+        results = vector_db.vector_store.similarity_search(query, k=args.k)
+        latencies.append(time.perf_counter() - start)
+        recall += len({VectorStore.document_id(document) for document in results} & set(expected)) / len(expected)
+    latencies.sort()
+    print(json.dumps({
+        'open_time': open_time,
+        'memory_mb': resident_memory_mb() - memory_before,
+        'latency_p50': latencies[len(latencies) // 2],
+        'latency_p95': latencies[min(int(0.95 * len(latencies)), len(latencies) - 1)],
+        'recall': recall / len(data['queries']),
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chunks', type=int, default=20_000, help='Number of chunks in the store.')
+    parser.add_argument('--queries', type=int, default=200, help='Number of queries.')
+    parser.add_argument('--k', type=int, default=3, help='Number of retrieved chunks.')
+    parser.add_argument('--embedding', choices=['fake', 'huggingface'], default='fake', help='Embedding model.')
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--child-directory', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--child-input', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args)
+        return
+
+    documents = make_documents(args.chunks)
+    rng = random.Random(1)
+    queries = [' '.join(rng.choice(WORDS) for _ in range(8)) for _ in range(args.queries)]
+    with tempfile.TemporaryDirectory() as directory:
+        stores = {}
+        for name in BACKENDS:
+            vector_db = VectorStore(documents, persist_directory=os.path.join(directory, name), embedding_cache_dir=None,
+                                    embedding=make_embedding(args.embedding), use_lexical_index=False,
+                                    **BACKENDS[name])
+            start = time.perf_counter()
+            vector_db.create_vector_store()
+            stores[name] = (vector_db, time.perf_counter() - start)
+
+        # Exact float32 search is the ground truth
+        exact = stores['numpy-f32'][0].vector_store
+        expected = [[VectorStore.document_id(document) for document in results]
+                    for results in exact.batch_similarity_search(queries, k=args.k)]
+        input_path = os.path.join(directory, 'queries.json')
+        with open(input_path, 'w', encoding='utf-8') as file:
+            json.dump({'queries': queries, 'expected': expected}, file)
+
+        for name, (vector_db, build_time) in stores.items():
+            output = subprocess.run([sys.executable, '-m', 'benchmarks.vector_backend_benchmark', '--child', name,
+                                     '--child-directory', vector_db.persist_directory, '--child-input', input_path,
+                                     '--k', str(args.k), '--embedding', args.embedding],
+                                    capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            size = sum(os.path.getsize(os.path.join(root, file))
+                       for root, _, files in os.walk(vector_db.persist_directory) for file in files)
+            print(f'--- {name:>10}: build {build_time:.2f}s, open {result["open_time"]:.3f}s, '
+                  f'+{result["memory_mb"]:.0f} MB, {size / 2 ** 20:.1f} MB on disk, '
+                  f'latency p50 {result["latency_p50"] * 1000:.2f}ms p95 {result["latency_p95"] * 1000:.2f}ms, '
+                  f'recall@{args.k} {result["recall"]:.1%} ---')
+
+
+if __name__ == '__main__':
+    main()
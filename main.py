@@ -1,7 +1,5 @@
 import os
 
-from rag_data_loading.RagWebCrawler import RagWebCrawler
-from rag_data_loading.DocumentPreprocessor import DocumentPreprocessor
 from rag_vector_store.VectorStore import VectorStore
 from rag_chatbot.RagChatBot import RagChatBot
 
@@ -11,30 +9,43 @@ from rag_chatbot.RagChatBot import RagChatBot
 # Define the base URL for crawling
 url_name = 'https://onethousand.ai/'
 
-# Check if the vector store directory exists
-if not os.path.exists("ChromaDBVectorStore"):
-    # Initialize the web crawler with the base URL and an external link
-    Crawler = RagWebCrawler(url_name, external_urls=['https://www.linkedin.com/'])
+# Set to True to re-crawl the website and incrementally update an existing vector store
+refresh_vector_store = False
 
-    # Crawl the website to gather internal and external links
-    Crawler.get_links()
+# The guard keeps worker processes of the parallel ingest from re-running the script
+if __name__ == '__main__':
+    # Check if the vector store directory exists
+    if not os.path.exists("ChromaDBVectorStore") or refresh_vector_store:
+        # The crawling and preprocessing stack is only imported when it is needed
+        from rag_data_loading.RagWebCrawler import RagWebCrawler
+        from rag_data_loading.DocumentPreprocessor import DocumentPreprocessor
 
-    # Load content from the discovered links
-    web_content = Crawler.load_web_content()
+        # Initialize the web crawler with the base URL and an external link
+        Crawler = RagWebCrawler(url_name, external_urls=['https://www.linkedin.com/'])
 
-    # Process the extracted web content: cleaning, chunking, and transforming into LangChain documents
-    document_chunks = DocumentPreprocessor.clean_chunk_transform(web_content)
+        # Crawl the website to gather internal and external links
+        Crawler.get_links()
 
-    # Initialize the vector database with processed documents
-    Vector_Store = VectorStore(document_chunks)
-    Vector_Store.create_vector_store()
+        # Load the HTML of the discovered links
+        web_pages = Crawler.load_web_pages()
 
-else:
-    # Load the existing vector store
-    Vector_Store = VectorStore()
-    Vector_Store.create_vector_store()
+        # Process the pages in parallel: partitioning, cleaning, chunking, and transforming into LangChain documents
+        document_chunks = DocumentPreprocessor.clean_chunk_transform_pages(web_pages)
 
-# Initialize the chatbot with the vector store and start an interactive conversation
-ChatBot = RagChatBot(Vector_Store)
-ChatBot.continual_chat()
+        # Initialize the vector database with processed documents, only new or changed chunks are embedded
+        Vector_Store = VectorStore(document_chunks)
+        # Pages that failed to load keep their chunks, only pages answered with 404 or 410 are removed
+        Vector_Store.update_vector_store(gone_urls=Crawler.gone_links)
+
+    else:
+        # Load the existing vector store
+        Vector_Store = VectorStore()
+        Vector_Store.create_vector_store()
+
+        # Load the embedding model in the background while the user types the first question
+        Vector_Store.warm_up()
+
+    # Initialize the chatbot with the vector store and start an interactive conversation
+    ChatBot = RagChatBot(Vector_Store)
+    ChatBot.continual_chat()
 
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import random
+import time
+
+from collections.abc import Iterator
+
+from langchain_core.documents import Document
+
+from rag_chatbot.RagChatBot import RagChatBot
+
+
+class BatchAnswerer:
+    """
+    Answers large sets of standalone questions, e.g. evaluation sets, with bounded concurrency.
+
+    Questions are read from a JSON lines file in batches. Every batch is retrieved at once, with one embedding
+    call and one vector store query, while the answers of the previous batch are still being generated. Answers
+    are generated by the question-answer chain of the chatbot with at most `max_concurrency` LLM calls in flight,
+    and calls failing with a rate limit or another transient error are retried with exponential backoff and
+    jitter. Every result is appended to the output file as soon as it is ready, so results arrive out of order
+    and partial results survive an interrupted run.
+
+    Input lines are JSON objects with a 'question' and an optional 'id' (the line number by default). Output
+    lines repeat the input fields and add the 'answer', the retrieved 'sources', the per-item 'timings' in
+    seconds, the number of 'retries' and an 'error' for items that failed.
+
+    Attributes:
+        chatbot (RagChatBot): The chatbot whose retriever and question-answer chain are used.
+        batch_size (int): Number of questions retrieved per batch.
+        max_concurrency (int): Maximum number of concurrent LLM calls.
+        max_retries (int): Maximum number of retries of a failed LLM call.
+        initial_backoff (float): Delay in seconds before the first retry, doubled on every further retry.
+        max_backoff (float): Upper bound of the retry delay in seconds.
+        stats (dict): Counters for 'questions', 'errors' and 'retries' of the last run.
+    """
+
+    RETRYABLE_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+
+    def __init__(self,
+                 chatbot: RagChatBot,
+                 batch_size: int = 32,
+                 max_concurrency: int = 8,
+                 max_retries: int = 5,
+                 initial_backoff: float = 1.0,
+                 max_backoff: float = 30.0
+                 ):
+        """
+        Initialize the batch answerer.
+
+        Args:
+            chatbot (RagChatBot): The chatbot whose retriever and question-answer chain are used.
+            batch_size (int, optional): Number of questions retrieved per batch. Defaults to 32.
+            max_concurrency (int, optional): Maximum number of concurrent LLM calls. Defaults to 8.
+            max_retries (int, optional): Maximum number of retries of a failed LLM call. Defaults to 5.
+            initial_backoff (float, optional): Delay before the first retry in seconds. Defaults to 1.0.
+            max_backoff (float, optional): Upper bound of the retry delay in seconds. Defaults to 30.0.
+        """
+        self.chatbot = chatbot
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.stats = {'questions': 0, 'errors': 0, 'retries': 0}
+
+    @staticmethod
+    def read_questions(path: str) -> Iterator[dict]:
+        """
+        Read the questions of a JSON lines file, skipping empty lines.
+
+        Args:
+            path (str): Path of the input file.
+
+        Yields:
+            dict: The input records, with an 'id' added if missing.
+        """
+        with open(path, encoding='utf-8') as file:
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if 'question' not in record:
+                    raise ValueError(f'{path}:{line_number} has no "question" field.')
+                record.setdefault('id', line_number)
+                yield record
+
+    @classmethod
+    def is_retryable(cls, error: Exception) -> bool:
+        """
+        Returns:
+            bool: Whether the error is a rate limit or another transient error of the LLM API.
+        """
+        status_code = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None),
+                                                                       'status_code', None)
+        if status_code is not None:
+            return status_code in cls.RETRYABLE_STATUS_CODES
+        return 'RateLimit' in type(error).__name__ or isinstance(error, (TimeoutError, ConnectionError))
+
+    def backoff(self, attempt: int, error: Exception) -> float:
+        """
+        Returns:
+            float: Seconds to wait before the given retry, the Retry-After header of the error if it has one,
+                   otherwise exponential backoff with full jitter.
+        """
+        headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+        try:
+            return min(float(headers.get('retry-after')), self.max_backoff)
+        except (TypeError, ValueError):
+            return random.uniform(0, min(self.initial_backoff * 2 ** attempt, self.max_backoff))
+
+    @staticmethod
+    def sources(documents: list[Document]) -> list[dict]:
+        return [{'url': document.metadata.get('url') or document.metadata.get('source'),
+                 'content': document.page_content} for document in documents]
+
+    async def answer(self, record: dict, documents: list[Document], retrieval_time: float) -> dict:
+        """
+        Generate the answer of one question from its retrieved documents, retrying transient errors.
+
+        Args:
+            record (dict): The input record.
+            documents (list[Document]): The retrieved documents.
+            retrieval_time (float): The question's share of its batch's retrieval time in seconds.
+
+        Returns:
+            dict: The output record.
+        """
+        result = {**record, 'answer': None, 'sources': self.sources(documents), 'retries': 0}
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                result['answer'] = await self.chatbot.question_answer_chain.ainvoke(
+                    {'input': record['question'], 'context': documents}, config=self.chatbot._chain_config())
+                break
+            except Exception as error:
+                if attempt == self.max_retries or not self.is_retryable(error):
+                    result['error'] = f'{type(error).__name__}: {error}'
+                    break
+                result['retries'] += 1
+                await asyncio.sleep(self.backoff(attempt, error))
+        result['timings'] = {'retrieval': retrieval_time, 'generation': time.perf_counter() - start}
+        if hasattr(documents, 'report'):
+            result['packing'] = documents.report
+        return result
+
+    async def arun(self, input_path: str, output_path: str) -> dict:
+        """
+        Answer all questions of the input file and stream the results to the output file.
+
+        Args:
+            input_path (str): Path of the JSON lines file with the questions.
+            output_path (str): Path of the JSON lines file the results are written to.
+
+        Returns:
+            dict: Number of 'questions', 'errors' and 'retries', the 'total_time' and the 'questions_per_s'
+                  throughput, the summed 'retrieval_time' and the 'latency_p50' and 'latency_p95' of generation.
+        """
+        self.stats = {'questions': 0, 'errors': 0, 'retries': 0}
+        slots = asyncio.Semaphore(self.max_concurrency)
+        latencies, retrieval_time, pending = [], 0.0, set()
+        start = time.perf_counter()
+
+        with open(output_path, 'w', encoding='utf-8') as output:
+
+            async def answer_and_write(record: dict, documents: list[Document], item_retrieval_time: float) -> None:
+                try:
+                    result = await self.answer(record, documents, item_retrieval_time)
+                finally:
+                    slots.release()
+                output.write(json.dumps(result, ensure_ascii=False) + '\n')
+                output.flush()
+                self.stats['questions'] += 1
+                self.stats['retries'] += result['retries']
+                self.stats['errors'] += 'error' in result
+                latencies.append(result['timings']['generation'])
+
+            def batches() -> Iterator[list[dict]]:
+                batch = []
+                for record in self.read_questions(input_path):
+                    batch.append(record)
+                    if len(batch) == self.batch_size:
+                        yield batch
+                        batch = []
+                if batch:
+                    yield batch
+
+            for batch in batches():
+                # Retrieval blocks, it runs in a thread while the answers of earlier batches are generated
+                batch_start = time.perf_counter()
+                contexts = await asyncio.to_thread(self.chatbot.retrieve_batch, [r['question'] for r in batch])
+                batch_time = time.perf_counter() - batch_start
+                retrieval_time += batch_time
+                for record, documents in zip(batch, contexts):
+                    await slots.acquire()
+                    task = asyncio.create_task(answer_and_write(record, documents, batch_time / len(batch)))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+            await asyncio.gather(*pending)
+
+        total_time = time.perf_counter() - start
+        latencies.sort()
+        return {
+            **self.stats,
+            'total_time': total_time,
+            'questions_per_s': self.stats['questions'] / total_time if total_time else 0.0,
+            'retrieval_time': retrieval_time,
+            'latency_p50': latencies[len(latencies) // 2] if latencies else None,
+            'latency_p95': latencies[min(int(0.95 * len(latencies)), len(latencies) - 1)] if latencies else None,
+        }
+
+    def run(self, input_path: str, output_path: str) -> dict:
+        """
+        Blocking entry point, see `arun`. Prints the throughput report.
+        """
+        report = asyncio.run(self.arun(input_path, output_path))
+        print(f'--- {report["questions"]} questions answered in {report["total_time"]:.2f}s '
+              f'({report["questions_per_s"]:.1f} questions/s), {report["errors"]} errors, '
+              f'{report["retries"]} retries, retrieval {report["retrieval_time"]:.2f}s ---')
+        return report
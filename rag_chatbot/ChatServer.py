@@ -0,0 +1,223 @@
+import asyncio
+import json
+import time
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from rag_chatbot.ConversationMemory import ConversationMemory
+from rag_chatbot.RagChatBot import RagChatBot
+from rag_chatbot.SessionStore import SessionStore
+from rag_instrumentation.Instrumentation import instrumentation
+
+
+class ChatServer:
+    """
+    An asyncio HTTP server that serves many concurrent chat sessions from one RagChatBot.
+
+    All sessions share the chatbot and with it the vector store and the embedding model, while every session
+    keeps its own token-budgeted chat history in a SessionStore. Blocking work such as embedding and Chroma
+    searches runs in a bounded thread pool, at most `max_concurrent_answers` answers are generated at a time
+    and requests beyond `max_pending` waiting or running answers are rejected with 503 so that clients back off.
+
+    Endpoints:
+        POST /chat            {"message": str, "session_id": str (optional)} -> answer, sources and timings
+        POST /chat/stream     same body, streams newline-delimited JSON events (sources, token, done)
+        DELETE /sessions/{id} ends a session
+        GET /stats            sessions, in-flight answers, rejections and latency percentiles
+        GET /metrics          per-stage spans and counters in the Prometheus text format
+        GET /health           200 as soon as the server accepts connections
+        GET /ready            200 once the embedding model is loaded, 503 while it is still warming up
+
+    Attributes:
+        chatbot (RagChatBot): The shared chatbot.
+        sessions (SessionStore): The per-session chat histories.
+        max_concurrent_answers (int): Maximum number of answers generated at the same time.
+        max_pending (int): Maximum number of answers waiting or running before requests are rejected.
+        retrieval_workers (int): Size of the thread pool for blocking retrieval work.
+        stats (dict): Counters for 'requests', 'rejected' and 'errors'.
+    """
+
+    def __init__(self,
+                 chatbot: RagChatBot,
+                 max_concurrent_answers: int = 16,
+                 max_pending: int = 256,
+                 retrieval_workers: int = 8,
+                 session_idle_timeout: float = 1800.0
+                 ):
+        """
+        Initialize the chat server.
+
+        Args:
+            chatbot (RagChatBot): The shared chatbot.
+            max_concurrent_answers (int, optional): Maximum number of concurrent answers. Defaults to 16.
+            max_pending (int, optional): Maximum number of waiting or running answers. Defaults to 256.
+            retrieval_workers (int, optional): Size of the thread pool for blocking retrieval work. Defaults to 8.
+            session_idle_timeout (float, optional): Seconds after which idle sessions are evicted. Defaults to 1800.
+        """
+        self.chatbot = chatbot
+        self.max_concurrent_answers = max_concurrent_answers
+        self.max_pending = max_pending
+        self.retrieval_workers = retrieval_workers
+        self.sessions = SessionStore(
+            lambda: ConversationMemory(chatbot.llm, max_tokens=chatbot.history_token_budget),
+            idle_timeout=session_idle_timeout
+        )
+        self.stats = {'requests': 0, 'rejected': 0, 'errors': 0}
+
+        self._pending = 0
+        self._answer_slots = None
+        self._latencies = deque(maxlen=10_000)
+        self._eviction_task = None
+
+    def build_app(self) -> web.Application:
+        """
+        Returns:
+            web.Application: The aiohttp application serving the chat endpoints.
+        """
+        app = web.Application()
+        app.add_routes([
+            web.post('/chat', self.handle_chat),
+            web.post('/chat/stream', self.handle_chat_stream),
+            web.delete('/sessions/{session_id}', self.handle_delete_session),
+            web.get('/stats', self.handle_stats),
+            web.get('/metrics', self.handle_metrics),
+            web.get('/health', self.handle_health),
+            web.get('/ready', self.handle_ready),
+        ])
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    async def _on_startup(self, app: web.Application) -> None:
+        # LangChain runs blocking retriever and embedding calls in the default executor, bound its size
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=self.retrieval_workers))
+        self._answer_slots = asyncio.Semaphore(self.max_concurrent_answers)
+        self._eviction_task = asyncio.create_task(self.sessions.run_eviction())
+        # Accept connections right away and load the embedding model in the background, see /ready
+        self.chatbot.warm_up(background=True)
+
+    async def _on_cleanup(self, app: web.Application) -> None:
+        self._eviction_task.cancel()
+
+    async def _read_request(self, request: web.Request) -> tuple[str, str, dict]:
+        try:
+            data = await request.json()
+        except json.JSONDecodeError:
+            raise web.HTTPBadRequest(text='Request body must be JSON.')
+        message = data.get('message') if isinstance(data, dict) else None
+        if not isinstance(message, str) or not message.strip():
+            raise web.HTTPBadRequest(text="Field 'message' is required.")
+
+        if self._pending >= self.max_pending:
+            self.stats['rejected'] += 1
+            raise web.HTTPServiceUnavailable(text='Server is busy, please retry later.', headers={'Retry-After': '1'})
+
+        self.stats['requests'] += 1
+        session_id, session = self.sessions.get(data.get('session_id'))
+        # Reserve the pending slot right away, the handler releases it once the answer is done or abandoned
+        self._pending += 1
+        return message, session_id, session
+
+    async def _answer_events(self, message: str, session: dict):
+        """
+        Answer a message within its session, waiting for the session lock and a free answer slot.
+
+        The pending slot is reserved by `_read_request` and released by the handler.
+        """
+        start = time.perf_counter()
+        try:
+            async with session['lock'], self._answer_slots:
+                memory = session['memory']
+                async for event in self.chatbot.astream_answer(message, memory.messages()):
+                    if event['type'] == 'done':
+                        await asyncio.to_thread(memory.add_turn, message, event['answer'])
+                        event['queue_time'] = time.perf_counter() - start - event['total_time']
+                    yield event
+            self._latencies.append(time.perf_counter() - start)
+        except Exception:
+            self.stats['errors'] += 1
+            raise
+
+    @staticmethod
+    def _serialize(event: dict) -> dict:
+        if event['type'] == 'sources':
+            return {'type': 'sources',
+                    'documents': [{'page_content': document.page_content, 'metadata': document.metadata}
+                                  for document in event['documents']]}
+        return event
+
+    async def handle_chat(self, request: web.Request) -> web.Response:
+        message, session_id, session = await self._read_request(request)
+        sources, done = [], {}
+        events = self._answer_events(message, session)
+        try:
+            async for event in events:
+                if event['type'] == 'sources':
+                    sources = self._serialize(event)['documents']
+                elif event['type'] == 'done':
+                    done = event
+        finally:
+            await events.aclose()
+            self._pending -= 1
+        return web.json_response({'session_id': session_id, 'sources': sources, **done})
+
+    async def handle_chat_stream(self, request: web.Request) -> web.StreamResponse:
+        message, session_id, session = await self._read_request(request)
+        events = self._answer_events(message, session)
+        try:
+            response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+            await response.prepare(request)
+            await response.write((json.dumps({'type': 'session', 'session_id': session_id}) + '\n').encode('utf-8'))
+            async for event in events:
+                await response.write((json.dumps(self._serialize(event)) + '\n').encode('utf-8'))
+            await response.write_eof()
+        finally:
+            # A disconnected client cancels the handler or fails the write, close the generator right away so
+            # that it leaves the session lock and the answer slot instead of waiting for garbage collection
+            await events.aclose()
+            self._pending -= 1
+        return response
+
+    async def handle_delete_session(self, request: web.Request) -> web.Response:
+        if not self.sessions.delete(request.match_info['session_id']):
+            raise web.HTTPNotFound(text='Unknown session.')
+        return web.json_response({'deleted': True})
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float):
+            return latencies[min(int(p * len(latencies)), len(latencies) - 1)] if latencies else None
+
+        return web.json_response({
+            **self.stats,
+            'sessions': len(self.sessions),
+            'evicted_sessions': self.sessions.evicted,
+            'pending': self._pending,
+            'latency_p50': percentile(0.50),
+            'latency_p95': percentile(0.95),
+            'latency_p99': percentile(0.99),
+        })
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=instrumentation.prometheus_text(), content_type='text/plain')
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({'status': 'ok'})
+
+    async def handle_ready(self, request: web.Request) -> web.Response:
+        ready = self.chatbot.is_ready()
+        return web.json_response({'ready': ready}, status=200 if ready else 503)
+
+    def run(self, host: str = '127.0.0.1', port: int = 8080) -> None:
+        """
+        Serve the chat endpoints until interrupted.
+
+        Args:
+            host (str, optional): Interface to listen on. Defaults to '127.0.0.1'.
+            port (int, optional): Port to listen on. Defaults to 8080.
+        """
+        web.run_app(self.build_app(), host=host, port=port)
@@ -0,0 +1,185 @@
+import re
+import threading
+
+from collections.abc import Callable
+
+from langchain_core.documents import Document
+
+from rag_instrumentation.Instrumentation import instrumentation
+
+
+class PackedDocuments(list):
+    """
+    The documents selected by ContextPacker, with the packing `report` of the query attached.
+    """
+
+    def __init__(self, documents: list[Document], report: dict):
+        super().__init__(documents)
+        self.report = report
+
+
+class ContextPacker:
+    """
+    Packs a pool of retrieved chunks into a small, non-redundant context for the question-answer prompt.
+
+    Chunks are selected greedily by maximal marginal relevance: every step picks the candidate with the best
+    trade-off between its retrieval rank and its overlap with the chunks already selected, so a pool larger
+    than the number of chunks in the prompt yields more diverse context. Candidates that are near duplicates of
+    a selected chunk are dropped. Overlap is the share of word trigrams of the shorter chunk contained in the
+    other one, which needs no embeddings and also catches a chunk contained in a longer one. The selected chunks
+    are finally cut to the token budget, the chunk crossing the budget is trimmed at a sentence boundary.
+
+    Attributes:
+        max_documents (int): Maximum number of chunks in the context.
+        token_budget (int): Maximum number of context tokens.
+        mmr_lambda (float): Weight of the retrieval rank against the overlap with selected chunks, 1 keeps the
+                            retrieval order.
+        duplicate_threshold (float): Overlap above which a candidate counts as a near duplicate and is dropped.
+        min_trimmed_tokens (int): Trimmed chunks shorter than this are left out.
+        count_tokens (Callable): Counts the tokens of a text.
+        stats (dict): Summed 'queries', 'candidates', 'duplicates', 'tokens_unpacked' and 'tokens_packed'.
+    """
+
+    TOKEN_PATTERN = re.compile(r'\w+')
+    SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+    def __init__(self,
+                 max_documents: int = 3,
+                 token_budget: int = 1000,
+                 mmr_lambda: float = 0.7,
+                 duplicate_threshold: float = 0.8,
+                 min_trimmed_tokens: int = 32,
+                 count_tokens: Callable[[str], int] = None
+                 ):
+        """
+        Initialize the context packer.
+
+        Args:
+            max_documents (int, optional): Maximum number of chunks in the context. Defaults to 3.
+            token_budget (int, optional): Maximum number of context tokens. Defaults to 1000.
+            mmr_lambda (float, optional): Weight of the retrieval rank against redundancy. Defaults to 0.7.
+            duplicate_threshold (float, optional): Overlap above which candidates are dropped. Defaults to 0.8.
+            min_trimmed_tokens (int, optional): Minimum length of a trimmed chunk. Defaults to 32.
+            count_tokens (Callable, optional): Counts the tokens of a text. Defaults to an estimate of
+                                               four characters per token.
+        """
+        self.max_documents = max_documents
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+        self.min_trimmed_tokens = min_trimmed_tokens
+        self.count_tokens = count_tokens if count_tokens is not None else (lambda text: len(text) // 4 + 1)
+        self.stats = {'queries': 0, 'candidates': 0, 'duplicates': 0, 'tokens_unpacked': 0, 'tokens_packed': 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shingles(cls, text: str) -> set[tuple[str, ...]]:
+        words = cls.TOKEN_PATTERN.findall(text.lower())
+        if len(words) < 3:
+            return {tuple(words)} if words else set()
+        return set(zip(words, words[1:], words[2:]))
+
+    @staticmethod
+    def overlap(first: set, second: set) -> float:
+        """
+        Returns:
+            float: Share of the shingles of the smaller set contained in the other set.
+        """
+        if not first or not second:
+            return 0.0
+        return len(first & second) / min(len(first), len(second))
+
+    def select(self, documents: list[Document]) -> tuple[list[int], int]:
+        """
+        Select up to `max_documents` candidates by maximal marginal relevance.
+
+        Args:
+            documents (list[Document]): The candidates, best first.
+
+        Returns:
+            tuple[list[int], int]: Positions of the selected candidates in selection order and the number of
+                                   candidates dropped as near duplicates.
+        """
+        shingles = [self.shingles(document.page_content) for document in documents]
+        redundancy = [0.0] * len(documents)
+        remaining = list(range(len(documents)))
+        selected, duplicates = [], 0
+        while remaining and len(selected) < self.max_documents:
+            best = max(remaining, key=lambda i: self.mmr_lambda * (1 - i / len(documents))
+                                                - (1 - self.mmr_lambda) * redundancy[i])
+            remaining.remove(best)
+            selected.append(best)
+            for i in list(remaining):
+                redundancy[i] = max(redundancy[i], self.overlap(shingles[i], shingles[best]))
+                if redundancy[i] >= self.duplicate_threshold:
+                    remaining.remove(i)
+                    duplicates += 1
+        return selected, duplicates
+
+    def trim(self, text: str, max_tokens: int) -> str:
+        """
+        Cut a text to at most `max_tokens` tokens, at the last sentence end that fits if there is one.
+        """
+        if self.count_tokens(text) <= max_tokens:
+            return text
+        sentences, kept = self.SENTENCE_END.split(text), []
+        for sentence in sentences:
+            if self.count_tokens(' '.join(kept + [sentence])) > max_tokens:
+                break
+            kept.append(sentence)
+        if kept:
+            return ' '.join(kept)
+        # A single sentence longer than the budget is cut at the last word that fits
+        words = text.split()
+        low, high = 0, len(words)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count_tokens(' '.join(words[:middle])) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        return ' '.join(words[:low])
+
+    def pack(self, documents: list[Document]) -> PackedDocuments:
+        """
+        Pack the retrieved candidates into the context of one query.
+
+        Args:
+            documents (list[Document]): The candidates, best first.
+
+        Returns:
+            PackedDocuments: The packed chunks in selection order. Its `report` holds the number of
+                             'candidates', 'selected', 'duplicates' and 'trimmed' chunks, the tokens of the first
+                             `max_documents` candidates ('tokens_unpacked', what the prompt would contain without
+                             packing), the 'tokens_packed' and the 'tokens_saved'.
+        """
+        with instrumentation.span('context_packing'):
+            selected, duplicates = self.select(documents)
+            packed, tokens, trimmed = [], 0, 0
+            for position in selected:
+                document = documents[position]
+                document_tokens = self.count_tokens(document.page_content)
+                if tokens + document_tokens > self.token_budget:
+                    remaining = self.token_budget - tokens
+                    if remaining < self.min_trimmed_tokens:
+                        break
+                    document = Document(id=document.id, page_content=self.trim(document.page_content, remaining),
+                                        metadata={**document.metadata, 'trimmed': True})
+                    document_tokens = self.count_tokens(document.page_content)
+                    trimmed += 1
+                packed.append(document)
+                tokens += document_tokens
+
+            unpacked = sum(self.count_tokens(document.page_content) for document in documents[:self.max_documents])
+            report = {'candidates': len(documents), 'selected': len(packed), 'duplicates': duplicates,
+                      'trimmed': trimmed, 'tokens_unpacked': unpacked, 'tokens_packed': tokens,
+                      'tokens_saved': unpacked - tokens}
+
+        instrumentation.count('prompt_tokens_saved', unpacked - tokens)
+        with self._lock:
+            self.stats['queries'] += 1
+            self.stats['candidates'] += len(documents)
+            self.stats['duplicates'] += duplicates
+            self.stats['tokens_unpacked'] += unpacked
+            self.stats['tokens_packed'] += tokens
+        return PackedDocuments(packed, report)
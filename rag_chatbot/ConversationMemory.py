@@ -0,0 +1,161 @@
+from collections.abc import Callable
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+
+class ConversationMemory:
+    """
+    A token-budgeted chat history with a rolling summary of older turns.
+
+    Recent turns are kept verbatim. Once the history exceeds the token budget, the oldest turns are folded
+    into a running summary with a single LLM call, and enough turns are folded to bring the verbatim part down
+    to `keep_ratio` of the budget. The summary is therefore only updated every few turns, and each update only
+    reads the previous summary plus the newly folded turns. The summary gets the rest of the budget: once it
+    outgrows its share it is condensed with another LLM call and, should the model not comply, cut at a word
+    boundary, so the history stays within the budget unless the last turn alone exceeds it.
+
+    Attributes:
+        llm (BaseChatModel): The language model used to summarise older turns.
+        max_tokens (int): Token budget for the history passed to the chain.
+        keep_ratio (float): Fraction of the budget left for verbatim turns after summarising.
+        count_tokens (Callable): Counts the tokens of a text.
+        summary (str): Rolling summary of the turns that are no longer kept verbatim.
+        messages_recent (list[BaseMessage]): The turns kept verbatim.
+        summarizations (int): Number of summary updates so far.
+        condensations (int): Number of times the summary was condensed to its share of the budget.
+    """
+
+    def __init__(self,
+                 llm: BaseChatModel,
+                 max_tokens: int = 1000,
+                 keep_ratio: float = 0.5,
+                 count_tokens: Callable[[str], int] = None
+                 ):
+        """
+        Initialize an empty conversation memory.
+
+        Args:
+            llm (BaseChatModel): The language model used to summarise older turns.
+            max_tokens (int): Token budget for the history. Defaults to 1000.
+            keep_ratio (float): Fraction of the budget kept verbatim after summarising. Defaults to 0.5.
+            count_tokens (Callable, optional): Counts the tokens of a text. Defaults to an estimate of
+                                               four characters per token.
+        """
+        self.llm = llm
+        self.max_tokens = max_tokens
+        self.keep_ratio = keep_ratio
+        self.count_tokens = count_tokens if count_tokens is not None else (lambda text: len(text) // 4 + 1)
+        self.summary = ''
+        self.messages_recent = []
+        self.summarizations = 0
+        self.condensations = 0
+
+        self.summary_prompt = ChatPromptTemplate.from_messages([
+            ("system",
+             "Progressively summarize the conversation between a user and an AI assistant. "
+             "Extend the current summary with the new lines and return a new concise summary "
+             "that keeps names, facts and open questions."),
+            ("human", "Current summary:\n{summary}\n\nNew lines of conversation:\n{new_lines}\n\nNew summary:"),
+        ])
+        self.summary_chain = self.summary_prompt | self.llm | StrOutputParser()
+
+        self.condense_prompt = ChatPromptTemplate.from_messages([
+            ("system",
+             "Shorten the summary of a conversation between a user and an AI assistant to at most {max_words} "
+             "words. Keep names, facts and open questions, drop details first."),
+            ("human", "Summary:\n{summary}\n\nShortened summary:"),
+        ])
+        self.condense_chain = self.condense_prompt | self.llm | StrOutputParser()
+
+    def _tokens(self, messages: list[BaseMessage]) -> int:
+        return sum(self.count_tokens(message.content) for message in messages)
+
+    @property
+    def summary_budget(self) -> int:
+        """
+        Returns:
+            int: Tokens left for the summary next to the verbatim turns.
+        """
+        return int(self.max_tokens * (1 - self.keep_ratio))
+
+    def total_tokens(self) -> int:
+        """
+        Returns:
+            int: Estimated number of tokens of the summary and the verbatim turns.
+        """
+        summary_tokens = self.count_tokens(self.summary) if self.summary else 0
+        return summary_tokens + self._tokens(self.messages_recent)
+
+    def add_turn(self, query: str, answer: str) -> None:
+        """
+        Append a question/answer turn and summarise older turns if the budget is exceeded.
+
+        Args:
+            query (str): The user query.
+            answer (str): The AI answer.
+        """
+        self.messages_recent.append(HumanMessage(content=query))
+        self.messages_recent.append(AIMessage(content=answer))
+
+        if self.total_tokens() <= self.max_tokens:
+            return
+
+        # Fold whole turns until the verbatim part fits into keep_ratio of the budget, keep at least the last turn
+        folded = []
+        while len(self.messages_recent) > 2 and self._tokens(self.messages_recent) > self.max_tokens * self.keep_ratio:
+            folded.extend(self.messages_recent[:2])
+            self.messages_recent = self.messages_recent[2:]
+        if folded:
+            self.update_summary(folded)
+        if self.summary and self.count_tokens(self.summary) > self.summary_budget:
+            self.condense_summary()
+
+    def update_summary(self, messages: list[BaseMessage]) -> None:
+        """
+        Fold messages into the rolling summary.
+
+        Args:
+            messages (list[BaseMessage]): The messages to fold, oldest first.
+        """
+        new_lines = '\n'.join(
+            f'{"User" if isinstance(message, HumanMessage) else "AI"}: {message.content}' for message in messages
+        )
+        self.summary = self.summary_chain.invoke({"summary": self.summary or '(none)', "new_lines": new_lines})
+        self.summarizations += 1
+
+    def condense_summary(self) -> None:
+        """
+        Shorten the summary to its share of the budget, cutting it at a word boundary if the LLM answer is
+        still too long.
+        """
+        # Roughly three words per four tokens
+        max_words = max(self.summary_budget * 3 // 4, 1)
+        summary = self.condense_chain.invoke({"summary": self.summary, "max_words": max_words})
+        if self.count_tokens(summary) > self.summary_budget:
+            words = summary.split()
+            low, high = 0, len(words)
+            while low < high:
+                middle = (low + high + 1) // 2
+                if self.count_tokens(' '.join(words[:middle])) <= self.summary_budget:
+                    low = middle
+                else:
+                    high = middle - 1
+            summary = ' '.join(words[:low])
+        self.summary = summary
+        self.condensations += 1
+
+    def messages(self) -> list[BaseMessage]:
+        """
+        Returns:
+            list[BaseMessage]: The chat history for the chain, the summary first followed by the verbatim turns.
+        """
+        if not self.summary:
+            return list(self.messages_recent)
+        return [SystemMessage(content=f'Summary of the earlier conversation: {self.summary}')] + self.messages_recent
+
+    def clear(self) -> None:
+        self.summary = ''
+        self.messages_recent = []
@@ -1,12 +1,25 @@
 from dotenv import load_dotenv
+import asyncio
 import os
+import time
 
+from collections.abc import AsyncIterator
+
+from rag_vector_store.HybridRetriever import HybridRetriever
+from rag_vector_store.ShardedRetriever import ShardedRetriever
+from rag_vector_store.ShardedVectorStore import ShardedVectorStore
 from rag_vector_store.VectorStore import VectorStore
 from langchain.chains import create_history_aware_retriever, create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from langchain_core.language_models import BaseChatModel
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_groq import ChatGroq
+from langchain_core.runnables import RunnableLambda
+
+from rag_chatbot.ContextPacker import ContextPacker
+from rag_chatbot.ConversationMemory import ConversationMemory
+from rag_chatbot.SemanticCache import SemanticCache
+from rag_chatbot.SpeculativeRetriever import SpeculativeRetriever
+from rag_instrumentation.Instrumentation import InstrumentationCallback, instrumentation
 
 
 
@@ -17,37 +30,105 @@ class RagChatBot:
     and concise answer generation.
 
     Attributes:
-        vector_store (Chroma): The vector database storing embeddings of documents.
+        vector_db (VectorStore or ShardedVectorStore): The vector store wrapper, used for warm-up and readiness.
+        vector_store (Chroma): The vector database storing embeddings of documents, None for sharded stores.
+        num_retrievals (int): Number of document chunks passed to the answer prompt per query.
+        num_candidates (int): Number of document chunks retrieved per query, larger than `num_retrievals` if the
+                              context is packed.
+        context_packer (ContextPacker or None): Selects non-redundant chunks within the token budget from the
+                                                retrieved candidates, None if context packing is disabled.
+        shards (list[str] or None): Names of the shards searched in a sharded store, None searches all shards.
         api_key (str): API key for accessing the Groq LLM service.
         llm (ChatGroq): The language model used for generating responses.
-        retriever (Retriever): Retrieves relevant document chunks from the vector store.
+        retriever (Retriever): Retrieves relevant document chunks from the vector store, the BM25 index or both.
         contextualize_q_prompt (ChatPromptTemplate): Reformulates user questions to be self-contained.
-        history_aware_retriever (Retriever): Enhances retrieval by taking chat history into account.
+        history_aware_retriever (Retriever): Enhances retrieval by taking chat history into account, a
+                                             SpeculativeRetriever in speculative mode.
         qa_prompt (ChatPromptTemplate): The prompt template for generating concise answers.
         question_answer_chain (Chain): Chain combining retrieved documents into a response.
         rag_chain (Chain): The full RAG pipeline including retrieval and answer generation.
+        answer_cache (SemanticCache or None): Cache of answers and retrieved documents for standalone queries.
+        history_token_budget (int): Token budget of the chat history passed to the chain in `continual_chat`.
+        last_timings (dict): Per-stage timings of the last answer, empty while instrumentation is disabled.
     """
 
-    def __init__(self, vector_db: VectorStore, num_retrievals: int = 3):
+    def __init__(self,
+                 vector_db: VectorStore | ShardedVectorStore,
+                 num_retrievals: int = 3,
+                 use_answer_cache: bool = True,
+                 history_token_budget: int = 1000,
+                 llm: BaseChatModel = None,
+                 retrieval_mode: str = 'dense',
+                 speculative_retrieval: bool = False,
+                 context_packing: bool = False,
+                 candidate_pool: int = 10,
+                 context_token_budget: int = 1000,
+                 shards: list[str] = None):
         """
         Initializes the RAG chatbot by setting up the vector store, retrieval mechanisms,
         and LLM-based response generation.
 
         Args:
-            vector_db (VectorStore): The vector store containing embedded documents.
+            vector_db (VectorStore or ShardedVectorStore): The vector store containing embedded documents. Sharded
+                                                           stores only support the 'dense' retrieval mode.
             num_retrievals (int): Number of document chunks to retrieve per query.
+            use_answer_cache (bool): Whether answers to standalone queries are cached. The cache is invalidated
+                                     when the vector store changes.
+            history_token_budget (int): Token budget of the chat history. Older turns beyond the budget are
+                                        condensed into a rolling summary.
+            llm (BaseChatModel, optional): Chat model used instead of the Groq model, e.g. a local fake model
+                                           for offline tests. Defaults to None.
+            retrieval_mode (str): 'dense' searches the vector store, 'hybrid' fuses the vector store and the BM25
+                                  index with reciprocal rank fusion and 'lexical' only searches the BM25 index,
+                                  which never calls the embedding model. In 'lexical' mode the answer cache only
+                                  serves exact matches for the same reason. Defaults to 'dense'.
+            speculative_retrieval (bool): Whether follow-up questions are searched while the LLM rewrites them
+                                          and the rewrite is skipped for questions that look standalone, see
+                                          SpeculativeRetriever. Defaults to False.
+            context_packing (bool): Whether `candidate_pool` chunks are retrieved and packed into at most
+                                    `num_retrievals` non-redundant chunks within `context_token_budget` tokens,
+                                    see ContextPacker. Results then carry the prompt-token savings in 'packing'.
+                                    Defaults to False.
+            candidate_pool (int): Number of chunks retrieved for context packing. Defaults to 10.
+            context_token_budget (int): Token budget of the packed context. Defaults to 1000.
+            shards (list[str], optional): Names of the shards searched in a sharded store, e.g. the sites of one
+                                          tenant. Defaults to all loaded shards.
         """
-        if not vector_db.vector_store:
+        sharded = isinstance(vector_db, ShardedVectorStore)
+        if not (vector_db.shards if sharded else vector_db.vector_store):
             raise ValueError('Vector store does not exist, please create or load vector store.')
-        self.vector_store = vector_db.vector_store
+        if sharded and retrieval_mode != 'dense':
+            raise ValueError(f'Retrieval mode {retrieval_mode!r} is not supported by sharded vector stores.')
+        self.vector_db = vector_db
+        self.vector_store = None if sharded else vector_db.vector_store
+        self.shards = shards
+        self.num_retrievals = num_retrievals
+        self.num_candidates = max(candidate_pool, num_retrievals) if context_packing else num_retrievals
+        self.context_packer = ContextPacker(max_documents=num_retrievals,
+                                            token_budget=context_token_budget) if context_packing else None
 
         # Load API key and LLM model
         load_dotenv()
         self.api_key = os.getenv('GROQ_API_KEY')
-        self.llm = ChatGroq(model='llama-3.3-70b-versatile', api_key=self.api_key)
+        if llm is None:
+            # Imported here, so that callers passing their own model do not pay for the Groq client
+            from langchain_groq import ChatGroq
+            llm = ChatGroq(model='llama-3.3-70b-versatile', api_key=self.api_key)
+        self.llm = llm
 
         # Define the retriever
-        self.retriever = vector_db.vector_store.as_retriever(search_type="similarity", search_kwargs={"k": num_retrievals})
+        if sharded:
+            self.retriever = ShardedRetriever(sharded_store=vector_db, k=self.num_candidates, shards=shards)
+        elif retrieval_mode == 'dense':
+            self.retriever = vector_db.vector_store.as_retriever(search_type="similarity",
+                                                                 search_kwargs={"k": self.num_candidates})
+        elif retrieval_mode in ('hybrid', 'lexical'):
+            if vector_db.lexical_index is None:
+                raise ValueError(f'Retrieval mode {retrieval_mode!r} requires the lexical index of the vector store.')
+            self.retriever = HybridRetriever(vector_store=vector_db.vector_store, lexical_index=vector_db.lexical_index,
+                                             k=self.num_candidates, mode=retrieval_mode)
+        else:
+            raise ValueError(f"Unknown retrieval mode {retrieval_mode!r}, use 'dense', 'hybrid' or 'lexical'.")
 
         # Contextualize question prompt
         self.contextualize_q_system_prompt = (
@@ -64,9 +145,12 @@ class RagChatBot:
         ])
 
         # History-aware retriever
-        self.history_aware_retriever = create_history_aware_retriever(
-            self.llm, self.retriever, self.contextualize_q_prompt
-        )
+        if speculative_retrieval:
+            self.history_aware_retriever = SpeculativeRetriever(self.llm, self.retriever, self.contextualize_q_prompt)
+        else:
+            self.history_aware_retriever = create_history_aware_retriever(
+                self.llm, self.retriever, self.contextualize_q_prompt
+            )
 
         # Answer generation prompt
         self.qa_system_prompt = (
@@ -87,26 +171,253 @@ class RagChatBot:
         # Create answer generation chain
         self.question_answer_chain = create_stuff_documents_chain(self.llm, self.qa_prompt)
 
+        # Pack the retrieved candidates into a smaller context before answer generation
+        retrieval = self.history_aware_retriever
+        if self.context_packer is not None:
+            retrieval = retrieval | RunnableLambda(self.context_packer.pack, name='context_packing')
+
         # Create the full retrieval-augmented generation (RAG) pipeline
-        self.rag_chain = create_retrieval_chain(self.history_aware_retriever, self.question_answer_chain)
+        self.rag_chain = create_retrieval_chain(retrieval, self.question_answer_chain)
+
+        # Cache for answers to standalone queries
+        self.answer_cache = SemanticCache(vector_db.embedding if retrieval_mode != 'lexical' else None,
+                                          version_fn=vector_db.collection_version) if use_answer_cache else None
+
+        self.history_token_budget = history_token_budget
+        self.last_timings = {}
+
+    def warm_up(self, background: bool = True) -> None:
+        """
+        Load the embedding model before the first query. Lexical-only retrieval never needs it.
+
+        Args:
+            background (bool, optional): Load it in a background thread and return immediately. Defaults to True.
+        """
+        if not isinstance(self.retriever, HybridRetriever) or self.retriever.mode != 'lexical':
+            self.vector_db.warm_up(background=background)
+
+    def is_ready(self) -> bool:
+        """
+        Returns:
+            bool: Whether queries can be answered without waiting for a model to load.
+        """
+        if isinstance(self.retriever, HybridRetriever) and self.retriever.mode == 'lexical':
+            return True
+        return self.vector_db.is_ready()
+
+    @staticmethod
+    def _chain_config() -> dict:
+        # Callbacks cost a little on every chain step, only attach them while instrumentation is enabled
+        return {'callbacks': [InstrumentationCallback()]} if instrumentation.enabled else {}
+
+    def _timings(self, spans: list) -> dict:
+        """
+        Turn the spans collected while answering a query into per-stage timings.
+
+        Args:
+            spans (list): Spans returned by `instrumentation.collect`.
+
+        Returns:
+            dict: Seconds spent per stage, e.g. 'answer_cache', 'contextualize_question', 'embed_query',
+                  'retrieval', 'vector_search' (retrieval without the query embedding) and 'generation'.
+        """
+        timings = instrumentation.breakdown(spans)
+        if 'retrieval' in timings:
+            timings['vector_search'] = instrumentation.self_time(spans, 'retrieval', 'embed_query')
+        self.last_timings = timings
+        return timings
+
+    def ask(self, query: str, chat_history: list = None) -> dict:
+        """
+        Answers a single query with the RAG pipeline.
+
+        Queries without chat history are already standalone and are served from the answer cache when they
+        match an earlier query exactly or semantically.
+
+        Args:
+            query (str): The user query.
+            chat_history (list): The previous messages of the conversation.
+
+        Returns:
+            dict: The chain result with the 'answer', the retrieved 'context' documents, 'cached', which tells
+                  whether the result was served from the cache, the per-stage 'timings' and, with context
+                  packing, the 'packing' report of ContextPacker (None for cached answers).
+        """
+        chat_history = chat_history if chat_history is not None else []
+        use_cache = self.answer_cache is not None and not chat_history
+
+        with instrumentation.collect() as spans:
+            vector = None
+            if use_cache:
+                with instrumentation.span('answer_cache'):
+                    cached, vector = self.answer_cache.lookup(query)
+                if cached is not None:
+                    return {**cached, 'input': query, 'chat_history': chat_history, 'cached': True,
+                            'timings': self._timings(spans), **self._packing(None)}
+
+            start = time.perf_counter()
+            result = self.rag_chain.invoke({"input": query, "chat_history": chat_history}, config=self._chain_config())
+            if use_cache:
+                self.answer_cache.store(query,
+                                        {'answer': result['answer'], 'context': result['context']},
+                                        cost=time.perf_counter() - start,
+                                        vector=vector)
+        return {**result, 'cached': False, 'timings': self._timings(spans), **self._packing(result['context'])}
+
+    def _packing(self, context: list) -> dict:
+        # The packing report travels with the packed documents through the chain
+        if self.context_packer is None:
+            return {}
+        return {'packing': getattr(context, 'report', None)}
+
+    def retrieve_batch(self, queries: list[str]) -> list[list]:
+        """
+        Retrieves the document chunks for many standalone queries at once.
+
+        The queries are embedded in one call and the vector store is searched in one batched query, in hybrid
+        mode the dense results are fused with the BM25 results per query like in the retriever. Packed contexts
+        are PackedDocuments carrying the packing report.
+
+        Args:
+            queries (list[str]): The standalone queries.
+
+        Returns:
+            list[list[Document]]: The retrieved chunks per query.
+        """
+        retriever = self.retriever
+        if isinstance(retriever, ShardedRetriever):
+            results = self.vector_db.batch_similarity_search(queries, self.num_candidates, self.shards)
+        elif not isinstance(retriever, HybridRetriever) or retriever.mode == 'dense':
+            results = self.vector_db.batch_similarity_search(queries, self.num_candidates)
+        elif retriever.mode == 'lexical':
+            results = [retriever.lexical_search(query, retriever.k) for query in queries]
+        else:
+            fetch_k = retriever.fetch_count(retriever.k)
+            dense = self.vector_db.batch_similarity_search(queries, fetch_k)
+            results = [retriever.reciprocal_rank_fusion([ranking, retriever.lexical_search(query, fetch_k)],
+                                                        retriever.k, retriever.rrf_k)
+                       for query, ranking in zip(queries, dense)]
+        if self.context_packer is not None:
+            results = [self.context_packer.pack(documents) for documents in results]
+        return results
+
+    def cache_report(self) -> str:
+        """
+        Summarises the answer cache statistics.
+
+        Returns:
+            str: Hit rate and latency saved by the answer cache.
+        """
+        if self.answer_cache is None:
+            return 'Answer cache disabled.'
+        stats = self.answer_cache.stats
+        return (f'Answer cache: {stats["hits"]} hits ({stats["exact_hits"]} exact), {stats["misses"]} misses, '
+                f'hit rate {self.answer_cache.hit_rate():.1%}, {stats["saved_seconds"]:.2f}s saved.')
+
+    async def astream_answer(self, query: str, chat_history: list = None) -> AsyncIterator[dict]:
+        """
+        Answers a single query and streams the answer tokens as they are generated.
+
+        Yields a 'sources' event with the retrieved documents as soon as retrieval has finished, one 'token'
+        event per answer chunk and a final 'done' event with the full answer and the timings. Standalone
+        queries are served from the answer cache like in `ask`.
+
+        Args:
+            query (str): The user query.
+            chat_history (list): The previous messages of the conversation.
+
+        Yields:
+            dict: Events with a 'type' of 'sources' ('documents'), 'token' ('content') or 'done' ('answer',
+                  'cached', 'time_to_first_token' and 'total_time' in seconds, the per-stage 'timings' and
+                  with context packing the 'packing' report).
+        """
+        chat_history = chat_history if chat_history is not None else []
+        use_cache = self.answer_cache is not None and not chat_history
+        start = time.perf_counter()
+
+        with instrumentation.collect() as spans:
+            vector = None
+            if use_cache:
+                with instrumentation.span('answer_cache'):
+                    cached, vector = await asyncio.to_thread(self.answer_cache.lookup, query)
+                if cached is not None:
+                    yield {'type': 'sources', 'documents': cached['context']}
+                    yield {'type': 'token', 'content': cached['answer']}
+                    elapsed = time.perf_counter() - start
+                    yield {'type': 'done', 'answer': cached['answer'], 'cached': True,
+                           'time_to_first_token': elapsed, 'total_time': elapsed, 'timings': self._timings(spans),
+                           **self._packing(None)}
+                    return
+
+            context, answer_parts, time_to_first_token = [], [], None
+            async for chunk in self.rag_chain.astream({"input": query, "chat_history": chat_history},
+                                                      config=self._chain_config()):
+                if 'context' in chunk:
+                    context = chunk['context']
+                    yield {'type': 'sources', 'documents': context}
+                if chunk.get('answer'):
+                    if time_to_first_token is None:
+                        time_to_first_token = time.perf_counter() - start
+                    answer_parts.append(chunk['answer'])
+                    yield {'type': 'token', 'content': chunk['answer']}
+
+            total_time = time.perf_counter() - start
+            answer = ''.join(answer_parts)
+            if use_cache:
+                self.answer_cache.store(query, {'answer': answer, 'context': context}, cost=total_time, vector=vector)
+        yield {'type': 'done', 'answer': answer, 'cached': False,
+               'time_to_first_token': time_to_first_token, 'total_time': total_time, 'timings': self._timings(spans),
+               **self._packing(context)}
+
+    def continual_chat_streaming(self) -> None:
+        """
+        Starts an interactive chat session that prints the answer tokens as they arrive.
+
+        Reports the time to first token and the total answer time after every answer and their averages
+        at the end of the session. Type 'exit' to end the conversation.
+        """
+        asyncio.run(self._continual_chat_streaming())
+
+    async def _continual_chat_streaming(self) -> None:
+        print("Start chatting with the AI! Type 'exit' to end the conversation.")
+        memory = ConversationMemory(self.llm, max_tokens=self.history_token_budget)
+        timings = []
+        while True:
+            query = await asyncio.to_thread(input, "You: ")
+            if query.lower() == "exit":
+                break
+            print("AI: ", end="", flush=True)
+            async for event in self.astream_answer(query, memory.messages()):
+                if event['type'] == 'token':
+                    print(event['content'], end="", flush=True)
+                elif event['type'] == 'done':
+                    print()
+                    timings.append((event['time_to_first_token'] or event['total_time'], event['total_time']))
+                    print(f"--- time to first token {timings[-1][0]:.2f}s, total {event['total_time']:.2f}s ---")
+                    await asyncio.to_thread(memory.add_turn, query, event['answer'])
+        if timings:
+            print(f'--- average time to first token {sum(t for t, _ in timings) / len(timings):.2f}s, '
+                  f'average total {sum(t for _, t in timings) / len(timings):.2f}s ---')
+        print(f'--- {self.cache_report()} ---')
 
     def continual_chat(self) -> None:
         """
-        Starts an interactive chat session with the AI. The chatbot maintains chat history
-        and uses retrieval-augmented generation to provide responses.
+        Starts an interactive chat session with the AI. The chatbot maintains a token-budgeted chat history,
+        with older turns condensed into a rolling summary, and uses retrieval-augmented generation to provide
+        responses.
 
         Type 'exit' to end the conversation.
         """
         print("Start chatting with the AI! Type 'exit' to end the conversation.")
-        chat_history = []
+        memory = ConversationMemory(self.llm, max_tokens=self.history_token_budget)
         while True:
             query = input("You: ")
             if query.lower() == "exit":
                 break
-            result = self.rag_chain.invoke({"input": query, "chat_history": chat_history})
+            result = self.ask(query, memory.messages())
             print(f"AI: {result['answer']}")
-            chat_history.append(HumanMessage(content=query))
-            chat_history.append(AIMessage(content=result["answer"]))
+            memory.add_turn(query, result["answer"])
+        print(f'--- {self.cache_report()} ---')
 
     def get_retrieval(self) -> None:
         """
@@ -0,0 +1,154 @@
+import threading
+import time
+
+from collections import OrderedDict
+from collections.abc import Callable
+
+import numpy as np
+
+from langchain_core.embeddings import Embeddings
+
+
+class SemanticCache:
+    """
+    A cache of answers and retrieved documents keyed by standalone queries.
+
+    A query is served from the cache if it matches an earlier query exactly (after whitespace and case
+    normalisation) or if the cosine similarity of the query embeddings reaches the threshold. Entries expire
+    after a time to live, the least recently used entries are evicted beyond `max_entries` and the whole cache
+    is cleared once the version of the underlying collection changes.
+
+    Attributes:
+        embedding (Embeddings or None): Embedding model used to compare queries. None only serves exact matches.
+        threshold (float): Minimum cosine similarity for a semantic hit.
+        ttl (float): Time to live of an entry in seconds.
+        max_entries (int): Maximum number of cached answers.
+        version_fn (Callable): Returns the current collection version, used for invalidation.
+        stats (dict): Counters for 'hits', 'exact_hits', 'misses', 'invalidations' and 'saved_seconds'.
+    """
+
+    def __init__(self,
+                 embedding: Embeddings,
+                 threshold: float = 0.95,
+                 ttl: float = 3600.0,
+                 max_entries: int = 1000,
+                 version_fn: Callable[[], object] = None
+                 ):
+        """
+        Initialize an empty cache.
+
+        Args:
+            embedding (Embeddings): Embedding model used to compare queries. None only serves exact matches,
+                                    e.g. to keep the embedding model out of lexical-only retrieval.
+            threshold (float, optional): Minimum cosine similarity for a semantic hit. Defaults to 0.95.
+            ttl (float, optional): Time to live of an entry in seconds. Defaults to 3600.
+            max_entries (int, optional): Maximum number of cached answers. Defaults to 1000.
+            version_fn (Callable, optional): Returns the current collection version. Defaults to None.
+        """
+        self.embedding = embedding
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version_fn = version_fn
+        self.stats = {'hits': 0, 'exact_hits': 0, 'misses': 0, 'invalidations': 0, 'saved_seconds': 0.0}
+
+        self._lock = threading.Lock()
+        # normalised query -> {'vector', 'result', 'created', 'cost'}, in LRU order
+        self._entries = OrderedDict()
+        self._version = version_fn() if version_fn else None
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return ' '.join(query.lower().split())
+
+    def _embed(self, query: str) -> np.ndarray:
+        vector = np.asarray(self.embedding.embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self) -> None:
+        if self.version_fn is None:
+            return
+        version = self.version_fn()
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+            self.stats['invalidations'] += 1
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [key for key, entry in self._entries.items() if now - entry['created'] > self.ttl]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup(self, query: str):
+        """
+        Look up the cached result of a standalone query.
+
+        Args:
+            query (str): The standalone query.
+
+        Returns:
+            tuple: (cached result dict or None, query embedding or None). The embedding can be passed to
+                   `store` to avoid embedding the query twice.
+        """
+        start = time.perf_counter()
+        key = self.normalize(query)
+        with self._lock:
+            self._check_version()
+            self._evict_expired(time.time())
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                self.stats['exact_hits'] += 1
+                self.stats['saved_seconds'] += max(entry['cost'] - (time.perf_counter() - start), 0.0)
+                return entry['result'], entry['vector']
+            if not self._entries or self.embedding is None:
+                self.stats['misses'] += 1
+                return None, None
+
+        vector = self._embed(query)
+        with self._lock:
+            keys = list(self._entries.keys())
+            if keys:
+                similarities = np.stack([self._entries[k]['vector'] for k in keys]) @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entry = self._entries[keys[best]]
+                    self._entries.move_to_end(keys[best])
+                    self.stats['hits'] += 1
+                    self.stats['saved_seconds'] += max(entry['cost'] - (time.perf_counter() - start), 0.0)
+                    return entry['result'], vector
+            self.stats['misses'] += 1
+        return None, vector
+
+    def store(self, query: str, result: dict, cost: float, vector: np.ndarray = None) -> None:
+        """
+        Cache the result of a standalone query.
+
+        Args:
+            query (str): The standalone query.
+            result (dict): The chain result, containing the answer and the retrieved context.
+            cost (float): Time in seconds it took to compute the result.
+            vector (np.ndarray, optional): The normalised query embedding returned by `lookup`. Defaults to None.
+        """
+        if vector is None and self.embedding is not None:
+            vector = self._embed(query)
+        key = self.normalize(query)
+        with self._lock:
+            self._entries[key] = {'vector': vector, 'result': result, 'created': time.time(), 'cost': cost}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def hit_rate(self) -> float:
+        """
+        Returns:
+            float: The fraction of lookups served from the cache.
+        """
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,106 @@
+import asyncio
+import time
+import uuid
+
+from collections.abc import Callable
+
+from rag_chatbot.ConversationMemory import ConversationMemory
+
+
+class SessionStore:
+    """
+    An in-memory store of chat sessions for the chat server.
+
+    Every session owns a ConversationMemory and a lock, so the turns of one session are answered one after
+    the other while different sessions run concurrently. Sessions that have been idle for longer than
+    `idle_timeout` are evicted, and the least recently used session is evicted beyond `max_sessions`.
+
+    Attributes:
+        memory_factory (Callable): Creates the ConversationMemory of a new session.
+        idle_timeout (float): Seconds after which an idle session is evicted.
+        max_sessions (int): Maximum number of sessions kept.
+        evicted (int): Number of sessions evicted so far.
+    """
+
+    def __init__(self,
+                 memory_factory: Callable[[], ConversationMemory],
+                 idle_timeout: float = 1800.0,
+                 max_sessions: int = 10_000
+                 ):
+        """
+        Initialize an empty session store.
+
+        Args:
+            memory_factory (Callable): Creates the ConversationMemory of a new session.
+            idle_timeout (float, optional): Seconds after which an idle session is evicted. Defaults to 1800.
+            max_sessions (int, optional): Maximum number of sessions kept. Defaults to 10000.
+        """
+        self.memory_factory = memory_factory
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.evicted = 0
+
+        # session id -> {'memory', 'lock', 'last_used'}, dicts keep insertion order for LRU eviction
+        self._sessions = {}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: str = None) -> tuple[str, dict]:
+        """
+        Return an existing session or create a new one.
+
+        Args:
+            session_id (str, optional): The session id. Unknown or missing ids start a new session.
+
+        Returns:
+            tuple[str, dict]: The session id and the session with its 'memory' and 'lock'. A new session always
+                              gets a fresh random id, so that clients cannot choose or guess session ids.
+        """
+        session = self._sessions.pop(session_id, None) if session_id else None
+        if session is None:
+            session_id = uuid.uuid4().hex
+            session = {'memory': self.memory_factory(), 'lock': asyncio.Lock()}
+        session['last_used'] = time.monotonic()
+        self._sessions[session_id] = session
+
+        while len(self._sessions) > self.max_sessions:
+            del self._sessions[next(iter(self._sessions))]
+            self.evicted += 1
+        return session_id, session
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Args:
+            session_id (str): The session id.
+
+        Returns:
+            bool: Whether the session existed.
+        """
+        return self._sessions.pop(session_id, None) is not None
+
+    def evict_idle(self) -> int:
+        """
+        Evict all sessions that have been idle for longer than the idle timeout and are not answering a query.
+
+        Returns:
+            int: Number of evicted sessions.
+        """
+        deadline = time.monotonic() - self.idle_timeout
+        idle = [session_id for session_id, session in self._sessions.items()
+                if session['last_used'] < deadline and not session['lock'].locked()]
+        for session_id in idle:
+            del self._sessions[session_id]
+        self.evicted += len(idle)
+        return len(idle)
+
+    async def run_eviction(self, interval: float = 60.0) -> None:
+        """
+        Periodically evict idle sessions, meant to run as a background task.
+
+        Args:
+            interval (float, optional): Seconds between two eviction runs. Defaults to 60.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_idle()
@@ -0,0 +1,175 @@
+import asyncio
+import re
+import threading
+
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import BasePromptTemplate
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.runnables.config import get_executor_for_config
+
+
+class SpeculativeRetriever(Runnable):
+    """
+    A drop-in replacement for the history-aware retriever that does not wait for the question rewrite.
+
+    For follow-up questions the history-aware retriever first asks the LLM to rewrite the question into a
+    standalone question and only then searches the vector store. This retriever instead
+
+    - skips the rewrite for follow-ups that a cheap heuristic classifies as already standalone (long enough and
+      without pronouns or other references to earlier turns) and searches with the question as it is,
+    - otherwise searches with the question plus the previous user turn while the rewrite is running, and reuses
+      these speculative results if the rewritten question adds (almost) no terms to the speculative query.
+      Only a rewrite that brings in new terms costs a second search.
+
+    Attributes:
+        retriever (BaseRetriever): Searches the documents.
+        rewrite_chain (Runnable): Rewrites a follow-up question into a standalone question.
+        min_standalone_words (int): Minimum number of words of a question classified as standalone.
+        reuse_threshold (float): Minimum fraction of the rewritten question's terms contained in the speculative
+                                 query for the speculative results to be reused.
+        stats (dict): Counters for 'first_turns', 'standalone' (rewrite skipped), 'reused' (speculative results
+                      used), 'rewritten' (searched again with the rewritten question) and the summed result
+                      'overlap' of speculative and final results on rewritten turns.
+    """
+
+    # Words that refer to earlier turns, in English and German
+    REFERRING_WORDS = frozenset({
+        'it', 'its', 'they', 'them', 'their', 'theirs', 'he', 'him', 'his', 'she', 'her', 'hers',
+        'this', 'that', 'these', 'those', 'there', 'then', 'former', 'latter', 'above', 'previous', 'same',
+        'also', 'else', 'more', 'other', 'another', 'one', 'ones',
+        'es', 'er', 'sie', 'ihm', 'ihn', 'ihr', 'ihre', 'ihren', 'sein', 'seine', 'dies', 'diese', 'dieser',
+        'dort', 'dazu', 'davon', 'damit', 'darüber', 'daran', 'auch', 'mehr', 'andere',
+    })
+    STOP_WORDS = frozenset({
+        'a', 'an', 'the', 'is', 'are', 'was', 'were', 'do', 'does', 'did', 'of', 'for', 'to', 'in', 'on', 'at',
+        'and', 'or', 'with', 'what', 'who', 'which', 'how', 'when', 'where', 'why', 'me', 'about', 'can', 'you',
+    })
+    TOKEN_PATTERN = re.compile(r'\w+')
+
+    def __init__(self,
+                 llm: BaseChatModel,
+                 retriever: BaseRetriever,
+                 contextualize_prompt: BasePromptTemplate,
+                 min_standalone_words: int = 4,
+                 reuse_threshold: float = 0.8
+                 ):
+        """
+        Initialize the speculative retriever.
+
+        Args:
+            llm (BaseChatModel): The model rewriting follow-up questions.
+            retriever (BaseRetriever): Searches the documents.
+            contextualize_prompt (BasePromptTemplate): Prompt with 'input' and 'chat_history' for the rewrite.
+            min_standalone_words (int, optional): Minimum number of words of a standalone question. Defaults to 4.
+            reuse_threshold (float, optional): Minimum term coverage for reusing speculative results.
+                                               Defaults to 0.8.
+        """
+        self.retriever = retriever
+        self.rewrite_chain = contextualize_prompt | llm | StrOutputParser()
+        self.min_standalone_words = min_standalone_words
+        self.reuse_threshold = reuse_threshold
+        self.stats = {'first_turns': 0, 'standalone': 0, 'reused': 0, 'rewritten': 0, 'overlap': 0.0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _tokens(cls, text: str) -> list[str]:
+        return cls.TOKEN_PATTERN.findall(text.lower())
+
+    def is_standalone(self, query: str) -> bool:
+        """
+        Cheaply classify whether a follow-up question can be understood without the chat history.
+
+        Args:
+            query (str): The follow-up question.
+
+        Returns:
+            bool: True if the question is long enough and contains no words referring to earlier turns.
+        """
+        tokens = self._tokens(query)
+        return len(tokens) >= self.min_standalone_words and not self.REFERRING_WORDS.intersection(tokens)
+
+    @staticmethod
+    def speculative_query(query: str, chat_history: list[BaseMessage]) -> str:
+        """
+        Returns:
+            str: The previous user turn followed by the question, a guess at the rewritten question.
+        """
+        previous = next((message.content for message in reversed(chat_history) if isinstance(message, HumanMessage)), '')
+        return f'{previous} {query}'.strip()
+
+    def coverage(self, rewritten: str, speculative: str) -> float:
+        """
+        Returns:
+            float: Fraction of the content terms of the rewritten question contained in the speculative query.
+        """
+        terms = set(self._tokens(rewritten)) - self.STOP_WORDS
+        if not terms:
+            return 1.0
+        return len(terms & set(self._tokens(speculative))) / len(terms)
+
+    def _count(self, key: str, value: float = 1) -> None:
+        with self._lock:
+            self.stats[key] += value
+
+    @staticmethod
+    def _overlap(first: list[Document], second: list[Document]) -> float:
+        first_texts, second_texts = {d.page_content for d in first}, {d.page_content for d in second}
+        return len(first_texts & second_texts) / max(len(first_texts | second_texts), 1)
+
+    def _finish(self, speculative: list[Document], rewritten: str, speculative_query: str):
+        """
+        Return the speculative results if the rewritten question is covered by the speculative query, else None.
+        """
+        if self.coverage(rewritten, speculative_query) >= self.reuse_threshold:
+            self._count('reused')
+            return speculative
+        self._count('rewritten')
+        return None
+
+    def _retrieve(self, inputs: dict, config: RunnableConfig) -> list[Document]:
+        query, chat_history = inputs['input'], inputs.get('chat_history') or []
+        if not chat_history:
+            self._count('first_turns')
+            return self.retriever.invoke(query, config)
+        if self.is_standalone(query):
+            self._count('standalone')
+            return self.retriever.invoke(query, config)
+
+        speculative_query = self.speculative_query(query, chat_history)
+        with get_executor_for_config(config) as executor:
+            speculative_future = executor.submit(self.retriever.invoke, speculative_query, config)
+            rewritten = self.rewrite_chain.invoke(inputs, config)
+            speculative = speculative_future.result()
+        documents = self._finish(speculative, rewritten, speculative_query)
+        if documents is None:
+            documents = self.retriever.invoke(rewritten, config)
+            self._count('overlap', self._overlap(speculative, documents))
+        return documents
+
+    async def _aretrieve(self, inputs: dict, config: RunnableConfig) -> list[Document]:
+        query, chat_history = inputs['input'], inputs.get('chat_history') or []
+        if not chat_history:
+            self._count('first_turns')
+            return await self.retriever.ainvoke(query, config)
+        if self.is_standalone(query):
+            self._count('standalone')
+            return await self.retriever.ainvoke(query, config)
+
+        speculative_query = self.speculative_query(query, chat_history)
+        speculative, rewritten = await asyncio.gather(self.retriever.ainvoke(speculative_query, config),
+                                                      self.rewrite_chain.ainvoke(inputs, config))
+        documents = self._finish(speculative, rewritten, speculative_query)
+        if documents is None:
+            documents = await self.retriever.ainvoke(rewritten, config)
+            self._count('overlap', self._overlap(speculative, documents))
+        return documents
+
+    def invoke(self, input: dict, config: RunnableConfig = None, **kwargs) -> list[Document]:
+        return self._call_with_config(self._retrieve, input, config)
+
+    async def ainvoke(self, input: dict, config: RunnableConfig = None, **kwargs) -> list[Document]:
+        return await self._acall_with_config(self._aretrieve, input, config)
@@ -0,0 +1,201 @@
+import asyncio
+import time
+
+from collections.abc import Callable, Iterable
+from urllib.parse import urlparse
+
+import aiohttp
+
+from rag_instrumentation.Instrumentation import instrumentation
+
+
+class AsyncCrawlEngine:
+    """
+    An asyncio based crawl engine that walks a site breadth-first with a pool of workers.
+
+    The engine is agnostic of link extraction: every fetched page is handed to an `on_page`
+    callback which returns the URLs that should be added to the frontier. Coroutine callbacks are awaited
+    on the event loop, plain callbacks run in a worker thread so that parsing a page does not stall the
+    fetches of the other workers; they must therefore be thread-safe. Connections are pooled
+    in a single aiohttp session, the number of parallel connections per host is capped and an
+    optional politeness delay is enforced between two requests to the same host.
+
+    Attributes:
+        max_workers (int): Number of concurrent crawl workers.
+        max_per_host (int): Maximum number of parallel connections per host.
+        politeness_delay (float): Minimum delay in seconds between two requests to the same host.
+        timeout (int): Timeout (in seconds) for HTTP requests.
+        pages_fetched (int): Number of pages fetched successfully during the last crawl.
+        errors (dict): URLs that could not be loaded during the last crawl, mapped to the HTTP status code of
+                       the error response or None for network errors and timeouts.
+    """
+
+    def __init__(self,
+                 max_workers: int = 10,
+                 max_per_host: int = 4,
+                 politeness_delay: float = 0.0,
+                 timeout: int = None
+                 ):
+        """
+        Initialize the crawl engine.
+
+        Args:
+            max_workers (int, optional): Number of concurrent crawl workers. Defaults to 10.
+            max_per_host (int, optional): Maximum number of parallel connections per host. Defaults to 4.
+            politeness_delay (float, optional): Minimum delay in seconds between two requests to the same host.
+                                                Defaults to 0.0.
+            timeout (int, optional): Timeout for HTTP requests in seconds. Defaults to None.
+        """
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.politeness_delay = politeness_delay
+        self.timeout = timeout
+        self.pages_fetched = 0
+        self.errors = {}
+
+        self._host_locks = {}
+        self._host_last_request = {}
+
+    async def _wait_politely(self, host: str) -> None:
+        """
+        Sleep until the politeness delay for the given host has passed.
+
+        Args:
+            host (str): The host that is about to be requested.
+        """
+        if self.politeness_delay <= 0:
+            return
+        lock = self._host_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            wait = self._host_last_request.get(host, 0.0) + self.politeness_delay - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._host_last_request[host] = time.monotonic()
+
+    async def fetch(self, session: aiohttp.ClientSession, url: str, headers: dict = None):
+        """
+        Fetch a single URL while respecting the per-host politeness delay.
+
+        Args:
+            session (aiohttp.ClientSession): The pooled client session.
+            url (str): The URL to fetch.
+            headers (dict, optional): Additional request headers. Defaults to None.
+
+        Returns:
+            tuple: (status, response headers, body text), or None if the page could not be loaded.
+        """
+        await self._wait_politely(urlparse(url).netloc)
+        try:
+            with instrumentation.span('fetch'):
+                async with session.get(url, headers=headers) as response:
+                    if response.status >= 400:
+                        raise aiohttp.ClientResponseError(response.request_info, response.history,
+                                                          status=response.status)
+                    body = await response.text(errors='replace')
+            instrumentation.count('pages_not_modified' if response.status == 304 else 'pages_fetched')
+            return response.status, response.headers.copy(), body
+        except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeDecodeError) as error:
+            self.errors[url] = getattr(error, 'status', None)
+            instrumentation.count('fetch_errors')
+            print(f'{url} could not be loaded.')
+            return None
+
+    async def crawl(self,
+                    seeds: Iterable[str],
+                    on_page: Callable[[str, int, dict, str], Iterable[str]],
+                    visited: set[str] = None,
+                    request_headers: Callable[[str], dict] = None,
+                    known_links: Callable[[str], list[str] | None] = None
+                    ) -> set[str]:
+        """
+        Crawl breadth-first from the seed URLs until the frontier is exhausted.
+
+        Every URL is fetched at most once. For each successfully fetched page `on_page` is called with
+        the URL, the status code, the response headers and the body, and the URLs it returns are added
+        to the frontier. Pages for which `known_links` returns links are not fetched, their links are
+        added instead.
+
+        Args:
+            seeds (Iterable[str]): The URLs to start crawling from.
+            on_page (Callable): Callback or coroutine function returning the URLs to follow from a fetched page.
+                                Plain callbacks run in a worker thread.
+            visited (set[str], optional): Set of URLs already scheduled. It is updated in place. Defaults to None.
+            request_headers (Callable, optional): Returns additional request headers for a URL, e.g.
+                                                  conditional request headers. Defaults to None.
+            known_links (Callable, optional): Returns the links of a page that does not need to be fetched,
+                                              e.g. because it has not changed since the last crawl, or None.
+                                              Called on the event loop. Defaults to None.
+
+        Returns:
+            set[str]: The set of all scheduled URLs.
+        """
+        visited = visited if visited is not None else set()
+        frontier = asyncio.Queue()
+        for url in seeds:
+            if url not in visited:
+                visited.add(url)
+                frontier.put_nowait(url)
+
+        self.pages_fetched = 0
+        self.errors = {}
+        connector = aiohttp.TCPConnector(limit=self.max_workers, limit_per_host=self.max_per_host)
+        client_timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+
+            async def worker() -> None:
+                while True:
+                    url = await frontier.get()
+                    try:
+                        links = known_links(url) if known_links else None
+                        if links is None:
+                            result = await self.fetch(session, url,
+                                                      request_headers(url) if request_headers else None)
+                            if result is None:
+                                continue
+                            self.pages_fetched += 1
+                            if asyncio.iscoroutinefunction(on_page):
+                                links = await on_page(url, *result)
+                            else:
+                                links = await asyncio.to_thread(on_page, url, *result)
+                        for link in links:
+                            if link not in visited:
+                                visited.add(link)
+                                frontier.put_nowait(link)
+                    except Exception as error:
+                        print(f'{url} could not be processed: {error}')
+                    finally:
+                        frontier.task_done()
+
+            workers = [asyncio.create_task(worker()) for _ in range(self.max_workers)]
+            try:
+                await frontier.join()
+            finally:
+                for task in workers:
+                    task.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+        return visited
+
+    def run(self,
+            seeds: Iterable[str],
+            on_page: Callable,
+            visited: set[str] = None,
+            request_headers: Callable[[str], dict] = None,
+            known_links: Callable[[str], list[str] | None] = None
+            ) -> set[str]:
+        """
+        Blocking wrapper around `crawl` for callers without a running event loop.
+
+        Args:
+            seeds (Iterable[str]): The URLs to start crawling from.
+            on_page (Callable): Callback or coroutine function returning the URLs to follow from a fetched page.
+            visited (set[str], optional): Set of URLs already scheduled. Defaults to None.
+            request_headers (Callable, optional): Returns additional request headers for a URL. Defaults to None.
+            known_links (Callable, optional): Returns the links of a page that is not fetched, or None.
+                                              Defaults to None.
+
+        Returns:
+            set[str]: The set of all scheduled URLs.
+        """
+        return asyncio.run(self.crawl(seeds, on_page, visited, request_headers, known_links))
@@ -0,0 +1,185 @@
+import json
+import os
+
+
+class CrawlCheckpoint:
+    """
+    On-disk state of the link discovery, so that an interrupted crawl resumes and a later crawl skips unchanged pages.
+
+    While a crawl runs, its seeds and every processed page are appended to a frontier log. The visited set is
+    the seeds plus all processed pages and the links found on them, the frontier is the part of it that has not
+    been processed yet, so both are restored from the log after an interrupt. Once the crawl completes, the
+    processed pages are written to a page index together with their sitemap `lastmod` and their links, and the
+    log is removed. The next crawl reuses the links of pages whose `lastmod` has not changed instead of
+    fetching and parsing them again.
+
+    Attributes:
+        directory (str): Directory of the checkpoint files.
+        sync_every (int): Number of processed pages after which the log is synced to disk.
+        pages (dict): Pages of the last completed crawl, url -> {'lastmod', 'links', 'external_links'}.
+        seeds (list[str]): Seed URLs of the crawl in progress.
+        lastmod (dict): Sitemap `lastmod` of the seed URLs of the crawl in progress.
+        processed (dict): Pages processed by the crawl in progress, in the same format as `pages`.
+    """
+
+    FRONTIER_FILE = 'frontier.jsonl'
+    PAGES_FILE = 'pages.json'
+
+    def __init__(self, directory: str = './crawl_checkpoint', sync_every: int = 20):
+        """
+        Initialize the checkpoint and load the state of previous crawls.
+
+        Args:
+            directory (str, optional): Directory of the checkpoint files. Defaults to './crawl_checkpoint'.
+            sync_every (int, optional): Number of processed pages between two syncs of the log. Defaults to 20.
+        """
+        self.directory = directory
+        self.sync_every = sync_every
+        self.pages = {}
+        self.seeds = []
+        self.lastmod = {}
+        self.processed = {}
+
+        self._log = None
+        self._unsynced = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.pages_path):
+            with open(self.pages_path, encoding='utf-8') as file:
+                self.pages = json.load(file)
+        self._load_log()
+
+    @property
+    def pages_path(self) -> str:
+        return os.path.join(self.directory, self.PAGES_FILE)
+
+    @property
+    def frontier_path(self) -> str:
+        return os.path.join(self.directory, self.FRONTIER_FILE)
+
+    @property
+    def in_progress(self) -> bool:
+        """
+        Returns:
+            bool: Whether an interrupted crawl can be resumed.
+        """
+        return bool(self.seeds)
+
+    def _load_log(self) -> None:
+        """
+        Read the frontier log of an interrupted crawl. A partially written last line is ignored and cut off.
+        """
+        if not os.path.exists(self.frontier_path):
+            return
+        valid = 0
+        with open(self.frontier_path, 'rb') as file:
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                valid += len(line)
+                if 'seeds' in entry:
+                    self.seeds, self.lastmod = entry['seeds'], entry['lastmod']
+                else:
+                    self.processed[entry.pop('url')] = entry
+        if valid < os.path.getsize(self.frontier_path):
+            # The records of the resumed crawl would otherwise be appended to the torn line and lost with it
+            with open(self.frontier_path, 'r+b') as file:
+                file.truncate(valid)
+
+    def frontier(self) -> tuple[set[str], list[str]]:
+        """
+        Restore the visited set and the frontier of the crawl in progress.
+
+        Returns:
+            tuple[set[str], list[str]]: The visited (scheduled) URLs and the URLs still to be processed,
+                                        in discovery order.
+        """
+        visited, frontier = set(), []
+        for url in self.seeds + [link for page in self.processed.values() for link in page['links']]:
+            if url not in visited:
+                visited.add(url)
+                if url not in self.processed:
+                    frontier.append(url)
+        return visited | set(self.processed), frontier
+
+    def start(self, seeds: list[str], lastmod: dict) -> None:
+        """
+        Start a new crawl and discard the log of an unfinished one.
+
+        Args:
+            seeds (list[str]): The seed URLs.
+            lastmod (dict): Sitemap `lastmod` of the seed URLs, if known.
+        """
+        self.close()
+        self.seeds, self.lastmod, self.processed = list(seeds), dict(lastmod), {}
+        with open(self.frontier_path, 'w', encoding='utf-8') as file:
+            file.write(json.dumps({'seeds': self.seeds, 'lastmod': self.lastmod}) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+
+    def record(self, url: str, links: list[str], external_links: list[str]) -> None:
+        """
+        Append a processed page to the log.
+
+        Args:
+            url (str): The page URL.
+            links (list[str]): The internal links of the page.
+            external_links (list[str]): The external links of the page.
+        """
+        entry = {'lastmod': self.lastmod.get(url), 'links': links, 'external_links': external_links}
+        self.processed[url] = entry
+        if self._log is None:
+            self._log = open(self.frontier_path, 'a', encoding='utf-8')
+        self._log.write(json.dumps({'url': url, **entry}) + '\n')
+        self._log.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        """
+        Force the log to disk.
+        """
+        if self._log is not None:
+            os.fsync(self._log.fileno())
+        self._unsynced = 0
+
+    def unchanged(self, url: str):
+        """
+        Look up a page whose sitemap `lastmod` is the same as in the last completed crawl.
+
+        Args:
+            url (str): The page URL.
+
+        Returns:
+            dict or None: The page of the last crawl, or None if the page is new, changed or has no `lastmod`.
+        """
+        page = self.pages.get(url)
+        lastmod = self.lastmod.get(url)
+        if page is None or lastmod is None or page['lastmod'] != lastmod:
+            return None
+        return page
+
+    def complete(self) -> None:
+        """
+        Replace the page index with the pages of the finished crawl and remove the frontier log.
+        """
+        self.close()
+        with open(self.pages_path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(self.processed, file)
+        os.replace(self.pages_path + '.tmp', self.pages_path)
+        os.remove(self.frontier_path)
+        self.pages, self.seeds, self.lastmod, self.processed = self.processed, [], {}, {}
+
+    def close(self) -> None:
+        """
+        Sync and close the log, e.g. when the crawl is interrupted.
+        """
+        if self._log is not None:
+            self.sync()
+            self._log.close()
+            self._log = None
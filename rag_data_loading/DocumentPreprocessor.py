@@ -1,11 +1,21 @@
+import hashlib
 import re
 
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
 from unstructured.cleaners.core import clean
 from unstructured.documents.elements import Element
 from unstructured.chunking.title import chunk_by_title
+from unstructured.partition.html import partition_html
 from langchain.schema import Document
 from langchain_community.vectorstores.utils import filter_complex_metadata
 
+from rag_data_loading.MinHashLSH import MinHashLSH
+from rag_instrumentation.Instrumentation import instrumentation
+
 
 class DocumentPreprocessor:
     """
@@ -17,31 +27,63 @@ class DocumentPreprocessor:
         pass
 
     @staticmethod
-    def simple_deduplication(elements: list[Element]) -> list[Element]:
+    def simple_deduplication(elements: list[Element], unique_texts: set[str] = None) -> list[Element]:
         """
         Filters the list of elements for strict duplicates based on their text content.
 
         :param elements: List of Element objects.
+        :param unique_texts: Digests of the texts seen so far, updated in place. Pass the same set to
+                             deduplicate across calls.
         :return: Deduplicated list of elements.
         """
-        unique_texts = set()
+        unique_texts = unique_texts if unique_texts is not None else set()
         deduplicated_elements = []
         for element in elements:
-            if element.text not in unique_texts:
-                unique_texts.add(element.text)
+            digest = DocumentPreprocessor.text_digest(element.text)
+            if digest not in unique_texts:
+                unique_texts.add(digest)
                 deduplicated_elements.append(element)
         return deduplicated_elements
 
     @staticmethod
-    def advanced_deduplication(elements: list[Element]) -> list[Element]:
+    def text_digest(text: str) -> str:
         """
-        Placeholder for an advanced deduplication strategy based on embedding similarities.
+        Computes a compact digest of a text, used to remember seen texts without keeping them in memory.
+
+        :param text: The text to hash.
+        :return: Hex digest of the text.
+        """
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def advanced_deduplication(elements: list[Element],
+                               threshold: float = 0.8,
+                               report: list[dict] = None,
+                               index: MinHashLSH = None) -> list[Element]:
+        """
+        Removes near-duplicate elements, e.g. boilerplate that differs slightly between pages.
+
+        Texts are compared by the Jaccard similarity of their word shingles, estimated with MinHash and
+        looked up through locality-sensitive hashing, so the cost grows linearly with the number of elements.
+        The first occurrence of every group of near-duplicates is kept.
 
         :param elements: List of Element objects.
+        :param threshold: Minimum estimated Jaccard similarity for two texts to be merged.
+        :param report: Optional list that receives one dict per removed element with the 'removed' and
+                       'kept' texts and their estimated 'similarity'.
+        :param index: MinHashLSH index of previously kept texts. Pass the same index to deduplicate across calls.
         :return: List of elements after deduplication.
         """
-        # TODO: Implement more advanced deduplication strategy based on embedding similarities
-        return elements
+        index = index if index is not None else MinHashLSH(threshold=threshold)
+        deduplicated_elements = []
+        for element in elements:
+            signature, match, similarity = index.query(element.text)
+            if match is None:
+                index.insert(signature, element.text)
+                deduplicated_elements.append(element)
+            elif report is not None:
+                report.append({'removed': element.text, 'kept': match, 'similarity': similarity})
+        return deduplicated_elements
 
     @staticmethod
     def clean_elements(elements: list[Element]) -> list[Element]:
@@ -72,16 +114,22 @@ class DocumentPreprocessor:
         return [el for el in elements if any(keywords in el.category for keywords in filter_words)]
 
     @staticmethod
-    def clean_data(elements: list[Element]) -> list[Element]:
+    def clean_data(elements: list[Element], near_duplicate_threshold: float = None) -> list[Element]:
         """
         Cleans unstructured elements by applying deduplication, filtering, and cleaning.
 
         :param elements: List of Element objects.
+        :param near_duplicate_threshold: Similarity threshold for near-duplicate removal. None only removes
+                                         exact duplicates.
         :return: Cleaned list of elements.
         """
-        elements = DocumentPreprocessor.filter_elements(elements)
-        elements = DocumentPreprocessor.clean_elements(elements)
-        elements = DocumentPreprocessor.simple_deduplication(elements)
+        with instrumentation.span('clean'):
+            elements = DocumentPreprocessor.filter_elements(elements)
+            elements = DocumentPreprocessor.clean_elements(elements)
+        with instrumentation.span('deduplicate'):
+            elements = DocumentPreprocessor.simple_deduplication(elements)
+            if near_duplicate_threshold is not None:
+                elements = DocumentPreprocessor.advanced_deduplication(elements, threshold=near_duplicate_threshold)
         return elements
 
     @staticmethod
@@ -98,10 +146,11 @@ class DocumentPreprocessor:
         :param max_characters: Maximum character length per chunk.
         :return: List of chunked Element objects.
         """
-        chunks = chunk_by_title(elements,
-                                overlap=overlap,
-                                max_characters=max_characters,
-                                combine_text_under_n_chars=combine_text_under_n_chars)
+        with instrumentation.span('chunk'):
+            chunks = chunk_by_title(elements,
+                                    overlap=overlap,
+                                    max_characters=max_characters,
+                                    combine_text_under_n_chars=combine_text_under_n_chars)
         return chunks
 
     @staticmethod
@@ -143,12 +192,149 @@ class DocumentPreprocessor:
         chunks = DocumentPreprocessor.transform_to_document(chunks)
         return chunks
 
+    @staticmethod
+    def partition_page(page: tuple[str, str]) -> list[Element]:
+        """
+        Partitions the HTML of a single page, tags the elements with the page URL, filters and cleans them.
+
+        :param page: (url, html) pair.
+        :return: List of cleaned elements of the page.
+        """
+        url, html = page
+        with instrumentation.span('partition_html'):
+            elements = partition_html(text=html)
+        for element in elements:
+            element.metadata.url = url
+        with instrumentation.span('clean'):
+            elements = DocumentPreprocessor.filter_elements(elements)
+            return DocumentPreprocessor.clean_elements(elements)
 
+    @staticmethod
+    def chunk_page(elements: list[Element]) -> list[Document]:
+        """
+        Chunks and transforms the elements of a single page, so that no chunk spans two pages.
 
+        :param elements: List of cleaned Element objects of one page.
+        :return: List of Document objects.
+        """
+        if not elements:
+            return []
+        chunks = DocumentPreprocessor.intelligent_chunking(elements)
+        return DocumentPreprocessor.transform_to_document(chunks)
 
+    @staticmethod
+    def init_timed_worker() -> None:
+        """
+        Enables instrumentation in a worker process, without a trace log of its own.
+        """
+        instrumentation.configure(enabled=True)
 
+    @staticmethod
+    def timed_worker(func, item):
+        """
+        Runs a per-page step in a worker process and returns the spans recorded meanwhile together with its
+        result, so that the parent process can record them.
 
+        :param func: The per-page step, e.g. partition_page.
+        :param item: Argument of the step.
+        :return: (result, [(name, start, duration), ...]) pair.
+        """
+        with instrumentation.collect() as spans:
+            result = func(item)
+        return result, spans
 
+    @staticmethod
+    def clean_chunk_transform_pages(pages: list[tuple[str, str]],
+                                    max_workers: int = None,
+                                    chunksize: int = 4,
+                                    near_duplicate_threshold: float = None) -> list[Document]:
+        """
+        Partitions, cleans, chunks, and transforms raw HTML pages into langchain documents using a process pool.
 
+        Partitioning and cleaning, as well as chunking, run per page in worker processes. Exact duplicates
+        are removed across pages in the main process in page order, so the output is deterministic and
+        identical to the serial path (max_workers=1) regardless of the number of workers.
 
+        :param pages: List of (url, html) pairs.
+        :param max_workers: Number of worker processes. Defaults to the number of CPUs, 1 runs in process.
+        :param chunksize: Number of pages sent to a worker at once.
+        :param near_duplicate_threshold: Similarity threshold for near-duplicate removal across pages. None only
+                                         removes exact duplicates.
+        :return: List of processed Document objects.
+        """
+        pages = sorted(pages)
+        batches = DocumentPreprocessor.stream_clean_chunk_transform(pages,
+                                                                   batch_size=max(len(pages), 1),
+                                                                   max_workers=max_workers,
+                                                                   chunksize=chunksize,
+                                                                   near_duplicate_threshold=near_duplicate_threshold)
+        return [document for _, documents, _ in batches for document in documents]
 
+    @staticmethod
+    def stream_clean_chunk_transform(pages: Iterable[tuple[str, str]],
+                                     batch_size: int = 16,
+                                     max_workers: int = 1,
+                                     unique_texts: set[str] = None,
+                                     chunksize: int = 4,
+                                     near_duplicate_threshold: float = None) -> Iterator[tuple[list[str], list[Document], list[str]]]:
+        """
+        Lazily partitions, cleans, chunks, and transforms pages in batches, optionally using a process pool.
+
+        Only one batch of pages and its documents is held in memory at a time. Exact duplicates are removed
+        across all batches, the digests of the kept texts are returned with every batch so that callers can
+        checkpoint the deduplication state. With instrumentation enabled, the spans of the worker processes are
+        recorded in the calling process.
+
+        :param pages: Iterable of (url, html) pairs.
+        :param batch_size: Number of pages processed per batch.
+        :param max_workers: Number of worker processes. None uses the number of CPUs, 1 runs in process.
+        :param unique_texts: Digests of texts seen before, e.g. restored from a checkpoint. Updated in place.
+        :param chunksize: Number of pages sent to a worker at once.
+        :param near_duplicate_threshold: Similarity threshold for near-duplicate removal across pages. None only
+                                         removes exact duplicates. The near-duplicate index is not part of the
+                                         returned digests and is rebuilt from scratch by every call.
+        :return: Iterator of (page urls, documents, new text digests) per batch.
+        """
+        unique_texts = unique_texts if unique_texts is not None else set()
+        near_duplicate_index = MinHashLSH(near_duplicate_threshold) if near_duplicate_threshold is not None else None
+        executor = None
+        if max_workers != 1:
+            # Spans of the workers stay in their processes, send them back with the results if they are needed
+            timed = instrumentation.enabled
+            executor = ProcessPoolExecutor(max_workers=max_workers,
+                                           initializer=DocumentPreprocessor.init_timed_worker if timed else None)
+
+        def parallel_map(func, items):
+            if executor is None:
+                return map(func, items)
+            if not timed:
+                return executor.map(func, items, chunksize=chunksize)
+            results = []
+            for result, spans in executor.map(partial(DocumentPreprocessor.timed_worker, func), items,
+                                              chunksize=chunksize):
+                for name, _, duration in spans:
+                    instrumentation.record_span(name, duration)
+                results.append(result)
+            return results
+
+        try:
+            pages = iter(pages)
+            while batch := list(islice(pages, batch_size)):
+                page_elements = list(parallel_map(DocumentPreprocessor.partition_page, batch))
+                with instrumentation.span('deduplicate'):
+                    page_elements = [DocumentPreprocessor.simple_deduplication(elements, unique_texts)
+                                     for elements in page_elements]
+                    if near_duplicate_index is not None:
+                        page_elements = [DocumentPreprocessor.advanced_deduplication(elements, index=near_duplicate_index)
+                                         for elements in page_elements]
+                new_texts = [DocumentPreprocessor.text_digest(element.text)
+                             for elements in page_elements for element in elements]
+
+                page_documents = parallel_map(DocumentPreprocessor.chunk_page, page_elements)
+                documents = [document for documents in page_documents for document in documents]
+                instrumentation.count('pages_preprocessed', len(batch))
+                instrumentation.count('chunks_created', len(documents))
+                yield [url for url, _ in batch], documents, new_texts
+        finally:
+            if executor:
+                executor.shutdown()
@@ -0,0 +1,127 @@
+import re
+import zlib
+
+import numpy as np
+
+
+class MinHashLSH:
+    """
+    An incremental MinHash / locality-sensitive hashing index for near-duplicate text detection.
+
+    Texts are split into word shingles and summarised by a MinHash signature whose entries agree with a
+    probability equal to the Jaccard similarity of the shingle sets. Signatures are split into bands and
+    hashed into buckets, so only texts sharing a bucket are compared, which keeps the cost of inserting
+    a text roughly constant instead of linear in the size of the index.
+
+    Attributes:
+        threshold (float): Minimum estimated Jaccard similarity for two texts to count as near-duplicates.
+        num_perm (int): Number of hash permutations per signature.
+        shingle_size (int): Number of words per shingle.
+        bands (int): Number of LSH bands.
+        rows (int): Number of signature rows per band.
+    """
+
+    PRIME = (1 << 31) - 1
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, shingle_size: int = 3, seed: int = 1):
+        """
+        Initialize an empty index.
+
+        Args:
+            threshold (float, optional): Minimum estimated Jaccard similarity of near-duplicates. Defaults to 0.8.
+            num_perm (int, optional): Number of hash permutations per signature. Defaults to 128.
+            shingle_size (int, optional): Number of words per shingle. Defaults to 3.
+            seed (int, optional): Seed of the hash permutations. Defaults to 1.
+        """
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = self.choose_bands(threshold, num_perm)
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, self.PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, self.PRIME, size=(num_perm, 1), dtype=np.uint64)
+
+        self._signatures = []
+        self._keys = []
+        self._buckets = [{} for _ in range(self.bands)]
+
+    @staticmethod
+    def choose_bands(threshold: float, num_perm: int) -> tuple[int, int]:
+        """
+        Choose the band layout whose S-curve threshold (1/bands)^(1/rows) is closest to, but not above,
+        the similarity threshold, so that near-duplicates are rarely missed.
+
+        Args:
+            threshold (float): The similarity threshold.
+            num_perm (int): Number of hash permutations per signature.
+
+        Returns:
+            tuple[int, int]: Number of bands and rows per band.
+        """
+        layouts = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+        below = [layout for layout in layouts if (1 / layout[0]) ** (1 / layout[1]) <= threshold]
+        return max(below or layouts[:1], key=lambda layout: (1 / layout[0]) ** (1 / layout[1]))
+
+    def shingles(self, text: str) -> set[str]:
+        words = re.findall(r'\w+', text.lower())
+        if len(words) <= self.shingle_size:
+            return {' '.join(words)}
+        return {' '.join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        Compute the MinHash signature of a text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            np.ndarray: uint32 array of length num_perm.
+        """
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in self.shingles(text)),
+                             dtype=np.uint64)
+        permuted = (self._a * hashes[np.newaxis, :] + self._b) % self.PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def query(self, text: str) -> tuple:
+        """
+        Find the most similar indexed text above the threshold.
+
+        Args:
+            text (str): The text to look up.
+
+        Returns:
+            tuple: (signature, key of the most similar indexed text or None, its estimated similarity).
+        """
+        signature = self.signature(text)
+        candidates = set()
+        for band, buckets in enumerate(self._buckets):
+            candidates.update(buckets.get(self._band_key(signature, band), ()))
+
+        best_index, best_similarity = None, 0.0
+        for candidate in sorted(candidates):
+            similarity = float(np.mean(self._signatures[candidate] == signature))
+            if similarity >= self.threshold and similarity > best_similarity:
+                best_index, best_similarity = candidate, similarity
+        return signature, (self._keys[best_index] if best_index is not None else None), best_similarity
+
+    def insert(self, signature: np.ndarray, key=None) -> None:
+        """
+        Add a signature to the index.
+
+        Args:
+            signature (np.ndarray): Signature computed by `signature` or `query`.
+            key (optional): Value returned by `query` when this text is the closest match, e.g. the text itself.
+        """
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        self._keys.append(key)
+        for band, buckets in enumerate(self._buckets):
+            buckets.setdefault(self._band_key(signature, band), []).append(index)
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def _band_key(self, signature: np.ndarray, band: int) -> bytes:
+        return signature[band * self.rows:(band + 1) * self.rows].tobytes()
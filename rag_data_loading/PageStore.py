@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+
+from collections import OrderedDict
+
+
+class PageStore:
+    """
+    A size-capped page cache shared by link discovery and content loading.
+
+    Every entry keeps the response body, the status code and the ETag / Last-Modified validators of a URL,
+    so a page fetched during link discovery can be reused by the loading pass and revalidated with a cheap
+    conditional request on later crawls. Pages are held in memory or, if a directory is given, written to disk
+    next to a JSON index so that they survive restarts. The least recently used pages are evicted once the
+    total body size exceeds `max_bytes`.
+
+    Attributes:
+        directory (str or None): Directory for the on-disk store. None keeps the pages in memory.
+        max_bytes (int or None): Maximum total size of all stored bodies in bytes. None disables eviction.
+        total_bytes (int): Current total size of all stored bodies in bytes.
+        stats (dict): Counters for 'hits', 'misses', 'not_modified', 'stored' and 'evicted' pages.
+    """
+
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, directory: str = None, max_bytes: int = 512 * 1024 * 1024):
+        """
+        Initialize the page store and load an existing on-disk index.
+
+        Args:
+            directory (str, optional): Directory for the on-disk store. Defaults to None (in memory).
+            max_bytes (int, optional): Maximum total size of the stored bodies in bytes. Defaults to 512 MiB.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'not_modified': 0, 'stored': 0, 'evicted': 0}
+
+        # url -> {'status', 'etag', 'last_modified', 'size', 'body' (in memory only)}, in LRU order
+        self._entries = OrderedDict()
+
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            index_path = os.path.join(self.directory, self.INDEX_FILE)
+            if os.path.exists(index_path):
+                with open(index_path, encoding='utf-8') as file:
+                    for url, entry in json.load(file).items():
+                        if os.path.exists(self._body_path(url)):
+                            self._entries[url] = entry
+                            self.total_bytes += entry['size']
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _body_path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.html')
+
+    def get(self, url: str):
+        """
+        Return the stored body of a URL and mark it as recently used.
+
+        Args:
+            url (str): The page URL.
+
+        Returns:
+            str or None: The stored body, or None if the page is not in the store.
+        """
+        entry = self._entries.get(url)
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        self._entries.move_to_end(url)
+        self.stats['hits'] += 1
+        if self.directory is None:
+            return entry['body']
+        with open(self._body_path(url), encoding='utf-8') as file:
+            return file.read()
+
+    def conditional_headers(self, url: str) -> dict:
+        """
+        Build If-None-Match / If-Modified-Since request headers from the stored validators of a URL.
+
+        Args:
+            url (str): The page URL.
+
+        Returns:
+            dict: The conditional request headers, empty if nothing is stored for the URL.
+        """
+        entry = self._entries.get(url)
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, url: str, status: int, headers, body: str) -> None:
+        """
+        Store a fetched page and evict least recently used pages if the size cap is exceeded.
+
+        Args:
+            url (str): The page URL.
+            status (int): The HTTP status code of the response.
+            headers (Mapping): The response headers.
+            body (str): The response body.
+        """
+        self.discard(url)
+        size = len(body.encode('utf-8'))
+        entry = {
+            'status': status,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'size': size,
+        }
+        if self.directory is None:
+            entry['body'] = body
+        else:
+            with open(self._body_path(url), 'w', encoding='utf-8') as file:
+                file.write(body)
+
+        self._entries[url] = entry
+        self.total_bytes += size
+        self.stats['stored'] += 1
+
+        while self.max_bytes is not None and self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            self.discard(next(iter(self._entries)))
+            self.stats['evicted'] += 1
+
+    def update(self, url: str, status: int, headers, body: str):
+        """
+        Record a (possibly conditional) response and return the effective page body.
+
+        A 304 Not Modified response resolves to the stored body, any other response replaces the stored page.
+
+        Args:
+            url (str): The page URL.
+            status (int): The HTTP status code of the response.
+            headers (Mapping): The response headers.
+            body (str): The response body.
+
+        Returns:
+            str or None: The current body of the page, or None for a 304 on a page that is no longer stored.
+        """
+        if status == 304:
+            self.stats['not_modified'] += 1
+            return self.get(url)
+        self.put(url, status, headers, body)
+        return body
+
+    def discard(self, url: str) -> None:
+        """
+        Remove a page from the store, if present.
+
+        Args:
+            url (str): The page URL.
+        """
+        entry = self._entries.pop(url, None)
+        if entry is None:
+            return
+        self.total_bytes -= entry['size']
+        if self.directory is not None and os.path.exists(self._body_path(url)):
+            os.remove(self._body_path(url))
+
+    def flush(self) -> None:
+        """
+        Write the index of an on-disk store. A no-op for in-memory stores.
+        """
+        if self.directory is None:
+            return
+        index_path = os.path.join(self.directory, self.INDEX_FILE)
+        with open(index_path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(self._entries, file)
+        os.replace(index_path + '.tmp', index_path)
@@ -1,9 +1,18 @@
+import asyncio
 import requests
 
+from collections import deque
+from collections.abc import Iterator
 from urllib.parse import urljoin, urlparse
 from bs4 import BeautifulSoup
 from unstructured.partition.html import partition_html
 
+from rag_data_loading.AsyncCrawlEngine import AsyncCrawlEngine
+from rag_data_loading.CrawlCheckpoint import CrawlCheckpoint
+from rag_data_loading.PageStore import PageStore
+from rag_data_loading.SitemapReader import SitemapReader
+from rag_instrumentation.Instrumentation import instrumentation
+
 
 
 class RagWebCrawler:
@@ -15,15 +24,32 @@ class RagWebCrawler:
             base_url (str): The URL to start crawling from.
             external_urls (list[str]): A list of external URL netlocs (domains) to consider.
             timeout (int): Timeout (in seconds) for HTTP requests.
-            base_links (set): Set of crawled internal links.
+            max_workers (int): Number of concurrent workers used by the concurrent crawl mode.
+            max_per_host (int): Maximum number of parallel connections per host in the concurrent crawl mode.
+            politeness_delay (float): Minimum delay in seconds between two requests to the same host
+                                      in the concurrent crawl mode.
+            page_store (PageStore): Cache of fetched pages shared by link discovery and content loading.
+            checkpoint (CrawlCheckpoint or None): On-disk state of the link discovery, None disables resuming.
+            use_sitemap (bool): Whether the link discovery is seeded from the sitemaps of the site.
+            base_links (set): Set of crawled internal links, pages that could not be loaded are left out.
+            gone_links (set): Internal links answered with 404 Not Found or 410 Gone, pages confirmed removed
+                              whose chunks `VectorStore.update_vector_store` may delete.
             external_links (set): Set of crawled external links.
             web_content (list): List of elements extracted from the crawled pages.
         """
 
+    GONE_STATUS_CODES = (404, 410)
+
     def __init__(self,
                  base_url: str,
                  external_urls: list[str] = None,
-                 timeout: int = None
+                 timeout: int = None,
+                 max_workers: int = 10,
+                 max_per_host: int = 4,
+                 politeness_delay: float = 0.0,
+                 page_store: PageStore = None,
+                 checkpoint: CrawlCheckpoint = None,
+                 use_sitemap: bool = True
                 ):
         """
                 Initialize the RagWebCrawler with a base URL, optional external URLs, and timeout.
@@ -32,13 +58,33 @@ class RagWebCrawler:
                     base_url (str): The starting URL for crawling.
                     external_urls (list[str], optional): List of external URLs to filter by. Defaults to None.
                     timeout (int, optional): Timeout for HTTP requests in seconds. Defaults to None.
+                    max_workers (int, optional): Number of concurrent crawl workers. Defaults to 10.
+                    max_per_host (int, optional): Maximum parallel connections per host. Defaults to 4.
+                    politeness_delay (float, optional): Minimum delay in seconds between two requests
+                                                        to the same host. Defaults to 0.0.
+                    page_store (PageStore, optional): Page cache, pass an on-disk store to reuse pages across
+                                                      crawls. Defaults to a new in-memory store.
+                    checkpoint (CrawlCheckpoint, optional): Crawl state, pass one to resume interrupted crawls and
+                                                            to skip pages unchanged since the last crawl. Skipping
+                                                            needs an on-disk `page_store` that still holds the
+                                                            pages of the last crawl. Defaults to None.
+                    use_sitemap (bool, optional): Seed the link discovery from robots.txt / sitemap.xml.
+                                                  Defaults to True.
                 """
         self.external_urls = [
             self.get_netloc(url) for url in external_urls
         ] if external_urls is not None else []
         self.timeout = timeout
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.politeness_delay = politeness_delay
+        self.page_store = page_store if page_store is not None else PageStore()
+        self.checkpoint = checkpoint
+        self.use_sitemap = use_sitemap
+        self.session = requests.Session()
         self.base_url = base_url
         self.base_links = set()
+        self.gone_links = set()
         self.external_links = set()
 
         self.web_content = []
@@ -58,62 +104,289 @@ class RagWebCrawler:
 
     def get_links(self, url: str = None):
         """
-                Recursively crawl the base URL to extract internal links and extract external links of depth 1.
+                Crawl the base URL to extract internal links and extract external links of depth 1.
 
                 This method updates self.base_links with internal URLs and self.external_links with external URLs.
+                The frontier is seeded with the start URL and, if `use_sitemap` is set, with the pages listed in
+                the sitemaps of the site. With a checkpoint, every processed page is logged so that an
+                interrupted crawl resumes where it stopped, and pages whose sitemap `lastmod` has not changed
+                since the last completed crawl are neither fetched nor parsed, their links are taken from the
+                checkpoint. This skip needs an on-disk PageStore holding the pages of the last crawl, with the
+                default in-memory store every page is fetched. Pages answered with 304 Not Modified reuse their
+                stored links as well. Pages that could not be loaded are not logged, a resumed crawl retries them.
 
                 Args:
                     url (str, optional): The URL to crawl. If None, uses the base_url. Defaults to None.
                 """
-        if url is None:
-            url = self.base_url
+        visited, frontier = self.start_discovery(url if url is not None else self.base_url)
+        self.base_links.update(visited)
+        frontier = deque(frontier)
 
-        if url in self.base_links:
-            return
+        failed = set()
+        try:
+            while frontier:
+                url = frontier.popleft()
+                links = self.crawl_page(url)
+                if links is None:
+                    failed.add(url)
+                    continue
+                for link in links:
+                    if link not in self.base_links:
+                        self.base_links.add(link)
+                        frontier.append(link)
+        finally:
+            self.base_links.difference_update(failed)
+            self.page_store.flush()
+            if self.checkpoint is not None:
+                self.checkpoint.close()
+
+        if self.checkpoint is not None:
+            self.checkpoint.complete()
+
+    def start_discovery(self, url: str) -> tuple[set[str], list[str]]:
+        """
+                Resume the link discovery from the checkpoint or start a new one from the URL and the sitemaps.
 
-        self.base_links.add(url)
+                Args:
+                    url (str): The start URL.
 
-        try:
-            response = requests.get(url, timeout=self.timeout)
-            response.raise_for_status()
-        except requests.RequestException:
-            print(f'{url} could not be loaded.')
-            return
+                Returns:
+                    tuple[set[str], list[str]]: The scheduled URLs and the URLs still to be processed.
+                """
+        if self.checkpoint is not None and self.checkpoint.in_progress:
+            visited, frontier = self.checkpoint.frontier()
+            for page in self.checkpoint.processed.values():
+                self.external_links.update(page['external_links'])
+            print(f'--- Resuming crawl: {len(self.checkpoint.processed)} pages done, {len(frontier)} to go. ---')
+            return visited, frontier
+
+        lastmod = self.read_sitemap() if self.use_sitemap else {}
+        seeds = [url] + [link for link in lastmod if link != url]
+        if self.checkpoint is not None:
+            self.checkpoint.start(seeds, lastmod)
+        return set(seeds), seeds
+
+    def read_sitemap(self) -> dict[str, str]:
+        """
+                Read the internal pages listed in the sitemaps of the base URL.
+
+                Returns:
+                    dict[str, str]: The page URLs mapped to their `lastmod`, None if the sitemap does not give one.
+                """
+        base_netloc = self.get_netloc(self.base_url)
+        pages = SitemapReader(self.session, self.timeout).read(self.base_url)
+        return {url: lastmod for url, lastmod in pages.items() if self.get_netloc(url) == base_netloc}
+
+    def crawl_page(self, url: str) -> list[str]:
+        """
+                Process a single page of the link discovery and return its internal links.
+
+                Args:
+                    url (str): The URL of the page.
+
+                Returns:
+                    list[str] or None: The internal links of the page, None if it could not be loaded.
+                """
+        links = self.unchanged_links(url)
+        if links is not None:
+            return links
+
+        status, html = self._fetch(url)
+        if html is None:
+            return None
+        if status == 304 and self.checkpoint is not None and url in self.checkpoint.pages:
+            previous = self.checkpoint.pages[url]
+            links, external_links = previous['links'], previous['external_links']
+        else:
+            links, external_links = self.parse_links(url, html)
+        self.record_page(url, links, external_links)
+        return links
+
+    def unchanged_links(self, url: str) -> list[str] | None:
+        """
+                Take the links of a page from the checkpoint if its sitemap `lastmod` has not changed since the
+                last completed crawl and the page is still in the page store.
+
+                Args:
+                    url (str): The URL of the page.
+
+                Returns:
+                    list[str] or None: The internal links of the page, None if it has to be fetched.
+                """
+        previous = self.checkpoint.unchanged(url) if self.checkpoint is not None else None
+        if previous is None or url not in self.page_store:
+            return None
+        instrumentation.count('pages_unchanged')
+        self.record_page(url, previous['links'], previous['external_links'])
+        return previous['links']
+
+    def record_page(self, url: str, links: list[str], external_links: list[str]) -> None:
+        """
+                Keep the external links of a processed page and log the page in the checkpoint.
+                """
+        self.external_links.update(external_links)
+        if self.checkpoint is not None:
+            self.checkpoint.record(url, links, external_links)
+
+    def fetch_page(self, url: str, revalidate: bool = True):
+        """
+                Fetch a page through the page store.
+
+                Pages already in the store are either returned directly or revalidated with a conditional
+                request, in which case an unchanged page costs a 304 response instead of a full download.
+
+                Args:
+                    url (str): The URL to fetch.
+                    revalidate (bool, optional): Whether stored pages are revalidated with the server.
+                                                 Defaults to True.
+
+                Returns:
+                    str or None: The HTML body of the page, or None if it could not be loaded.
+                """
+        return self._fetch(url, revalidate)[1]
+
+    def _fetch(self, url: str, revalidate: bool = True) -> tuple:
+        """
+                Fetch a page through the page store like `fetch_page`.
+
+                Returns:
+                    tuple: (status, html), status is None for pages served from the store or not loaded.
+                """
+        if not revalidate and url in self.page_store:
+            instrumentation.count('page_store_hits')
+            return None, self.page_store.get(url)
+
+        with instrumentation.span('fetch'):
+            try:
+                response = self.session.get(url, timeout=self.timeout, headers=self.page_store.conditional_headers(url))
+                response.raise_for_status()
+            except requests.RequestException as error:
+                if getattr(error.response, 'status_code', None) in self.GONE_STATUS_CODES:
+                    self.gone_links.add(url)
+                instrumentation.count('fetch_errors')
+                print(f'{url} could not be loaded.')
+                return None, None
+
+        instrumentation.count('pages_not_modified' if response.status_code == 304 else 'pages_fetched')
+        return response.status_code, self.page_store.update(url, response.status_code, response.headers, response.text)
+
+    def extract_links(self, url: str, html: str) -> list[str]:
+        """
+                Parse a page and return its internal links. External links are added to self.external_links.
+
+                Args:
+                    url (str): The URL of the page, used to resolve relative links.
+                    html (str): The HTML body of the page.
+
+                Returns:
+                    list[str]: The internal links found on the page.
+                """
+        internal_links, external_links = self.parse_links(url, html)
+        self.external_links.update(external_links)
+        return internal_links
+
+    def parse_links(self, url: str, html: str) -> tuple[list[str], list[str]]:
+        """
+                Parse a page and return its internal and its external links.
 
-        html_corpus = BeautifulSoup(response.text, 'html.parser')
+                Args:
+                    url (str): The URL of the page, used to resolve relative links.
+                    html (str): The HTML body of the page.
+
+                Returns:
+                    tuple[list[str], list[str]]: The internal and the external links found on the page.
+                """
+        with instrumentation.span('extract_links'):
+            html_corpus = BeautifulSoup(html, 'html.parser')
+        base_netloc = self.get_netloc(self.base_url)
 
-        # crawl sub links
+        internal_links, external_links = [], []
         for link in html_corpus.find_all('a', href=True):
             full_url = urljoin(url, link['href'])
-            if self.get_netloc(full_url) in self.external_urls:
-                self.external_links.add(full_url)
-            if self.get_netloc(full_url) == self.get_netloc(self.base_url):
-                self.get_links(full_url)
+            netloc = self.get_netloc(full_url)
+            if netloc in self.external_urls:
+                external_links.append(full_url)
+            if netloc == base_netloc:
+                internal_links.append(full_url)
+        return internal_links, external_links
+
+    async def get_links_async(self) -> None:
+        """
+                Crawl the base URL breadth-first with a pool of asyncio workers.
 
-        return
+                Fills self.base_links and self.external_links like `get_links`, but fetches pages concurrently
+                over pooled connections, honours the per-host connection limit and politeness delay and does
+                not recurse, so arbitrarily deep sites can be crawled. The crawl is seeded from the sitemaps and
+                resumed from and logged to the checkpoint like `get_links`, unchanged pages are skipped if the
+                page store is on disk.
+                """
+        visited, frontier = self.start_discovery(self.base_url)
+        # The engine schedules the frontier itself, so only the URLs already processed count as visited
+        self.base_links.update(visited.difference(frontier))
+        engine = AsyncCrawlEngine(max_workers=self.max_workers,
+                                  max_per_host=self.max_per_host,
+                                  politeness_delay=self.politeness_delay,
+                                  timeout=self.timeout)
+
+        async def on_page(url: str, status: int, headers, body: str) -> list[str]:
+            # The page store and the checkpoint are updated on the event loop, only parsing runs in a thread
+            html = self.page_store.update(url, status, headers, body)
+            if html is None:
+                return []
+            if status == 304 and self.checkpoint is not None and url in self.checkpoint.pages:
+                previous = self.checkpoint.pages[url]
+                links, external_links = previous['links'], previous['external_links']
+            else:
+                links, external_links = await asyncio.to_thread(self.parse_links, url, html)
+            self.record_page(url, links, external_links)
+            return links
+
+        try:
+            await engine.crawl(frontier,
+                               on_page,
+                               visited=self.base_links,
+                               request_headers=self.page_store.conditional_headers,
+                               known_links=self.unchanged_links)
+        finally:
+            self.base_links.difference_update(engine.errors)
+            self.gone_links.update(url for url, status in engine.errors.items() if status in self.GONE_STATUS_CODES)
+            self.page_store.flush()
+            if self.checkpoint is not None:
+                self.checkpoint.close()
+
+        if self.checkpoint is not None:
+            self.checkpoint.complete()
+
+    def get_links_concurrent(self) -> None:
+        """
+                Blocking entry point for the concurrent crawl mode, see `get_links_async`.
+                """
+        asyncio.run(self.get_links_async())
 
     def load_content_from_links(self, links: set[str]) -> None:
         """
         Load web content from a given set of URLs and append the extracted elements to self.web_content.
 
-        For each URL in the provided set, an HTTP GET request is performed using the specified timeout.
-        If the request succeeds, the response text is processed by the unstructured library's partition_html
-        function to extract content elements, which are then added to the web_content list.
+        For each URL in the provided set, the page body is taken from the page store filled during link
+        discovery; only pages that are not stored are fetched with an HTTP GET request using the specified
+        timeout. The HTML is processed by the unstructured library's partition_html function to extract
+        content elements, which are then added to the web_content list.
 
         Args:
             links (set[str]): A set of URLs from which to load content.
         """
         for url in links:
-            try:
-                # Fetch the page content with the specified timeout.
-                response = requests.get(url, timeout=self.timeout)
-                response.raise_for_status()
-            except requests.RequestException:
-                print(f'{url} could not be loaded.')
+            # Reuse the page from the discovery pass or fetch it with the specified timeout.
+            html = self.fetch_page(url, revalidate=False)
+            if html is None:
                 continue
 
             # Extract content elements from the HTML response using the unstructured library.
-            elements = partition_html(text=response.text)
+            with instrumentation.span('partition_html'):
+                elements = partition_html(text=html)
+            # Record the source URL, it identifies the page when the vector store is updated incrementally.
+            for element in elements:
+                element.metadata.url = url
             # Append the extracted elements to the accumulated web content.
             self.web_content.extend(elements)
 
@@ -146,8 +419,51 @@ class RagWebCrawler:
             self.load_content_from_links(self.external_links)
             print('--- Loading complete. ---')
 
+        self.page_store.flush()
         return self.web_content
 
+    def load_web_pages(self, external_sources: bool = False) -> list[tuple[str, str]]:
+        """
+        Load the raw HTML of the crawled pages without partitioning it.
+
+        Used by the parallel ingest path, which partitions the pages in worker processes.
+        Pages are returned sorted by URL so that downstream processing is deterministic.
+
+        Args:
+            external_sources (bool): Whether to also load external links. Defaults to False.
+
+        Returns:
+            list[tuple[str, str]]: (url, html) pairs of all pages that could be loaded.
+        """
+        print(f'--- Load web pages from {self.base_url} ---')
+        pages = list(self.iter_web_pages(external_sources))
+        print(f'--- Loading complete, {len(pages)} pages loaded. ---')
+        return pages
+
+    def iter_web_pages(self, external_sources: bool = False, skip: set[str] = None) -> Iterator[tuple[str, str]]:
+        """
+        Lazily load the raw HTML of the crawled pages one page at a time, sorted by URL.
+
+        Args:
+            external_sources (bool): Whether to also load external links. Defaults to False.
+            skip (set[str], optional): URLs that are not loaded, e.g. pages already ingested. Defaults to None.
+
+        Yields:
+            tuple[str, str]: (url, html) pairs of the pages that could be loaded.
+        """
+        links = sorted(self.base_links)
+        if external_sources:
+            links += sorted(self.external_links)
+
+        for url in links:
+            if skip is not None and url in skip:
+                continue
+            html = self.fetch_page(url, revalidate=False)
+            if html is not None:
+                yield url, html
+
+        self.page_store.flush()
+
 
 
 
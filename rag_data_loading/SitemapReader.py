@@ -0,0 +1,108 @@
+import gzip
+import requests
+
+from urllib.parse import urljoin
+from xml.etree import ElementTree
+
+
+class SitemapReader:
+    """
+    Reads the page URLs and their `lastmod` dates from the sitemaps of a site.
+
+    The sitemaps are taken from the `Sitemap:` lines of `/robots.txt`, falling back to `/sitemap.xml`.
+    Sitemap index files are followed, gzipped sitemaps are decompressed.
+
+    Attributes:
+        session (requests.Session): Session used for the requests.
+        timeout (int): Timeout (in seconds) for HTTP requests.
+        max_sitemaps (int): Maximum number of sitemap files read per site.
+    """
+
+    def __init__(self, session: requests.Session = None, timeout: int = None, max_sitemaps: int = 100):
+        """
+        Initialize the sitemap reader.
+
+        Args:
+            session (requests.Session, optional): Session used for the requests. Defaults to a new session.
+            timeout (int, optional): Timeout for HTTP requests in seconds. Defaults to None.
+            max_sitemaps (int, optional): Maximum number of sitemap files read per site. Defaults to 100.
+        """
+        self.session = session if session is not None else requests.Session()
+        self.timeout = timeout
+        self.max_sitemaps = max_sitemaps
+
+    def _get(self, url: str):
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException:
+            return None
+        return response
+
+    def sitemap_urls(self, base_url: str) -> list[str]:
+        """
+        Find the sitemaps of a site in its robots.txt.
+
+        Args:
+            base_url (str): A URL of the site.
+
+        Returns:
+            list[str]: The sitemap URLs listed in robots.txt, or the default `/sitemap.xml`.
+        """
+        response = self._get(urljoin(base_url, '/robots.txt'))
+        sitemaps = []
+        if response is not None:
+            for line in response.text.splitlines():
+                key, _, value = line.partition(':')
+                if key.strip().lower() == 'sitemap' and value.strip():
+                    sitemaps.append(urljoin(base_url, value.strip()))
+        return sitemaps or [urljoin(base_url, '/sitemap.xml')]
+
+    @staticmethod
+    def _children(element: ElementTree.Element, name: str) -> list[ElementTree.Element]:
+        # Sitemaps are namespaced, the tag is compared without the namespace
+        return [child for child in element if child.tag.rsplit('}', 1)[-1] == name]
+
+    @classmethod
+    def _text(cls, element: ElementTree.Element, name: str):
+        children = cls._children(element, name)
+        return children[0].text.strip() if children and children[0].text else None
+
+    def read(self, base_url: str) -> dict[str, str]:
+        """
+        Read all page URLs of a site from its sitemaps.
+
+        Args:
+            base_url (str): A URL of the site.
+
+        Returns:
+            dict[str, str]: The page URLs mapped to their `lastmod`, None if not given. Empty if the site has
+                            no readable sitemap.
+        """
+        pages, queue, seen = {}, self.sitemap_urls(base_url), set()
+        while queue and len(seen) < self.max_sitemaps:
+            sitemap_url = queue.pop(0)
+            if sitemap_url in seen:
+                continue
+            seen.add(sitemap_url)
+            response = self._get(sitemap_url)
+            if response is None:
+                continue
+            content = response.content
+            if sitemap_url.endswith('.gz') and content[:2] == b'\x1f\x8b':
+                content = gzip.decompress(content)
+            try:
+                root = ElementTree.fromstring(content)
+            except ElementTree.ParseError:
+                print(f'{sitemap_url} is not a valid sitemap.')
+                continue
+
+            if root.tag.rsplit('}', 1)[-1] == 'sitemapindex':
+                queue.extend(urljoin(sitemap_url, location) for sitemap in self._children(root, 'sitemap')
+                             if (location := self._text(sitemap, 'loc')))
+                continue
+            for entry in self._children(root, 'url'):
+                location = self._text(entry, 'loc')
+                if location:
+                    pages[location] = self._text(entry, 'lastmod')
+        return pages
@@ -0,0 +1,376 @@
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+
+from collections import defaultdict
+from contextlib import contextmanager
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+
+
+_current_span = contextvars.ContextVar('rag_current_span', default=None)
+_current_collector = contextvars.ContextVar('rag_current_collector', default=None)
+
+
+class _NullSpan:
+    """
+    Shared no-op span returned while instrumentation is disabled.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('instrumentation', 'name', 'labels', 'span_id', 'parent_id', 'start', '_token')
+
+    def __init__(self, instrumentation, name: str, labels: dict):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.labels = labels
+        self.span_id = next(instrumentation._ids)
+
+    def __enter__(self):
+        parent = _current_span.get()
+        self.parent_id = parent.span_id if parent is not None else None
+        self._token = _current_span.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        duration = time.perf_counter() - self.start
+        _current_span.reset(self._token)
+        self.instrumentation.record_span(self.name, duration, self.labels,
+                                         span_id=self.span_id, parent_id=self.parent_id, error=exc_type is not None)
+        return False
+
+
+class Instrumentation:
+    """
+    Lightweight spans and counters for the crawl, ingest and chat pipeline.
+
+    Spans time a stage (`with instrumentation.span('fetch'):`) and counters count events
+    (`instrumentation.count('pages_fetched')`). While disabled, `span` returns a shared no-op context manager
+    and `count` returns immediately, so instrumented code pays almost nothing. Aggregates can be exported in the
+    Prometheus text format, and every finished span can be appended to a JSON lines trace log. `collect`
+    gathers the spans of a single request, e.g. to report per-request timings.
+
+    Instrumentation is enabled by setting the environment variable RAG_INSTRUMENTATION=1 or via `configure`.
+
+    Attributes:
+        enabled (bool): Whether spans and counters are recorded.
+        trace_path (str or None): JSON lines file every finished span is appended to.
+        prefix (str): Prefix of the exported metric names.
+    """
+
+    def __init__(self, enabled: bool = False, trace_path: str = None, prefix: str = 'rag'):
+        self.enabled = enabled
+        self.trace_path = trace_path
+        self.prefix = prefix
+
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._span_sums = defaultdict(float)
+        self._span_counts = defaultdict(int)
+        self._counters = defaultdict(float)
+        self._trace_file = None
+
+    def configure(self, enabled: bool = True, trace_path: str = None) -> None:
+        """
+        Enable or disable instrumentation and set the trace log.
+
+        Args:
+            enabled (bool, optional): Whether spans and counters are recorded. Defaults to True.
+            trace_path (str, optional): JSON lines file finished spans are appended to. Defaults to None.
+        """
+        with self._lock:
+            if self._trace_file is not None:
+                self._trace_file.close()
+                self._trace_file = None
+            self.enabled = enabled
+            self.trace_path = trace_path
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+    def span(self, name: str, **labels):
+        """
+        Time a stage.
+
+        Args:
+            name (str): Name of the stage.
+            **labels: Additional labels of the span, e.g. the host of a fetched page.
+
+        Returns:
+            A context manager timing the enclosed block.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, labels)
+
+    def count(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Increase a counter.
+
+        Args:
+            name (str): Name of the counter.
+            value (float, optional): Increment. Defaults to 1.
+            **labels: Additional labels of the counter.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[self._key(name, labels)] += value
+
+    def record_span(self, name: str, duration: float, labels: dict = None,
+                    span_id: int = None, parent_id: int = None, error: bool = False) -> None:
+        """
+        Record a finished span, also used for spans measured outside of `span`, e.g. by callbacks.
+
+        Args:
+            name (str): Name of the stage.
+            duration (float): Duration in seconds.
+            labels (dict, optional): Labels of the span. Defaults to None.
+            span_id (int, optional): Id of the span in the trace log. Defaults to None.
+            parent_id (int, optional): Id of the enclosing span in the trace log. Defaults to None.
+            error (bool, optional): Whether the stage raised an exception. Defaults to False.
+        """
+        if not self.enabled:
+            return
+        labels = labels or {}
+        collector = _current_collector.get()
+        if collector is not None:
+            collector.append((name, time.perf_counter() - duration, duration))
+
+        with self._lock:
+            key = self._key(name, labels)
+            self._span_sums[key] += duration
+            self._span_counts[key] += 1
+            if self.trace_path is not None:
+                if self._trace_file is None:
+                    self._trace_file = open(self.trace_path, 'a', encoding='utf-8')
+                self._trace_file.write(json.dumps({
+                    'name': name, 'duration': duration, 'labels': labels, 'span_id': span_id,
+                    'parent_id': parent_id, 'error': error, 'timestamp': time.time(), 'pid': os.getpid(),
+                }) + '\n')
+                self._trace_file.flush()
+
+    @contextmanager
+    def collect(self):
+        """
+        Collect the spans recorded in the current context, e.g. while answering one request.
+
+        Yields:
+            list[tuple[str, float, float]]: (name, start, duration) of the spans finished inside the block.
+        """
+        spans = []
+        token = _current_collector.set(spans)
+        try:
+            yield spans
+        finally:
+            try:
+                _current_collector.reset(token)
+            except ValueError:
+                # An async generator closed from another context, the context it was set in is gone anyway
+                pass
+
+    @staticmethod
+    def breakdown(spans: list[tuple[str, float, float]]) -> dict:
+        """
+        Sum collected spans by name.
+
+        Args:
+            spans (list[tuple[str, float, float]]): Spans returned by `collect`.
+
+        Returns:
+            dict: Total seconds per span name.
+        """
+        totals = defaultdict(float)
+        for name, _, duration in spans:
+            totals[name] += duration
+        return dict(totals)
+
+    @staticmethod
+    def self_time(spans: list[tuple[str, float, float]], parent: str, child: str) -> float:
+        """
+        Total time of the `parent` spans not covered by `child` spans running inside them, e.g. the vector
+        search part of a retrieval that also embeds the query.
+
+        Args:
+            spans (list[tuple[str, float, float]]): Spans returned by `collect`.
+            parent (str): Name of the enclosing spans.
+            child (str): Name of the nested spans to subtract.
+
+        Returns:
+            float: The remaining seconds.
+        """
+        total = 0.0
+        children = [(start, start + duration) for name, start, duration in spans if name == child]
+        for name, start, duration in spans:
+            if name != parent:
+                continue
+            end = start + duration
+            total += duration - sum(c_end - c_start for c_start, c_end in children if start <= c_start and c_end <= end)
+        return total
+
+    @staticmethod
+    def _escape(value) -> str:
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    def _labels(self, name: str, labels: tuple, label_name: str = None) -> str:
+        pairs = ([(label_name, name)] if label_name else []) + list(labels)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{key}="{self._escape(value)}"' for key, value in pairs) + '}'
+
+    def prometheus_text(self) -> str:
+        """
+        Returns:
+            str: All spans and counters in the Prometheus text exposition format, with one HELP and TYPE line
+                 per metric.
+        """
+        with self._lock:
+            lines = [f'# HELP {self.prefix}_span_seconds Seconds spent in instrumented spans.',
+                     f'# TYPE {self.prefix}_span_seconds summary']
+            for (name, labels), total in sorted(self._span_sums.items()):
+                label_text = self._labels(name, labels, 'span')
+                lines.append(f'{self.prefix}_span_seconds_sum{label_text} {total:.6f}')
+                lines.append(f'{self.prefix}_span_seconds_count{label_text} {self._span_counts[(name, labels)]}')
+            previous = None
+            for (name, labels), value in sorted(self._counters.items()):
+                if name != previous:
+                    lines.append(f'# HELP {self.prefix}_{name}_total Instrumentation counter {name}.')
+                    lines.append(f'# TYPE {self.prefix}_{name}_total counter')
+                    previous = name
+                lines.append(f'{self.prefix}_{name}_total{self._labels(name, labels)} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str) -> None:
+        """
+        Write the Prometheus text format to a file, e.g. for the node exporter textfile collector.
+
+        Args:
+            path (str): The output file.
+        """
+        with open(path + '.tmp', 'w', encoding='utf-8') as file:
+            file.write(self.prometheus_text())
+        os.replace(path + '.tmp', path)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._span_sums.clear()
+            self._span_counts.clear()
+            self._counters.clear()
+
+
+class InstrumentedEmbeddings(Embeddings):
+    """
+    Wraps an embedding model with 'embed_documents', 'embed_query' and 'embed_queries' spans.
+
+    Attributes:
+        embedding (Embeddings): The wrapped embedding model.
+    """
+
+    def __init__(self, embedding: Embeddings):
+        self.embedding = embedding
+
+    def __getattr__(self, name: str):
+        # Expose attributes of the wrapped model, e.g. the cache statistics of CachedEmbeddings
+        if name == 'embedding':
+            raise AttributeError(name)
+        return getattr(self.embedding, name)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        with instrumentation.span('embed_documents'):
+            instrumentation.count('texts_embedded', len(texts))
+            return self.embedding.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        with instrumentation.span('embed_query'):
+            return self.embedding.embed_query(text)
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embed many queries in one call, as documents if the wrapped model has no separate query encoding.
+        """
+        with instrumentation.span('embed_queries'):
+            instrumentation.count('queries_embedded', len(texts))
+            if hasattr(self.embedding, 'embed_queries'):
+                return self.embedding.embed_queries(texts)
+            return self.embedding.embed_documents(texts)
+
+
+class InstrumentationCallback(BaseCallbackHandler):
+    """
+    LangChain callback handler turning chain events into spans.
+
+    LLM calls inside the retrieval step of the chain (the history-aware retriever) are recorded as
+    'contextualize_question', all other LLM calls as 'generation', and retriever calls as 'retrieval'
+    (query embedding plus vector search).
+    """
+
+    # Run names of the retrieval step in create_retrieval_chain and create_history_aware_retriever
+    CONTEXTUALIZE_RUN_NAMES = ('retrieve_documents', 'chat_retriever_chain')
+
+    def __init__(self):
+        self._runs = {}
+
+    def _start(self, run_id: UUID, parent_run_id: UUID, name: str) -> None:
+        parent = self._runs.get(parent_run_id)
+        inside_contextualize = name in self.CONTEXTUALIZE_RUN_NAMES or (parent is not None and parent[2])
+        self._runs[run_id] = (name, time.perf_counter(), inside_contextualize)
+
+    def _end(self, run_id: UUID, span_name: str = None) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is not None and span_name is not None:
+            instrumentation.record_span(span_name, time.perf_counter() - run[1])
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, kwargs.get('name') or '')
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, 'llm')
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, 'llm')
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._runs.get(run_id)
+        if run is not None:
+            instrumentation.count('llm_calls')
+            self._end(run_id, 'contextualize_question' if run[2] else 'generation')
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, 'retriever')
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        instrumentation.count('documents_retrieved', len(documents))
+        self._end(run_id, 'retrieval')
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+
+instrumentation = Instrumentation(enabled=os.getenv('RAG_INSTRUMENTATION', '0') == '1',
+                                  trace_path=os.getenv('RAG_TRACE_PATH'))
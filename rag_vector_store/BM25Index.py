@@ -0,0 +1,170 @@
+import heapq
+import json
+import math
+import os
+import re
+
+from collections import Counter
+
+from langchain.schema import Document
+
+
+class BM25Index:
+    """
+    A persistent inverted index ranking document chunks with Okapi BM25.
+
+    The index keeps a postings list (term -> chunk -> term frequency) next to the chunks themselves, so lexical
+    searches need neither the embedding model nor Chroma. Chunks are identified by the same stable IDs as in the
+    vector store, which makes upserts and deletions mirror the Chroma collection. The index is saved as JSON.
+
+    Attributes:
+        k1 (float): Term frequency saturation.
+        b (float): Document length normalisation.
+    """
+
+    TOKEN_PATTERN = re.compile(r'\w+')
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize an empty index.
+
+        Args:
+            k1 (float, optional): Term frequency saturation. Defaults to 1.5.
+            b (float, optional): Document length normalisation. Defaults to 0.75.
+        """
+        self.k1 = k1
+        self.b = b
+
+        # Chunks live in slots, deleted chunks leave empty slots until the index is saved
+        self._ids = []
+        self._documents = []
+        self._lengths = []
+        self._slots = {}
+        self._postings = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._slots
+
+    @classmethod
+    def tokenize(cls, text: str) -> list[str]:
+        return cls.TOKEN_PATTERN.findall(text.lower())
+
+    def add(self, documents: list[Document], ids: list[str]) -> None:
+        """
+        Add or replace chunks.
+
+        Args:
+            documents (List[Document]): The document chunks.
+            ids (List[str]): Their stable IDs.
+        """
+        for document, doc_id in zip(documents, ids):
+            if doc_id in self._slots:
+                self.delete([doc_id])
+            tokens = self.tokenize(document.page_content)
+            slot = len(self._ids)
+            self._ids.append(doc_id)
+            self._documents.append(document)
+            self._lengths.append(len(tokens))
+            self._slots[doc_id] = slot
+            self._total_length += len(tokens)
+            for term, frequency in Counter(tokens).items():
+                self._postings.setdefault(term, {})[slot] = frequency
+
+    def delete(self, ids: list[str]) -> None:
+        """
+        Remove chunks, unknown IDs are ignored.
+
+        Args:
+            ids (List[str]): The IDs of the chunks to remove.
+        """
+        for doc_id in ids:
+            slot = self._slots.pop(doc_id, None)
+            if slot is None:
+                continue
+            for term in set(self.tokenize(self._documents[slot].page_content)):
+                postings = self._postings[term]
+                del postings[slot]
+                if not postings:
+                    del self._postings[term]
+            self._total_length -= self._lengths[slot]
+            self._ids[slot] = self._documents[slot] = None
+
+    def search(self, query: str, k: int = 4) -> list[tuple[Document, float]]:
+        """
+        Rank the chunks for a query.
+
+        Args:
+            query (str): The query.
+            k (int, optional): Number of results. Defaults to 4.
+
+        Returns:
+            List[tuple[Document, float]]: The best chunks with their BM25 scores, best first. Chunks sharing no
+                                          term with the query are not returned.
+        """
+        if not self._slots:
+            return []
+        num_documents = len(self._slots)
+        average_length = self._total_length / num_documents
+
+        scores = {}
+        for term in set(self.tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (num_documents - len(postings) + 0.5) / (len(postings) + 0.5))
+            for slot, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[slot] / average_length)
+                scores[slot] = scores.get(slot, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self._documents[slot], score) for slot, score in best]
+
+    def save(self, path: str) -> None:
+        """
+        Write the index to a JSON file, replacing it atomically.
+
+        Args:
+            path (str): The index file.
+        """
+        # Compact the slots, so that deleted chunks do not take up space on disk
+        slots = sorted(self._slots.values())
+        new_slot = {slot: position for position, slot in enumerate(slots)}
+        data = {
+            'k1': self.k1,
+            'b': self.b,
+            'ids': [self._ids[slot] for slot in slots],
+            'documents': [[self._documents[slot].page_content, self._documents[slot].metadata] for slot in slots],
+            'lengths': [self._lengths[slot] for slot in slots],
+            'postings': {term: [[new_slot[slot], frequency] for slot, frequency in postings.items()]
+                         for term, postings in self._postings.items()},
+        }
+        with open(path + '.tmp', 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path: str) -> 'BM25Index':
+        """
+        Read an index written by `save`.
+
+        Args:
+            path (str): The index file.
+
+        Returns:
+            BM25Index: The loaded index.
+        """
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+        index = cls(k1=data['k1'], b=data['b'])
+        index._ids = data['ids']
+        index._documents = [Document(page_content=content, metadata=metadata) for content, metadata in data['documents']]
+        index._lengths = data['lengths']
+        index._slots = {doc_id: slot for slot, doc_id in enumerate(index._ids)}
+        index._postings = {term: dict((slot, frequency) for slot, frequency in postings)
+                           for term, postings in data['postings'].items()}
+        index._total_length = sum(index._lengths)
+        return index
@@ -0,0 +1,272 @@
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+
+from collections import OrderedDict
+
+import numpy as np
+
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    A persistent, content-addressed cache in front of an embedding model.
+
+    Embeddings are keyed by the model name, the kind (document or query) and a hash of the text and are
+    stored in a memory-mapped float32 matrix with a JSON index mapping keys to matrix rows. Every model gets its
+    own subdirectory of `cache_dir`, so models of different dimensions can share a cache directory. The cache
+    serves both document and query embeddings, holds at most `max_entries` vectors and evicts the least recently
+    used ones.
+
+    The index is written in batches: once the unsaved entries exceed `FLUSH_EVERY` or a quarter of the index,
+    when the least recently used entries are evicted and at exit, so that an ingest writes it a logarithmic
+    number of times. Call `flush` at the end of an ingest to persist it right away. Entries added after the last
+    write are lost on a crash, their matrix rows are simply reused.
+
+    Attributes:
+        embedding (Embeddings): The wrapped embedding model.
+        model_name (str): Name of the embedding model, part of every cache key.
+        cache_dir (str): Root directory of the cache.
+        directory (str): Directory of the matrix and index files of this model.
+        max_entries (int): Maximum number of cached embeddings.
+        stats (dict): Counters for cache 'hits', 'misses' and 'evictions'.
+    """
+
+    INDEX_FILE = 'index.json'
+    MATRIX_FILE = 'embeddings.f32'
+    FLUSH_EVERY = 256
+    EVICT_FRACTION = 0.1
+
+    def __init__(self,
+                 embedding: Embeddings,
+                 model_name: str,
+                 cache_dir: str = './EmbeddingCache',
+                 max_entries: int = 200_000
+                 ):
+        """
+        Initialize the cache and load an existing index.
+
+        Args:
+            embedding (Embeddings): The embedding model computing cache misses.
+            model_name (str): Name of the embedding model.
+            cache_dir (str, optional): Directory of the cache files. Defaults to './EmbeddingCache'.
+            max_entries (int, optional): Maximum number of cached embeddings. Defaults to 200000.
+        """
+        self.embedding = embedding
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.directory = os.path.join(cache_dir, self.model_directory(model_name))
+        self.max_entries = max_entries
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+        self._lock = threading.RLock()
+        self._slots = OrderedDict()  # key -> matrix row, in LRU order
+        self._free_slots = []
+        self._dim = None
+        self._capacity = 0
+        self._matrix = None
+        self._dirty = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        index_path = os.path.join(self.directory, self.INDEX_FILE)
+        if os.path.exists(index_path) and os.path.exists(os.path.join(self.directory, self.MATRIX_FILE)):
+            with open(index_path, encoding='utf-8') as file:
+                index = json.load(file)
+            if index.get('model_name') != self.model_name:
+                raise ValueError(f'The embedding cache in {self.directory} belongs to model '
+                                 f'{index.get("model_name")!r}, not {self.model_name!r}.')
+            self._dim = index['dim']
+            self._capacity = index['capacity']
+            self._slots = OrderedDict(index['slots'])
+            self._free_slots = index['free_slots']
+            self._open_matrix()
+        atexit.register(self.flush)
+
+    @staticmethod
+    def model_directory(model_name: str) -> str:
+        """
+        Returns:
+            str: Name of the cache subdirectory of a model, readable and unique per model name.
+        """
+        readable = re.sub(r'[^A-Za-z0-9._-]+', '_', model_name)[-64:]
+        return f'{readable}-{hashlib.sha256(model_name.encode("utf-8")).hexdigest()[:8]}'
+
+    def _key(self, text: str, kind: str) -> str:
+        return hashlib.sha256(f'{self.model_name}\x00{kind}\x00{text}'.encode('utf-8')).hexdigest()
+
+    def _open_matrix(self) -> None:
+        self._matrix = np.memmap(os.path.join(self.directory, self.MATRIX_FILE),
+                                 dtype=np.float32, mode='r+', shape=(self._capacity, self._dim))
+
+    def _grow(self, needed: int) -> None:
+        """
+        Grow the matrix file so that `needed` rows fit, doubling its size up to `max_entries` rows.
+        """
+        capacity = min(max(needed, 2 * self._capacity, 1024), self.max_entries)
+        if capacity <= self._capacity:
+            return
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        with open(os.path.join(self.directory, self.MATRIX_FILE), 'ab') as file:
+            file.truncate(capacity * self._dim * np.dtype(np.float32).itemsize)
+        self._free_slots.extend(range(capacity - 1, self._capacity - 1, -1))
+        self._capacity = capacity
+        self._open_matrix()
+
+    def _allocate_slot(self) -> int:
+        if not self._free_slots:
+            self._grow(self._capacity + 1)
+        if not self._free_slots:
+            self._evict(max(1, int(self.EVICT_FRACTION * len(self._slots))))
+        return self._free_slots.pop()
+
+    def _evict(self, count: int) -> None:
+        """
+        Evict the `count` least recently used entries. The index is written before their rows are reused, so
+        that the index on disk never maps a key to a row holding another vector.
+        """
+        for _ in range(min(count, len(self._slots))):
+            _, slot = self._slots.popitem(last=False)
+            self._free_slots.append(slot)
+            self.stats['evictions'] += 1
+        self._dirty += 1
+        self.flush()
+
+    def _lookup(self, texts: list[str], kind: str) -> tuple[list, list[int]]:
+        """
+        Return the cached vectors for the texts (None for misses) and the positions of the misses.
+        """
+        vectors, missing = [], []
+        with self._lock:
+            for position, text in enumerate(texts):
+                key = self._key(text, kind)
+                slot = self._slots.get(key)
+                if slot is None:
+                    vectors.append(None)
+                    missing.append(position)
+                else:
+                    self._slots.move_to_end(key)
+                    vectors.append(self._matrix[slot].tolist())
+            self.stats['hits'] += len(texts) - len(missing)
+            self.stats['misses'] += len(missing)
+        return vectors, missing
+
+    def _store(self, texts: list[str], vectors: list[list[float]], kind: str) -> None:
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = self._key(text, kind)
+                if key in self._slots:
+                    continue
+                if self._dim is None:
+                    self._dim = len(vector)
+                elif len(vector) != self._dim:
+                    raise ValueError(f'Embedding of dimension {len(vector)} does not fit the cache of model '
+                                     f'{self.model_name!r} with dimension {self._dim}.')
+                slot = self._allocate_slot()
+                self._matrix[slot] = np.asarray(vector, dtype=np.float32)
+                self._slots[key] = slot
+                self._dirty += 1
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embed documents, computing only the texts that are not cached.
+
+        Args:
+            texts (list[str]): The texts to embed.
+
+        Returns:
+            list[list[float]]: One embedding per text.
+        """
+        vectors, missing = self._lookup(texts, 'document')
+        if missing:
+            # Embed each distinct missing text once
+            missing_texts = list(dict.fromkeys(texts[position] for position in missing))
+            computed = dict(zip(missing_texts, self.embedding.embed_documents(missing_texts)))
+            for position in missing:
+                vectors[position] = computed[texts[position]]
+            self._store(missing_texts, [computed[text] for text in missing_texts], 'document')
+            self._maybe_flush()
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        """
+        Embed a query, reusing the embedding of an identical earlier query.
+
+        Args:
+            text (str): The query text.
+
+        Returns:
+            list[float]: The query embedding.
+        """
+        vectors, missing = self._lookup([text], 'query')
+        if missing:
+            vectors[0] = self.embedding.embed_query(text)
+            self._store([text], vectors, 'query')
+            self._maybe_flush()
+        return vectors[0]
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embed many queries, computing the missing ones in one call.
+
+        Models with a separate query encoding provide `embed_queries`, other models embed the queries with
+        `embed_documents`. The vectors are cached as query embeddings either way.
+
+        Args:
+            texts (list[str]): The query texts.
+
+        Returns:
+            list[list[float]]: One query embedding per text, cached like those of `embed_query`.
+        """
+        vectors, missing = self._lookup(texts, 'query')
+        if missing:
+            missing_texts = list(dict.fromkeys(texts[position] for position in missing))
+            if hasattr(self.embedding, 'embed_queries'):
+                computed = self.embedding.embed_queries(missing_texts)
+            else:
+                computed = self.embedding.embed_documents(missing_texts)
+            computed = dict(zip(missing_texts, computed))
+            for position in missing:
+                vectors[position] = computed[texts[position]]
+            self._store(missing_texts, [computed[text] for text in missing_texts], 'query')
+            self._maybe_flush()
+        return vectors
+
+    def _maybe_flush(self) -> None:
+        # Growing the threshold with the index keeps the total size of all index writes linear
+        if self._dirty >= max(self.FLUSH_EVERY, len(self._slots) // 4):
+            self.flush()
+
+    def hit_rate(self) -> float:
+        """
+        Returns:
+            float: The fraction of lookups served from the cache.
+        """
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def flush(self) -> None:
+        """
+        Write the matrix and the index to disk.
+        """
+        with self._lock:
+            if not self._dirty or self._matrix is None:
+                return
+            self._matrix.flush()
+            index = {
+                'model_name': self.model_name,
+                'dim': self._dim,
+                'capacity': self._capacity,
+                'slots': list(self._slots.items()),
+                'free_slots': self._free_slots,
+            }
+            index_path = os.path.join(self.directory, self.INDEX_FILE)
+            with open(index_path + '.tmp', 'w', encoding='utf-8') as file:
+                json.dump(index, file)
+            os.replace(index_path + '.tmp', index_path)
+            self._dirty = 0
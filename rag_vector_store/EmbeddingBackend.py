@@ -0,0 +1,134 @@
+import threading
+
+from langchain_core.embeddings import Embeddings
+
+
+class EmbeddingBackend(Embeddings):
+    """
+    A sentence-transformers embedding model tuned for CPU inference.
+
+    Texts are embedded in batches of `batch_size`; sentence-transformers orders the texts of every call by length
+    before batching them, so batches hold texts of similar length. The model runs in one of three runtimes:
+
+    - 'torch': the full-precision PyTorch model, the same vectors as `HuggingFaceEmbeddings`.
+    - 'quantized': the PyTorch model with dynamically int8-quantized linear layers, which roughly halves the CPU
+      time of a forward pass at a small loss of precision.
+    - 'onnx': the ONNX export of the model run by ONNX Runtime on the CPU, `onnx_file_name` selects e.g. one of
+      the quantized exports published with the model. Needs `optimum[onnxruntime]`, see requirements.txt.
+
+    Vectors of the quantized runtimes differ slightly from the full-precision ones, a collection should be
+    embedded and queried with the same runtime. `model_name` therefore names the runtime, so that cached
+    embeddings of different runtimes are not mixed. The model is loaded on first use, wrap the backend in
+    LazyEmbeddings to load it in a background warm-up instead.
+
+    Attributes:
+        model_id (str): Name of the sentence-transformers model.
+        model_name (str): `model_id` followed by the runtime for runtimes other than 'torch'.
+        runtime (str): 'torch', 'quantized' or 'onnx'.
+        batch_size (int): Number of texts per forward pass.
+        num_threads (int or None): Number of CPU threads of a forward pass, None keeps the runtime's default.
+        normalize (bool): Whether vectors are normalized to unit length.
+        model (SentenceTransformer): The model, loaded on first access.
+    """
+
+    RUNTIMES = ('torch', 'quantized', 'onnx')
+
+    def __init__(self,
+                 model_id: str = 'sentence-transformers/all-mpnet-base-v2',
+                 runtime: str = 'torch',
+                 batch_size: int = 32,
+                 num_threads: int = None,
+                 normalize: bool = False,
+                 onnx_file_name: str = None
+                 ):
+        """
+        Configure the backend without loading the model.
+
+        Args:
+            model_id (str, optional): Name of the sentence-transformers model.
+                                      Defaults to 'sentence-transformers/all-mpnet-base-v2'.
+            runtime (str, optional): 'torch', 'quantized' or 'onnx'. Defaults to 'torch'.
+            batch_size (int, optional): Number of texts per forward pass. Defaults to 32.
+            num_threads (int, optional): Number of CPU threads. PyTorch applies it to the whole process.
+                                         Defaults to None.
+            normalize (bool, optional): Normalize vectors to unit length. Defaults to False.
+            onnx_file_name (str, optional): ONNX file of the model repository, e.g.
+                                            'onnx/model_qint8_avx512_vnni.onnx'. Defaults to the default export.
+        """
+        if runtime not in self.RUNTIMES:
+            raise ValueError(f"Unknown embedding runtime {runtime!r}, use 'torch', 'quantized' or 'onnx'.")
+        self.model_id = model_id
+        self.runtime = runtime
+        self.model_name = self.cache_name(model_id, runtime, onnx_file_name)
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.normalize = normalize
+        self.onnx_file_name = onnx_file_name
+
+        self._model = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cache_name(model_id: str, runtime: str = 'torch', onnx_file_name: str = None) -> str:
+        """
+        Returns:
+            str: The name identifying the vectors of the model in the given runtime, e.g. the embedding cache key.
+        """
+        if runtime == 'torch':
+            return model_id
+        return f'{model_id}@{runtime}' + (f':{onnx_file_name}' if onnx_file_name else '')
+
+    @property
+    def model(self):
+        """
+        Returns:
+            SentenceTransformer: The model, loading it if necessary.
+        """
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self.load_model()
+        return self._model
+
+    def load_model(self):
+        """
+        Load the model in the configured runtime, importing sentence-transformers and the runtime only now.
+
+        Returns:
+            SentenceTransformer: The model on the CPU.
+        """
+        from sentence_transformers import SentenceTransformer
+
+        if self.runtime == 'onnx':
+            model_kwargs = {'provider': 'CPUExecutionProvider'}
+            if self.onnx_file_name is not None:
+                model_kwargs['file_name'] = self.onnx_file_name
+            if self.num_threads is not None:
+                import onnxruntime
+                session_options = onnxruntime.SessionOptions()
+                session_options.intra_op_num_threads = self.num_threads
+                model_kwargs['session_options'] = session_options
+            return SentenceTransformer(self.model_id, device='cpu', backend='onnx', model_kwargs=model_kwargs)
+
+        import torch
+        if self.num_threads is not None:
+            torch.set_num_threads(self.num_threads)
+        model = SentenceTransformer(self.model_id, device='cpu')
+        if self.runtime == 'quantized':
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        model.eval()
+        return model
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        return self.model.encode(texts, batch_size=self.batch_size, normalize_embeddings=self.normalize,
+                                 convert_to_numpy=True).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.model.encode([text], batch_size=1, normalize_embeddings=self.normalize,
+                                 convert_to_numpy=True)[0].tolist()
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        # The model embeds queries and documents alike
+        return self.embed_documents(texts)
@@ -0,0 +1,79 @@
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore as LangChainVectorStore
+
+from rag_instrumentation.Instrumentation import instrumentation
+from rag_vector_store.BM25Index import BM25Index
+from rag_vector_store.VectorStore import VectorStore
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    A retriever combining the BM25 index and the dense vector store.
+
+    In 'hybrid' mode the `fetch_k` best chunks of both rankings are fused with reciprocal rank fusion, so chunks
+    matching exact names and keywords are found even when their embeddings are not close to the query. The
+    'lexical' mode is a fast path that only searches the BM25 index and never calls the embedding model, and
+    'dense' only searches the vector store.
+
+    Attributes:
+        vector_store (VectorStore): The dense LangChain vector store, e.g. Chroma.
+        lexical_index (BM25Index): The BM25 index over the same chunks.
+        k (int): Number of returned chunks.
+        fetch_k (int): Minimum number of candidates taken from each ranking before fusion, at least `k` are taken.
+        rrf_k (int): Rank offset of reciprocal rank fusion, larger values flatten the rank weights.
+        mode (str): 'hybrid', 'lexical' or 'dense'.
+    """
+
+    vector_store: LangChainVectorStore = None
+    lexical_index: BM25Index = None
+    k: int = 3
+    fetch_k: int = 20
+    rrf_k: int = 60
+    mode: str = 'hybrid'
+
+    model_config = {'arbitrary_types_allowed': True}
+
+    def fetch_count(self, k: int) -> int:
+        """
+        Returns:
+            int: Number of candidates to take from each ranking to fuse the best `k` chunks.
+        """
+        return max(self.fetch_k, k)
+
+    def lexical_search(self, query: str, k: int) -> list[Document]:
+        with instrumentation.span('lexical_search'):
+            return [document for document, _ in self.lexical_index.search(query, k=k)]
+
+    @staticmethod
+    def reciprocal_rank_fusion(rankings: list[list[Document]], k: int, rrf_k: int = 60) -> list[Document]:
+        """
+        Fuse several rankings of chunks, each chunk scoring the sum of 1 / (rrf_k + rank) over the rankings.
+
+        Args:
+            rankings (List[List[Document]]): The rankings, best first.
+            k (int): Number of returned chunks.
+            rrf_k (int, optional): Rank offset. Defaults to 60.
+
+        Returns:
+            List[Document]: The best fused chunks.
+        """
+        scores, documents = {}, {}
+        for ranking in rankings:
+            for rank, document in enumerate(ranking, start=1):
+                doc_id = VectorStore.document_id(document)
+                scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+                documents.setdefault(doc_id, document)
+        best = sorted(scores, key=scores.get, reverse=True)[:k]
+        return [documents[doc_id] for doc_id in best]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        if self.mode == 'lexical':
+            return self.lexical_search(query, self.k)
+        if self.mode == 'dense':
+            return self.vector_store.similarity_search(query, k=self.k)
+        fetch_k = self.fetch_count(self.k)
+        dense = self.vector_store.similarity_search(query, k=fetch_k)
+        lexical = self.lexical_search(query, fetch_k)
+        return self.reciprocal_rank_fusion([dense, lexical], self.k, self.rrf_k)
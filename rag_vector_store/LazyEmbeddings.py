@@ -0,0 +1,96 @@
+import threading
+import time
+
+from collections.abc import Callable
+
+from langchain_core.embeddings import Embeddings
+
+
+class LazyEmbeddings(Embeddings):
+    """
+    An embedding model that is only loaded on first use or by a background warm-up.
+
+    Loading a transformer model takes seconds and pulls in heavy imports, which the query path should not pay
+    before it has to embed anything. The model is created by `factory` exactly once, either by the first call
+    to `embed_documents` or `embed_query` or by `warm_up`, which can run in a background thread while the rest
+    of the application starts. `ready` is set once the model has been loaded and has embedded a first text.
+
+    Attributes:
+        factory (Callable): Creates the embedding model.
+        model_name (str): Name of the model, used e.g. as embedding cache key.
+        ready (threading.Event): Set once the model is loaded and warmed up.
+        load_time (float or None): Seconds it took to load and warm up the model.
+        error (Exception or None): The exception raised by a failed background warm-up.
+    """
+
+    def __init__(self, factory: Callable[[], Embeddings], model_name: str):
+        """
+        Initialize the wrapper without loading the model.
+
+        Args:
+            factory (Callable): Creates the embedding model.
+            model_name (str): Name of the model.
+        """
+        self.factory = factory
+        self.model_name = model_name
+        self.ready = threading.Event()
+        self.load_time = None
+        self.error = None
+
+        self._model = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def model(self) -> Embeddings:
+        """
+        Returns:
+            Embeddings: The loaded model, loading it if necessary.
+        """
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    model = self.factory()
+                    model.embed_query('warm up')
+                    self._model = model
+                    self.load_time = time.perf_counter() - start
+                    self.ready.set()
+        return self._model
+
+    def _warm_up(self) -> None:
+        try:
+            self.model
+        except Exception as exception:
+            # The next embedding call retries and raises in the caller
+            self.error = exception
+
+    def warm_up(self, background: bool = True) -> None:
+        """
+        Load the model now.
+
+        Args:
+            background (bool, optional): Load it in a daemon thread and return immediately. Defaults to True.
+        """
+        if self.ready.is_set():
+            return
+        if not background:
+            self.model
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._warm_up, name='embedding-warm-up', daemon=True)
+                self._thread.start()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.model.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.model.embed_query(text)
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        model = self.model
+        if hasattr(model, 'embed_queries'):
+            return model.embed_queries(texts)
+        # Models without a separate query encoding, like HuggingFaceEmbeddings, embed queries as documents
+        return model.embed_documents(texts)
@@ -0,0 +1,474 @@
+import json
+import os
+import threading
+import uuid
+
+from collections.abc import Callable, Iterable
+
+import numpy as np
+
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore as LangChainVectorStore
+
+
+class NumpyVectorStore(LangChainVectorStore):
+    """
+    A LangChain vector store keeping normalised embeddings in a memory-mapped matrix.
+
+    Searches are exact: the query vectors are multiplied with the matrix block by block and the top k rows are
+    selected with argpartition, so many queries can be answered with one batched matrix product. Vectors are
+    stored as float32 or, with `quantize=True`, as int8 with one float32 scale per row, which takes a quarter
+    of the space at a small loss of precision. Opening the store only maps the matrix, which is much cheaper than
+    starting the Chroma client.
+
+    Texts and metadata are appended to a JSON lines record log and read on demand, e.g. for the k results of a
+    search. A small JSON header holds the IDs of the rows and the offsets of their records in the log. Adding a
+    known ID replaces its row, deleted rows are skipped by searches and removed when the store is flushed.
+    Changes are persisted by `flush`, which writes the header once and not on every add or delete; the log is
+    rewritten only when more than half of its records are outdated.
+
+    Attributes:
+        embedding_function (Embeddings): Embedding model of the documents and queries.
+        persist_directory (str): Directory of the matrix, header and record log files.
+        collection_name (str): Name of the collection, used as file name prefix.
+        quantize (bool): Whether vectors are stored as int8.
+        block_size (int): Number of rows multiplied at once while searching. Int8 rows are multiplied at most
+                          `QUANTIZED_BLOCK_SIZE` at a time, since every block is converted to float32 first.
+    """
+
+    # 4096 int8 rows of 768 dimensions convert to a 12 MB float32 block instead of 200 MB for 65536 rows
+    QUANTIZED_BLOCK_SIZE = 4096
+
+    def __init__(self,
+                 embedding_function: Embeddings,
+                 persist_directory: str = './NumpyVectorStore',
+                 collection_name: str = 'documents',
+                 quantize: bool = False,
+                 block_size: int = 65_536
+                 ):
+        """
+        Open the store, creating an empty one if it does not exist yet.
+
+        Args:
+            embedding_function (Embeddings): Embedding model of the documents and queries.
+            persist_directory (str, optional): Directory of the store files. Defaults to './NumpyVectorStore'.
+            collection_name (str, optional): Name of the collection. Defaults to 'documents'.
+            quantize (bool, optional): Store vectors as int8 instead of float32. Only used when the store is
+                                       created, an existing store keeps its format. Defaults to False.
+            block_size (int, optional): Number of rows multiplied at once while searching. Defaults to 65536.
+        """
+        self.embedding_function = embedding_function
+        self.persist_directory = persist_directory
+        self.collection_name = collection_name
+        self.quantize = quantize
+        self.block_size = block_size
+
+        self._lock = threading.RLock()
+        self._ids, self._offsets = [], []
+        self._rows = {}
+        self._deleted = set()
+        self._outdated_records = 0
+        self._log_generation = 0
+        self._dim = None
+        self._capacity = 0
+        self._matrix = None
+        self._scales = None
+        self._log = None
+
+        os.makedirs(self.persist_directory, exist_ok=True)
+        if os.path.exists(self.metadata_path):
+            with open(self.metadata_path, encoding='utf-8') as file:
+                header = json.load(file)
+            self.quantize = header['quantize']
+            self._dim = header['dim']
+            self._capacity = header['capacity']
+            self._ids = header['ids']
+            self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+            if 'offsets' in header:
+                # Records appended after the last flush, e.g. by an interrupted ingest, are never referenced
+                self._offsets = header['offsets']
+                self._outdated_records = header['outdated_records']
+                self._log_generation = header['log_generation']
+            else:
+                # Sidecar of an older version holding all texts and metadata, move them to the record log
+                self._offsets = self._append_records(header['texts'], header['metadatas'])
+                self.flush()
+            if self._dim is not None:
+                self._open_matrix()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding_function
+
+    @property
+    def metadata_path(self) -> str:
+        return os.path.join(self.persist_directory, f'{self.collection_name}.json')
+
+    @property
+    def log_path(self) -> str:
+        return os.path.join(self.persist_directory, f'{self.collection_name}.{self._log_generation}.jsonl')
+
+    def _file(self, kind: str) -> str:
+        return os.path.join(self.persist_directory, f'{self.collection_name}.{kind}')
+
+    def _open_matrix(self) -> None:
+        dtype = np.int8 if self.quantize else np.float32
+        self._matrix = np.memmap(self._file('i8' if self.quantize else 'f32'),
+                                 dtype=dtype, mode='r+', shape=(self._capacity, self._dim))
+        if self.quantize:
+            self._scales = np.memmap(self._file('scales'), dtype=np.float32, mode='r+', shape=(self._capacity,))
+
+    def _grow(self, needed: int) -> None:
+        """
+        Grow the matrix files so that `needed` rows fit, doubling their size.
+        """
+        if needed <= self._capacity:
+            return
+        capacity = max(needed, 2 * self._capacity, 1024)
+        if self._matrix is not None:
+            self._flush_matrix()
+            self._matrix = self._scales = None
+        files = [(self._file('i8'), np.int8, self._dim), (self._file('scales'), np.float32, 1)] if self.quantize \
+            else [(self._file('f32'), np.float32, self._dim)]
+        for path, dtype, width in files:
+            with open(path, 'ab') as file:
+                file.truncate(capacity * width * np.dtype(dtype).itemsize)
+        self._capacity = capacity
+        self._open_matrix()
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def _write_rows(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        if self.quantize:
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1
+            self._matrix[rows] = np.round(vectors / scales[:, None]).astype(np.int8)
+            self._scales[rows] = scales
+        else:
+            self._matrix[rows] = vectors
+
+    def _log_file(self):
+        if self._log is None:
+            self._log = open(self.log_path, 'a+b')
+        return self._log
+
+    def _append_records(self, texts: list[str], metadatas: list[dict]) -> list[int]:
+        """
+        Append records to the log.
+
+        Returns:
+            list[int]: Offsets of the records in the log.
+        """
+        log = self._log_file()
+        log.seek(0, os.SEEK_END)
+        offsets = []
+        for text, metadata in zip(texts, metadatas):
+            offsets.append(log.tell())
+            log.write(json.dumps([text, metadata]).encode('utf-8') + b'\n')
+        log.flush()
+        return offsets
+
+    def _records(self, rows) -> list[tuple[str, dict]]:
+        """
+        Returns:
+            list[tuple[str, dict]]: Text and metadata of the rows, read from the log.
+        """
+        log = self._log_file()
+        records = []
+        for row in rows:
+            log.seek(self._offsets[row])
+            text, metadata = json.loads(log.readline())
+            records.append((text, metadata))
+        return records
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add_texts(self,
+                  texts: Iterable[str],
+                  metadatas: list[dict] = None,
+                  ids: list[str] = None,
+                  **kwargs) -> list[str]:
+        """
+        Embed texts and add them to the store, replacing rows with the same ID.
+
+        Args:
+            texts (Iterable[str]): The texts to add.
+            metadatas (list[dict], optional): Metadata of the texts. Defaults to None.
+            ids (list[str], optional): IDs of the texts. Defaults to random IDs.
+
+        Returns:
+            list[str]: The IDs of the added texts.
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [uuid.uuid4().hex for _ in texts]
+        vectors = self._normalize(self.embedding_function.embed_documents(texts))
+
+        with self._lock:
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+            rows = []
+            for doc_id, offset in zip(ids, self._append_records(texts, metadatas)):
+                row = self._rows.get(doc_id)
+                if row is None:
+                    row = len(self._ids)
+                    self._ids.append(doc_id)
+                    self._offsets.append(offset)
+                    self._rows[doc_id] = row
+                else:
+                    self._offsets[row] = offset
+                    self._outdated_records += 1
+                rows.append(row)
+            self._grow(len(self._ids))
+            self._write_rows(np.asarray(rows), vectors)
+        return ids
+
+    def delete(self, ids: list[str] = None, **kwargs) -> bool:
+        """
+        Delete rows by ID, unknown IDs are ignored.
+
+        Args:
+            ids (list[str]): The IDs to delete.
+
+        Returns:
+            bool: True.
+        """
+        with self._lock:
+            for doc_id in ids or []:
+                row = self._rows.pop(doc_id, None)
+                if row is not None:
+                    # Searches skip the row until `flush` removes it
+                    self._deleted.add(row)
+                    self._outdated_records += 1
+        return True
+
+    def get(self, ids: list[str] = None, include: list[str] = None) -> dict:
+        """
+        Return stored IDs, texts and metadata in the format of `Chroma.get`.
+
+        Args:
+            ids (list[str], optional): IDs to return. Defaults to all.
+            include (list[str], optional): Any of 'documents' and 'metadatas'. Defaults to both.
+
+        Returns:
+            dict: 'ids', 'documents' and 'metadatas' (None if not included).
+        """
+        include = include if include is not None else ['documents', 'metadatas']
+        with self._lock:
+            rows = sorted(self._rows.values()) if ids is None else [self._rows[i] for i in ids if i in self._rows]
+            records = self._records(rows) if 'documents' in include or 'metadatas' in include else None
+            return {
+                'ids': [self._ids[row] for row in rows],
+                'documents': [text for text, _ in records] if 'documents' in include else None,
+                'metadatas': [metadata for _, metadata in records] if 'metadatas' in include else None,
+            }
+
+    def search_vectors(self, queries, k: int = 4) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Exact top-k search for a batch of query vectors.
+
+        Args:
+            queries: Query vectors, one per row.
+            k (int, optional): Number of results per query. Defaults to 4.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Rows and cosine similarities of the best matches per query, best first.
+        """
+        queries = self._normalize(queries)
+        with self._lock:
+            count = len(self._ids)
+            k = min(k, len(self._rows))
+            if k == 0:
+                return np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+            deleted = np.fromiter(self._deleted, dtype=np.int64, count=len(self._deleted))
+
+            block_size = min(self.block_size, self.QUANTIZED_BLOCK_SIZE) if self.quantize else self.block_size
+            best_rows, best_scores = None, None
+            for start in range(0, count, block_size):
+                end = min(start + block_size, count)
+                block = self._matrix[start:end]
+                if self.quantize:
+                    scores = (queries @ block.T.astype(np.float32)) * self._scales[start:end]
+                else:
+                    scores = queries @ block.T
+                if len(deleted):
+                    block_deleted = deleted[(deleted >= start) & (deleted < end)] - start
+                    if len(block_deleted):
+                        scores[:, block_deleted] = -np.inf
+                rows = np.broadcast_to(np.arange(start, end), scores.shape)
+                if best_scores is not None:
+                    scores = np.hstack([best_scores, scores])
+                    rows = np.hstack([best_rows, rows])
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if scores.shape[1] > k \
+                    else np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+                best_scores = np.take_along_axis(scores, top, axis=1)
+                best_rows = np.take_along_axis(rows, top, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def _documents(self, rows: np.ndarray, scores: np.ndarray) -> list[tuple[Document, float]]:
+        with self._lock:
+            records = self._records(rows)
+            return [(Document(id=self._ids[row], page_content=text, metadata=metadata), float(score))
+                    for row, (text, metadata), score in zip(rows, records, scores)]
+
+    def similarity_search_by_vector_with_score(self, embedding: list[float], k: int = 4) -> list[tuple[Document, float]]:
+        rows, scores = self.search_vectors([embedding], k)
+        return self._documents(rows[0], scores[0])
+
+    def similarity_search_by_vector(self, embedding: list[float], k: int = 4, **kwargs) -> list[Document]:
+        return [document for document, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs) -> list[tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self.embedding_function.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> list[Document]:
+        return [document for document, _ in self.similarity_search_with_score(query, k)]
+
+    def batch_similarity_search(self, queries: list[str], k: int = 4) -> list[list[Document]]:
+        """
+        Search many queries with one batched embedding call and one batched matrix product.
+
+        Args:
+            queries (list[str]): The queries.
+            k (int, optional): Number of results per query. Defaults to 4.
+
+        Returns:
+            list[list[Document]]: The best documents per query.
+        """
+        if not queries:
+            return []
+        if hasattr(self.embedding_function, 'embed_queries'):
+            vectors = self.embedding_function.embed_queries(queries)
+        else:
+            vectors = self.embedding_function.embed_documents(queries)
+        return self.batch_similarity_search_by_vector(vectors, k)
+
+    def batch_similarity_search_by_vector(self, embeddings: list[list[float]], k: int = 4) -> list[list[Document]]:
+        """
+        Search many query vectors with one batched matrix product.
+
+        Args:
+            embeddings (list[list[float]]): The query vectors.
+            k (int, optional): Number of results per query. Defaults to 4.
+
+        Returns:
+            list[list[Document]]: The best documents per query.
+        """
+        if not len(embeddings):
+            return []
+        rows, scores = self.search_vectors(embeddings, k)
+        return [[document for document, _ in self._documents(r, s)] for r, s in zip(rows, scores)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Cosine similarity in [-1, 1] to a relevance score in [0, 1], int8 rounding can overshoot slightly
+        return lambda score: min(max((score + 1) / 2, 0.0), 1.0)
+
+    def _flush_matrix(self) -> None:
+        if self._matrix is not None:
+            self._matrix.flush()
+            if self.quantize:
+                self._scales.flush()
+
+    def _compact_rows(self) -> None:
+        """
+        Remove deleted rows, moving the remaining rows up in their order.
+        """
+        live = np.array(sorted(self._rows.values()), dtype=np.int64)
+        # Every row moves to a position before its own, so blocks in ascending order never overwrite a source
+        for start in range(0, len(live), self.block_size):
+            sources = live[start:start + self.block_size]
+            self._matrix[start:start + len(sources)] = self._matrix[sources]
+            if self.quantize:
+                self._scales[start:start + len(sources)] = self._scales[sources]
+        self._ids = [self._ids[row] for row in live]
+        self._offsets = [self._offsets[row] for row in live]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._deleted.clear()
+
+    def _compact_log(self) -> str:
+        """
+        Copy the records of the current rows to a new log, referenced by the header from the next flush on.
+
+        Returns:
+            str: Path of the previous log, to be removed once the header is written.
+        """
+        old_log, old_path = self._log_file(), self.log_path
+        self._log_generation += 1
+        offsets = []
+        with open(self.log_path, 'wb') as file:
+            for offset in self._offsets:
+                old_log.seek(offset)
+                offsets.append(file.tell())
+                file.write(old_log.readline())
+        old_log.close()
+        self._log = None
+        self._offsets = offsets
+        self._outdated_records = 0
+        return old_path
+
+    def flush(self) -> None:
+        """
+        Remove deleted rows and write the matrix, the record log and the header to disk.
+        """
+        with self._lock:
+            if self._deleted:
+                self._compact_rows()
+            old_log = self._compact_log() if self._outdated_records > len(self._ids) else None
+            self._flush_matrix()
+            if self._log is not None:
+                self._log.flush()
+                os.fsync(self._log.fileno())
+            header = {
+                'quantize': self.quantize,
+                'dim': self._dim,
+                'capacity': self._capacity,
+                'ids': self._ids,
+                'offsets': self._offsets,
+                'outdated_records': self._outdated_records,
+                'log_generation': self._log_generation,
+            }
+            with open(self.metadata_path + '.tmp', 'w', encoding='utf-8') as file:
+                json.dump(header, file)
+            os.replace(self.metadata_path + '.tmp', self.metadata_path)
+            if old_log is not None:
+                os.remove(old_log)
+
+    @classmethod
+    def from_texts(cls,
+                   texts: list[str],
+                   embedding: Embeddings,
+                   metadatas: list[dict] = None,
+                   ids: list[str] = None,
+                   persist_directory: str = './NumpyVectorStore',
+                   collection_name: str = 'documents',
+                   quantize: bool = False,
+                   **kwargs) -> 'NumpyVectorStore':
+        """
+        Create a store from texts.
+
+        Args:
+            texts (list[str]): The texts to add.
+            embedding (Embeddings): Embedding model of the documents and queries.
+            metadatas (list[dict], optional): Metadata of the texts. Defaults to None.
+            ids (list[str], optional): IDs of the texts. Defaults to random IDs.
+            persist_directory (str, optional): Directory of the store files. Defaults to './NumpyVectorStore'.
+            collection_name (str, optional): Name of the collection. Defaults to 'documents'.
+            quantize (bool, optional): Store vectors as int8 instead of float32. Defaults to False.
+
+        Returns:
+            NumpyVectorStore: The new store.
+        """
+        store = cls(embedding, persist_directory=persist_directory, collection_name=collection_name, quantize=quantize)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        store.flush()
+        return store
@@ -0,0 +1,29 @@
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from rag_vector_store.ShardedVectorStore import ShardedVectorStore
+
+
+class ShardedRetriever(BaseRetriever):
+    """
+    A retriever searching the selected shards of a ShardedVectorStore in parallel.
+
+    The query is embedded once and the top-k chunks of every shard are merged by relevance score, so the result
+    is the same as searching one collection holding all selected sites.
+
+    Attributes:
+        sharded_store (ShardedVectorStore): The shards to search.
+        k (int): Number of returned chunks.
+        shards (list[str] or None): Names of the searched shards, e.g. the sites of one tenant. None searches all
+                                    open shards.
+    """
+
+    sharded_store: ShardedVectorStore = None
+    k: int = 3
+    shards: list[str] | None = None
+
+    model_config = {'arbitrary_types_allowed': True}
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        return [document for document, _ in self.sharded_store.similarity_search_with_score(query, self.k, self.shards)]
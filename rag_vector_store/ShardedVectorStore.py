@@ -0,0 +1,326 @@
+import contextvars
+import os
+import re
+import shutil
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+
+from rag_instrumentation.Instrumentation import InstrumentedEmbeddings, instrumentation
+from rag_vector_store.CachedEmbeddings import CachedEmbeddings
+from rag_vector_store.EmbeddingBackend import EmbeddingBackend
+from rag_vector_store.LazyEmbeddings import LazyEmbeddings
+from rag_vector_store.VectorStore import VectorStore
+
+
+class ShardedVectorStore:
+    """
+    A set of independently built and loaded vector stores, one shard per crawled site or tenant.
+
+    Every shard is a VectorStore in its own subdirectory of `root_directory`, so a site can be re-crawled and
+    rebuilt without touching the others and every search only scans the collections it needs. All shards share
+    one embedding model and one embedding cache. A search embeds the query once, sends it to the selected
+    shards in parallel and merges their top-k results by relevance score, which is comparable across shards
+    because they use the same model and backend. Call `close` or use the store as context manager to stop the
+    search threads.
+
+    Attributes:
+        root_directory (str): Directory containing one subdirectory per shard.
+        embedding (Embeddings): The embedding model shared by all shards.
+        backend (str): 'chroma' or 'numpy', the backend of all shards.
+        quantize_vectors (bool): Whether the numpy backend stores int8 vectors.
+        use_lexical_index (bool): Whether every shard maintains a BM25 index.
+        max_workers (int): Number of shards searched in parallel.
+        shards (dict): The opened shards by name.
+        last_timings (dict): Seconds spent searching each shard during the last search.
+        lexical_index (None): Sharded stores only support dense retrieval across shards.
+    """
+
+    lexical_index = None
+    CHROMA_DATABASE = 'chroma.sqlite3'
+    DROPPED_MARKER = '.dropped'
+
+    def __init__(self,
+                 root_directory: str = './VectorShards',
+                 embedding: Embeddings = None,
+                 embedding_cache_dir: str = './EmbeddingCache',
+                 backend: str = 'chroma',
+                 quantize_vectors: bool = False,
+                 use_lexical_index: bool = True,
+                 max_workers: int = 8,
+                 embedding_runtime: str = None,
+                 embedding_batch_size: int = 32,
+                 embedding_threads: int = None
+                 ):
+        """
+        Initialize the sharded store without opening any shard.
+
+        Args:
+            root_directory (str, optional): Directory of the shards. Defaults to './VectorShards'.
+            embedding (Embeddings, optional): Embedding model used instead of the default HuggingFace model.
+                                              Defaults to None.
+            embedding_cache_dir (str, optional): Directory of the shared embedding cache, None disables the cache.
+                                                 Defaults to './EmbeddingCache'.
+            backend (str, optional): 'chroma' or 'numpy'. Defaults to 'chroma'.
+            quantize_vectors (bool, optional): Store int8 vectors in the numpy backend. Defaults to False.
+            use_lexical_index (bool, optional): Maintain a BM25 index per shard. Defaults to True.
+            max_workers (int, optional): Number of shards searched in parallel. Defaults to 8.
+            embedding_runtime (str, optional): Runtime of the default model, see VectorStore. Defaults to None.
+            embedding_batch_size (int, optional): Texts per forward pass of the default model. Defaults to 32.
+            embedding_threads (int, optional): CPU threads of the default model. Defaults to None.
+        """
+        if embedding_runtime is not None and embedding_runtime not in EmbeddingBackend.RUNTIMES:
+            raise ValueError(f"Unknown embedding runtime {embedding_runtime!r}, use 'torch', 'quantized' or 'onnx'.")
+        model_name = "sentence-transformers/all-mpnet-base-v2"
+        if embedding is not None:
+            model_name = getattr(embedding, 'model_name', type(embedding).__name__)
+        else:
+            options = {'runtime': embedding_runtime, 'batch_size': embedding_batch_size,
+                       'num_threads': embedding_threads}
+            embedding = LazyEmbeddings(lambda: VectorStore.load_embedding_model(model_name, **options),
+                                       EmbeddingBackend.cache_name(model_name, embedding_runtime or 'torch'))
+            model_name = embedding.model_name
+        self._lazy_embedding = embedding if isinstance(embedding, LazyEmbeddings) else None
+        if embedding_cache_dir is not None:
+            embedding = CachedEmbeddings(embedding, model_name, cache_dir=embedding_cache_dir)
+        # The shards wrap the shared model in their own InstrumentedEmbeddings, queries are embedded here
+        self._shard_embedding = embedding
+        self.embedding = InstrumentedEmbeddings(embedding)
+
+        self.root_directory = root_directory
+        self.backend = backend
+        self.quantize_vectors = quantize_vectors
+        self.use_lexical_index = use_lexical_index
+        self.max_workers = max_workers
+        self.shards = {}
+        self.last_timings = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='shard-search')
+
+    @staticmethod
+    def shard_name(url: str) -> str:
+        """
+        Derive a shard name from the URL of a site.
+
+        Args:
+            url (str): A URL of the site.
+
+        Returns:
+            str: The host without 'www.', with characters other than letters, digits, '.', '-' and '_' replaced.
+        """
+        netloc = urlparse(url).netloc.lower().removeprefix('www.')
+        return re.sub(r'[^a-z0-9._-]', '_', netloc)
+
+    def shard_directory(self, name: str) -> str:
+        return os.path.join(self.root_directory, name)
+
+    def shard_names(self) -> list[str]:
+        """
+        Returns:
+            list[str]: Names of all shards on disk, sorted.
+        """
+        if not os.path.isdir(self.root_directory):
+            return []
+        return sorted(name for name in os.listdir(self.root_directory) if self.shard_exists(name))
+
+    def shard_exists(self, name: str) -> bool:
+        directory = self.shard_directory(name)
+        return os.path.isdir(directory) and not os.path.exists(os.path.join(directory, self.DROPPED_MARKER))
+
+    def _vector_store(self, name: str, documents: list[Document] = None) -> VectorStore:
+        return VectorStore(documents,
+                           persist_directory=self.shard_directory(name),
+                           embedding_cache_dir=None,
+                           embedding=self._shard_embedding,
+                           use_lexical_index=self.use_lexical_index,
+                           backend=self.backend,
+                           quantize_vectors=self.quantize_vectors)
+
+    def build_shard(self, name: str, documents: list[Document], gone_urls: set[str] = None) -> dict:
+        """
+        Create a shard or incrementally update it with the documents of its site, and open it.
+
+        Args:
+            name (str): Name of the shard, see `shard_name`.
+            documents (list[Document]): All document chunks of the shard.
+            gone_urls (set[str], optional): URLs of pages confirmed removed from the site. Defaults to None.
+
+        Returns:
+            dict: The report of `VectorStore.update_vector_store`.
+        """
+        shard = self._vector_store(name, documents)
+        with instrumentation.span('build_shard', shard=name):
+            report = shard.update_vector_store(gone_urls=gone_urls)
+        marker = os.path.join(self.shard_directory(name), self.DROPPED_MARKER)
+        if os.path.exists(marker):
+            os.remove(marker)
+        self.shards[name] = shard
+        return report
+
+    def load(self, names: list[str] = None) -> None:
+        """
+        Open shards from disk.
+
+        Args:
+            names (list[str], optional): The shards to open. Defaults to all shards on disk.
+        """
+        for name in names if names is not None else self.shard_names():
+            if name in self.shards:
+                continue
+            if not self.shard_exists(name):
+                raise ValueError(f'Shard {name!r} does not exist in {self.root_directory}.')
+            shard = self._vector_store(name)
+            shard.open_vector_store()
+            self.shards[name] = shard
+        print(f'--- {len(self.shards)} shards loaded from {self.root_directory}. ---')
+
+    def drop_shard(self, name: str) -> None:
+        """
+        Close a shard and delete its data from disk.
+
+        A numpy shard is deleted with its directory. Chroma keeps one client per directory open for the whole
+        process, so the collection of a chroma shard is deleted through that client and the emptied Chroma
+        database stays in the directory, marked as dropped, for a shard rebuilt under the same name.
+
+        Args:
+            name (str): Name of the shard.
+        """
+        shard = self.shards.pop(name, None)
+        directory = self.shard_directory(name)
+        if not self.shard_exists(name):
+            return
+        if self.backend != 'chroma':
+            shutil.rmtree(directory)
+            return
+        if shard is None:
+            shard = self._vector_store(name)
+            shard.open_vector_store()
+        shard.vector_store.delete_collection()
+        for entry in os.listdir(directory):
+            path = os.path.join(directory, entry)
+            if entry == self.CHROMA_DATABASE:
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        open(os.path.join(directory, self.DROPPED_MARKER), 'w').close()
+
+    def close(self) -> None:
+        """
+        Stop the search threads. The store cannot be searched afterwards.
+        """
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def warm_up(self, background: bool = True) -> None:
+        """
+        Load the shared embedding model before the first query needs it.
+
+        Args:
+            background (bool, optional): Load it in a background thread and return immediately. Defaults to True.
+        """
+        if self._lazy_embedding is not None:
+            self._lazy_embedding.warm_up(background=background)
+
+    def is_ready(self) -> bool:
+        """
+        Returns:
+            bool: Whether shards are open and the embedding model is loaded.
+        """
+        return bool(self.shards) and (self._lazy_embedding is None or self._lazy_embedding.ready.is_set())
+
+    def document_count(self) -> int:
+        return sum(shard.document_count() for shard in self.shards.values())
+
+    def collection_version(self) -> tuple:
+        """
+        Returns:
+            tuple: A token that changes whenever one of the open shards changes, used to invalidate caches.
+        """
+        return tuple((name, shard.collection_version()) for name, shard in sorted(self.shards.items()))
+
+    def _search_shard(self, name: str, vectors: list[list[float]], k: int) -> tuple[list, float]:
+        start = time.perf_counter()
+        with instrumentation.span('shard_search', shard=name):
+            results = self.shards[name].batch_search_by_vector(vectors, k)
+        # New metadata dicts, the numpy backend shares its stored ones with the returned documents
+        results = [[(Document(id=document.id, page_content=document.page_content,
+                              metadata={**document.metadata, 'shard': name}), score) for document, score in ranking]
+                   for ranking in results]
+        return results, time.perf_counter() - start
+
+    def batch_search_by_vector(self,
+                               vectors: list[list[float]],
+                               k: int = 4,
+                               shards: list[str] = None
+                               ) -> list[list[tuple[Document, float]]]:
+        """
+        Search the selected shards in parallel and merge their results by relevance score.
+
+        The time spent in every shard is kept in `last_timings` and recorded as 'shard_search' span.
+
+        Args:
+            vectors (list[list[float]]): The query vectors.
+            k (int, optional): Number of results per query. Defaults to 4.
+            shards (list[str], optional): Names of the shards to search. Defaults to all open shards.
+
+        Returns:
+            list[list[tuple[Document, float]]]: The best documents of all shards per query with their relevance
+                                                score, best first. The shard is in the 'shard' metadata.
+        """
+        names = list(self.shards) if shards is None else shards
+        missing = [name for name in names if name not in self.shards]
+        if missing:
+            raise ValueError(f'Shards {missing} are not loaded.')
+
+        # Copy the context, so that the shard spans are collected for the calling request
+        futures = {name: self._executor.submit(contextvars.copy_context().run, self._search_shard, name, vectors, k)
+                   for name in names}
+        merged = [[] for _ in vectors]
+        timings = {}
+        for name, future in futures.items():
+            results, timings[name] = future.result()
+            for position, ranking in enumerate(results):
+                merged[position].extend(ranking)
+        self.last_timings = timings
+        return [sorted(ranking, key=lambda result: result[1], reverse=True)[:k] for ranking in merged]
+
+    def batch_similarity_search(self, queries: list[str], k: int = 4, shards: list[str] = None) -> list[list[Document]]:
+        """
+        Search many queries with one embedding call and one batched search per shard.
+
+        Args:
+            queries (list[str]): The queries.
+            k (int, optional): Number of results per query. Defaults to 4.
+            shards (list[str], optional): Names of the shards to search. Defaults to all open shards.
+
+        Returns:
+            list[list[Document]]: The best documents of all shards per query, best first.
+        """
+        if not queries:
+            return []
+        results = self.batch_search_by_vector(self.embedding.embed_queries(queries), k, shards)
+        return [[document for document, _ in ranking] for ranking in results]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, shards: list[str] = None) -> list[tuple[Document, float]]:
+        """
+        Search one query across the selected shards.
+
+        Args:
+            query (str): The query.
+            k (int, optional): Number of results. Defaults to 4.
+            shards (list[str], optional): Names of the shards to search. Defaults to all open shards.
+
+        Returns:
+            list[tuple[Document, float]]: The best documents of all shards with their relevance score.
+        """
+        return self.batch_search_by_vector([self.embedding.embed_query(query)], k, shards)[0]
@@ -0,0 +1,125 @@
+import json
+import os
+
+from rag_data_loading.RagWebCrawler import RagWebCrawler
+from rag_data_loading.DocumentPreprocessor import DocumentPreprocessor
+from rag_vector_store.VectorStore import VectorStore
+
+
+class StreamingIngest:
+    """
+    A bounded-memory ingest pipeline from crawled pages to the vector store.
+
+    Pages are loaded, partitioned, cleaned, chunked, embedded and added to the collection batch by batch,
+    so memory use is bounded by the batch size instead of the size of the site. Every `checkpoint_every`
+    batches the vector store is flushed and the ingested page URLs and the deduplication state are appended to
+    a checkpoint log, so the log only names chunks that are on disk; an interrupted ingest resumes after the last
+    checkpoint. The checkpoint is removed once the ingest completes.
+
+    Attributes:
+        crawler (RagWebCrawler): Crawler whose links have already been discovered.
+        vector_store (VectorStore): Vector store the documents are added to.
+        batch_size (int): Number of pages processed per batch.
+        max_workers (int): Number of worker processes for partitioning and chunking, 1 runs in process.
+        checkpoint_path (str): Path of the checkpoint log.
+        checkpoint_every (int): Number of batches between two flushes of the vector store and the checkpoint.
+    """
+
+    def __init__(self,
+                 crawler: RagWebCrawler,
+                 vector_store: VectorStore,
+                 batch_size: int = 16,
+                 max_workers: int = 1,
+                 checkpoint_path: str = './ingest_checkpoint.jsonl',
+                 checkpoint_every: int = 8
+                 ):
+        """
+        Initialize the streaming ingest.
+
+        Args:
+            crawler (RagWebCrawler): Crawler whose links have already been discovered with `get_links`.
+            vector_store (VectorStore): Vector store the documents are added to.
+            batch_size (int, optional): Number of pages processed per batch. Defaults to 16.
+            max_workers (int, optional): Number of worker processes, 1 runs in process. Defaults to 1.
+            checkpoint_path (str, optional): Path of the checkpoint log. Defaults to './ingest_checkpoint.jsonl'.
+            checkpoint_every (int, optional): Number of batches between two checkpoints. Defaults to 8.
+        """
+        self.crawler = crawler
+        self.vector_store = vector_store
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+
+    def load_checkpoint(self) -> tuple[set[str], set[str]]:
+        """
+        Read the checkpoint log of a previous, interrupted ingest.
+
+        A partially written last line, e.g. from a crash while writing, is ignored and cut off, so that the
+        batches of the resumed ingest are appended after the last complete one.
+
+        Returns:
+            tuple[set[str], set[str]]: The URLs of the ingested pages and the digests of the seen texts.
+        """
+        done_urls, unique_texts = set(), set()
+        if not os.path.exists(self.checkpoint_path):
+            return done_urls, unique_texts
+        valid = 0
+        with open(self.checkpoint_path, 'rb') as file:
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                valid += len(line)
+                done_urls.update(entry['urls'])
+                unique_texts.update(entry['texts'])
+        if valid < os.path.getsize(self.checkpoint_path):
+            with open(self.checkpoint_path, 'r+b') as file:
+                file.truncate(valid)
+        return done_urls, unique_texts
+
+    def run(self) -> dict:
+        """
+        Run or resume the ingest.
+
+        Returns:
+            dict: Number of 'pages' and 'chunks' ingested in this run and 'resumed_pages' skipped from a checkpoint.
+        """
+        done_urls, unique_texts = self.load_checkpoint()
+        if done_urls:
+            print(f'--- Resuming ingest, {len(done_urls)} pages already ingested. ---')
+
+        self.vector_store.open_vector_store()
+        report = {'pages': 0, 'chunks': 0, 'resumed_pages': len(done_urls)}
+
+        pages = self.crawler.iter_web_pages(skip=done_urls)
+        batches = DocumentPreprocessor.stream_clean_chunk_transform(pages,
+                                                                   batch_size=self.batch_size,
+                                                                   max_workers=self.max_workers,
+                                                                   unique_texts=unique_texts)
+        with open(self.checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+            pending = []
+            for urls, documents, new_texts in batches:
+                if documents:
+                    report['chunks'] += self.vector_store.add_documents(documents)
+                report['pages'] += len(urls)
+                pending.append({'urls': urls, 'texts': new_texts})
+
+                if len(pending) >= self.checkpoint_every:
+                    # Batches are only checkpointed once their chunks are flushed, the numpy backend and the
+                    # lexical index keep them in memory until then
+                    self.vector_store.flush()
+                    checkpoint.write(''.join(json.dumps(entry) + '\n' for entry in pending))
+                    checkpoint.flush()
+                    os.fsync(checkpoint.fileno())
+                    pending = []
+                print(f'--- Ingested {report["pages"] + report["resumed_pages"]} pages, '
+                      f'{report["chunks"]} chunks in this run. ---')
+
+        self.vector_store.flush()
+        os.remove(self.checkpoint_path)
+        print(f'--- Ingest complete: {report["pages"]} pages, {report["chunks"]} chunks. ---')
+        return report
@@ -1,8 +1,15 @@
+import hashlib
 import os
 
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
 from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+
+from rag_instrumentation.Instrumentation import InstrumentedEmbeddings, instrumentation
+from rag_vector_store.BM25Index import BM25Index
+from rag_vector_store.CachedEmbeddings import CachedEmbeddings
+from rag_vector_store.EmbeddingBackend import EmbeddingBackend
+from rag_vector_store.LazyEmbeddings import LazyEmbeddings
+from rag_vector_store.NumpyVectorStore import NumpyVectorStore
 
 
 class VectorStore:
@@ -10,20 +17,42 @@ class VectorStore:
     A class to manage a vector store for documents.
 
     This class facilitates the creation and loading of a vector store
-    using specified documents and embeddings.
+    using specified documents and embeddings. The documents are kept in a Chroma collection or, with
+    backend='numpy', in a memory-mapped NumpyVectorStore; both offer the same LangChain retriever interface.
 
     Attributes:
-        embedding (HuggingFaceEmbeddings): Embedding model used to convert text into vector representations.
+        embedding (Embeddings): Embedding model used to convert text into vector representations, loaded lazily
+                                on first use or by `warm_up` unless a model is passed in, wrapped in a
+                                persistent CachedEmbeddings cache unless the cache is disabled, and timed by
+                                InstrumentedEmbeddings.
         persist_directory (str): Directory path for persisting the vector store.
         collection_name (str): Name of the collection within the vector store.
         documents (List[Document]): List of documents to be stored in the vector store.
-        vector_store (Chroma or None): Instance of the Chroma vector store. Initialized in `create_vector_store`.
+        backend (str): 'chroma' or 'numpy'.
+        quantize_vectors (bool): Whether the numpy backend stores int8 instead of float32 vectors.
+        vector_store (Chroma, NumpyVectorStore or None): The LangChain vector store. Initialized in
+                                                          `create_vector_store`.
+        version (int): Incremented whenever documents are added to or deleted from the vector store.
+        lexical_index (BM25Index or None): BM25 index over the same chunks, kept next to the Chroma collection.
+                                           Loaded on first access, e.g. by hybrid or lexical retrieval, and
+                                           saved by `flush`. None if disabled or before the vector store is
+                                           created or loaded.
     """
 
+    LEXICAL_INDEX_FILE = 'bm25_index.json'
+
     def __init__(self,
                  documents: list[Document] = None,
                  persist_directory: str = './ChromaDBVectorStore',
                  collection_name: str = 'documents',
+                 embedding_cache_dir: str = './EmbeddingCache',
+                 embedding: Embeddings = None,
+                 use_lexical_index: bool = True,
+                 backend: str = 'chroma',
+                 quantize_vectors: bool = False,
+                 embedding_runtime: str = None,
+                 embedding_batch_size: int = 32,
+                 embedding_threads: int = None,
                  ):
         """
                 Initialize the VectorStore instance.
@@ -34,14 +63,96 @@ class VectorStore:
                                                        Defaults to './ChromaDBVectorStore'.
                     collection_name (str, optional): Name of the collection within the vector store.
                                                      Defaults to 'documents'.
+                    embedding_cache_dir (str, optional): Directory of the persistent embedding cache, None disables
+                                                         the cache. Defaults to './EmbeddingCache'.
+                    embedding (Embeddings, optional): Embedding model used instead of the default HuggingFace model,
+                                                      e.g. a fake embedding for offline tests. Pass a LazyEmbeddings
+                                                      to load it on first use. Defaults to None.
+                    use_lexical_index (bool, optional): Whether a BM25 index is maintained alongside the
+                                                        collection for hybrid and lexical retrieval. Defaults to True.
+                    backend (str, optional): 'chroma' or 'numpy', the memory-mapped backend with exact search that
+                                             starts faster and needs less memory. Defaults to 'chroma'.
+                    quantize_vectors (bool, optional): Store int8 instead of float32 vectors in the numpy backend.
+                                                       Defaults to False.
+                    embedding_runtime (str, optional): Run the default model in an EmbeddingBackend, 'torch',
+                                                       'quantized' (int8 PyTorch) or 'onnx' (ONNX Runtime). Build
+                                                       and query a collection with the same runtime. Defaults to
+                                                       None, the HuggingFace model.
+                    embedding_batch_size (int, optional): Texts per forward pass of the EmbeddingBackend.
+                                                          Defaults to 32.
+                    embedding_threads (int, optional): CPU threads of the EmbeddingBackend, None keeps the default
+                                                       of the runtime. Defaults to None.
                 """
-        self.embedding = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-mpnet-base-v2"
-        )
+        if embedding_runtime is not None and embedding_runtime not in EmbeddingBackend.RUNTIMES:
+            raise ValueError(f"Unknown embedding runtime {embedding_runtime!r}, use 'torch', 'quantized' or 'onnx'.")
+        model_name = "sentence-transformers/all-mpnet-base-v2"
+        if embedding is not None:
+            self.embedding = embedding
+            model_name = getattr(embedding, 'model_name', type(embedding).__name__)
+        else:
+            options = {'runtime': embedding_runtime, 'batch_size': embedding_batch_size,
+                       'num_threads': embedding_threads}
+            # The model is loaded on first use, opening the vector store does not need it
+            self.embedding = LazyEmbeddings(lambda: self.load_embedding_model(model_name, **options),
+                                            EmbeddingBackend.cache_name(model_name, embedding_runtime or 'torch'))
+            model_name = self.embedding.model_name
+        self._lazy_embedding = self.embedding if isinstance(self.embedding, LazyEmbeddings) else None
+        if embedding_cache_dir is not None:
+            self.embedding = CachedEmbeddings(self.embedding, model_name, cache_dir=embedding_cache_dir)
+        self.embedding = InstrumentedEmbeddings(self.embedding)
+        if backend not in ('chroma', 'numpy'):
+            raise ValueError(f"Unknown backend {backend!r}, use 'chroma' or 'numpy'.")
+        self.backend = backend
+        self.quantize_vectors = quantize_vectors
         self.persist_directory = persist_directory
         self.collection_name = collection_name
         self.documents = documents
         self.vector_store = None
+        self.version = 0
+        self.use_lexical_index = use_lexical_index
+        self._lexical_index = None
+        self._lexical_index_dirty = False
+
+    @staticmethod
+    def load_embedding_model(model_name: str,
+                             runtime: str = None,
+                             batch_size: int = 32,
+                             num_threads: int = None) -> Embeddings:
+        """
+                Load an embedding model, importing sentence-transformers only when it is needed.
+
+                Args:
+                    model_name (str): Name of the model.
+                    runtime (str, optional): 'torch', 'quantized' or 'onnx' to run the model in an
+                                             EmbeddingBackend. Defaults to None, the HuggingFace model.
+                    batch_size (int, optional): Texts per forward pass of the EmbeddingBackend. Defaults to 32.
+                    num_threads (int, optional): CPU threads of the EmbeddingBackend. Defaults to None.
+
+                Returns:
+                    Embeddings: The loaded model.
+                """
+        if runtime is not None:
+            return EmbeddingBackend(model_name, runtime=runtime, batch_size=batch_size, num_threads=num_threads)
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=model_name)
+
+    def warm_up(self, background: bool = True) -> None:
+        """
+                Load the embedding model before the first query needs it.
+
+                Args:
+                    background (bool, optional): Load it in a background thread and return immediately.
+                                                 Defaults to True.
+                """
+        if self._lazy_embedding is not None:
+            self._lazy_embedding.warm_up(background=background)
+
+    def is_ready(self) -> bool:
+        """
+                Returns:
+                    bool: Whether the vector store is open and the embedding model is loaded.
+                """
+        return self.vector_store is not None and (self._lazy_embedding is None or self._lazy_embedding.ready.is_set())
 
     def create_vector_store(self):
         """
@@ -52,19 +163,293 @@ class VectorStore:
                 """
         if os.path.exists(self.persist_directory):
             print(f'--- The vector store already exists Load vector store... ---')
-            self.vector_store = Chroma(
-                persist_directory=self.persist_directory,
-                collection_name=self.collection_name,
-                embedding_function=self.embedding
-            )
+            self.open_vector_store()
             print(f'--- Vectore store loaded. ---')
         else:
             print(f'--- Creating vector store. ---')
-            self.vector_store = Chroma.from_documents(documents=self.documents,
-                                  embedding=self.embedding,
-                                  collection_name=self.collection_name,
-                                  persist_directory=self.persist_directory
-                                  )
+            documents, ids = self.assign_ids(self.documents)
+            with instrumentation.span('index'):
+                self.vector_store = self._backend_class().from_documents(documents=documents,
+                                      ids=ids,
+                                      embedding=self.embedding,
+                                      collection_name=self.collection_name,
+                                      persist_directory=self.persist_directory,
+                                      **self._backend_options()
+                                      )
+            instrumentation.count('chunks_indexed', len(ids))
+            if self.use_lexical_index:
+                self._lexical_index = BM25Index()
+                self._lexical_index.add(documents, ids)
+                self._lexical_index_dirty = True
+            self.flush()
             print(f'--- Vector store created and loaded, directory: {self.persist_directory}. ---')
 
+    def open_vector_store(self):
+        """
+                Open the persisted collection, creating an empty one if it does not exist yet.
+                """
+        self.vector_store = self._backend_class()(
+            persist_directory=self.persist_directory,
+            collection_name=self.collection_name,
+            embedding_function=self.embedding,
+            **self._backend_options()
+        )
+        self._lexical_index = None
+        self._lexical_index_dirty = False
+
+    def _backend_class(self) -> type:
+        if self.backend == 'numpy':
+            return NumpyVectorStore
+        # Imported here, so that the numpy backend does not pay for loading the Chroma client
+        from langchain_chroma import Chroma
+        return Chroma
+
+    def _backend_options(self) -> dict:
+        return {'quantize': self.quantize_vectors} if self.backend == 'numpy' else {}
+
+    def document_count(self) -> int:
+        """
+                Returns:
+                    int: Number of chunks in the opened vector store.
+                """
+        if self.backend == 'numpy':
+            return len(self.vector_store)
+        return self.vector_store._collection.count()
+
+    def batch_similarity_search(self, queries: list[str], k: int = 4) -> list[list[Document]]:
+        """
+                Search many queries with one batched query embedding call and one batched search of the backend.
+
+                Args:
+                    queries (List[str]): The queries.
+                    k (int, optional): Number of results per query. Defaults to 4.
+
+                Returns:
+                    List[List[Document]]: The best documents per query, best first.
+                """
+        if not queries:
+            return []
+        results = self.batch_search_by_vector(self.embedding.embed_queries(queries), k)
+        return [[document for document, _ in ranking] for ranking in results]
+
+    def batch_search_by_vector(self, vectors: list[list[float]], k: int = 4) -> list[list[tuple[Document, float]]]:
+        """
+                Search many query vectors with one batched search of the backend.
+
+                Args:
+                    vectors (List[List[float]]): The query vectors.
+                    k (int, optional): Number of results per query. Defaults to 4.
+
+                Returns:
+                    List[List[tuple[Document, float]]]: The best documents per query with their relevance score
+                                                        in [0, 1], best first. Scores of collections embedded with
+                                                        the same model and backend are comparable.
+                """
+        if not len(vectors):
+            return []
+        relevance = self.vector_store._select_relevance_score_fn()
+        with instrumentation.span('vector_search'):
+            if self.backend == 'numpy':
+                rows, scores = self.vector_store.search_vectors(vectors, k)
+                return [[(document, relevance(score)) for document, score in self.vector_store._documents(r, s)]
+                        for r, s in zip(rows, scores)]
+            results = self.vector_store._collection.query(query_embeddings=vectors, n_results=k,
+                                                          include=['documents', 'metadatas', 'distances'])
+        return [[(Document(id=doc_id, page_content=content, metadata=metadata or {}), relevance(distance))
+                 for doc_id, content, metadata, distance in zip(ids, contents, metadatas, distances)]
+                for ids, contents, metadatas, distances in zip(results['ids'], results['documents'],
+                                                               results['metadatas'], results['distances'])]
+
+    @property
+    def lexical_index_path(self) -> str:
+        return os.path.join(self.persist_directory, self.LEXICAL_INDEX_FILE)
+
+    @property
+    def lexical_index(self) -> BM25Index | None:
+        if self._lexical_index is None and self.use_lexical_index and self.vector_store is not None:
+            self.load_lexical_index()
+        return self._lexical_index
+
+    def load_lexical_index(self) -> None:
+        """
+                Load the BM25 index of the opened collection.
+
+                The index is rebuilt from the collection if it is missing or out of sync, e.g. for vector stores
+                created before the index existed or after an interrupted ingest.
+                """
+        if os.path.exists(self.lexical_index_path):
+            self._lexical_index = BM25Index.load(self.lexical_index_path)
+            if len(self._lexical_index) == self.document_count():
+                return
+        print(f'--- Building lexical index from the vector store. ---')
+        existing = self.vector_store.get(include=['documents', 'metadatas'])
+        self._lexical_index = BM25Index()
+        self._lexical_index.add([Document(page_content=content, metadata=metadata or {})
+                                 for content, metadata in zip(existing['documents'], existing['metadatas'])],
+                                existing['ids'])
+        self._lexical_index_dirty = True
+        self.flush()
+
+    def _lexical_index_changed(self) -> None:
+        if not self._lexical_index_dirty and os.path.exists(self.lexical_index_path):
+            # An ingest interrupted before `flush` then rebuilds the index instead of loading a stale one
+            os.remove(self.lexical_index_path)
+        self._lexical_index_dirty = True
+
+    def flush(self) -> None:
+        """
+                Save the BM25 index if it changed since it was loaded or last saved, and the numpy backend.
+
+                Adding and deleting documents only updates the index and the numpy backend's row index in memory,
+                ingests call this once at the end.
+                """
+        if self.backend == 'numpy' and self.vector_store is not None:
+            with instrumentation.span('flush_vector_store'):
+                self.vector_store.flush()
+        if self._lexical_index is not None and self._lexical_index_dirty:
+            with instrumentation.span('save_lexical_index'):
+                self._lexical_index.save(self.lexical_index_path)
+            self._lexical_index_dirty = False
+
+    def add_documents(self, documents: list[Document], batch_size: int = 1000) -> int:
+        """
+                Embed documents and upsert them into the opened vector store under their stable IDs.
+
+                Adding the same chunk twice overwrites it, which makes interrupted ingests safe to repeat. The
+                BM25 index and the numpy backend are only persisted by `flush`, call it once the ingest is done.
+
+                Args:
+                    documents (List[Document]): The document chunks to add.
+                    batch_size (int, optional): Number of chunks embedded and added per call. Defaults to 1000.
+
+                Returns:
+                    int: Number of unique chunks added.
+                """
+        documents, ids = self.assign_ids(documents)
+        with instrumentation.span('index'):
+            for start in range(0, len(documents), batch_size):
+                self.vector_store.add_documents(documents[start:start + batch_size], ids=ids[start:start + batch_size])
+        instrumentation.count('chunks_indexed', len(ids))
+        if ids and self.lexical_index is not None:
+            self.lexical_index.add(documents, ids)
+            self._lexical_index_changed()
+        self.version += 1
+        return len(ids)
+
+    def collection_version(self) -> tuple:
+        """
+                Return a token that changes whenever the collection changes, used to invalidate caches.
+
+                Combines the in-process version counter with the modification time of the Chroma database or the
+                numpy header file, which also catches updates made by other processes.
+
+                Returns:
+                    tuple: The version token.
+                """
+        if self.backend == 'numpy':
+            database = os.path.join(self.persist_directory, f'{self.collection_name}.json')
+        else:
+            database = os.path.join(self.persist_directory, 'chroma.sqlite3')
+        return self.version, os.path.getmtime(database) if os.path.exists(database) else None
+
+    @staticmethod
+    def document_id(document: Document) -> str:
+        """
+                Compute a stable ID for a document chunk from its source URL and its content.
+
+                Args:
+                    document (Document): The document chunk.
+
+                Returns:
+                    str: Hex digest identifying the chunk.
+                """
+        source = document.metadata.get('url') or document.metadata.get('source') or ''
+        return hashlib.sha256(f'{source}\x00{document.page_content}'.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def assign_ids(documents: list[Document]) -> tuple[list[Document], list[str]]:
+        """
+                Assign stable IDs to documents and drop chunks with the same ID.
+
+                Args:
+                    documents (List[Document]): The document chunks.
+
+                Returns:
+                    tuple[List[Document], List[str]]: The unique documents and their IDs.
+                """
+        unique_documents = {}
+        for document in documents:
+            unique_documents.setdefault(VectorStore.document_id(document), document)
+        return list(unique_documents.values()), list(unique_documents.keys())
+
+    def update_vector_store(self, batch_size: int = 1000, gone_urls: set[str] = None) -> dict:
+        """
+                Incrementally synchronise the persisted vector store with the provided documents.
+
+                Chunks are identified by a hash of their source URL and content. Only chunks that are not yet in
+                the collection are embedded and added; outdated chunks of changed pages and all chunks of pages
+                confirmed gone are deleted and unchanged chunks are skipped. Pages missing from the documents
+                without being confirmed gone, e.g. because their fetch timed out, keep their chunks. A missing
+                vector store is created from scratch.
+
+                Args:
+                    batch_size (int, optional): Number of chunks embedded and added per call. Defaults to 1000.
+                    gone_urls (set[str], optional): URLs of pages confirmed removed, e.g. answered with 404 or
+                                                    410, see `RagWebCrawler.gone_links`. Defaults to None.
+
+                Returns:
+                    dict: Number of chunks 'added' (new pages), 'updated' (new chunks of known pages),
+                          'deleted', 'skipped' (unchanged) and 'kept' (of pages missing from the documents).
+                """
+        if not os.path.exists(self.persist_directory):
+            self.create_vector_store()
+            return {'added': len(self.assign_ids(self.documents)[1]), 'updated': 0, 'deleted': 0, 'skipped': 0,
+                    'kept': 0}
+
+        self.create_vector_store()
+        existing = self.vector_store.get(include=['metadatas'])
+        existing_ids = set(existing['ids'])
+        existing_sources = {(metadata or {}).get('url') for metadata in existing['metadatas']}
+
+        documents, ids = self.assign_ids(self.documents)
+        new_ids = set(ids)
+        new_sources = {document.metadata.get('url') for document in documents}
+        gone_urls = gone_urls if gone_urls is not None else set()
+
+        report = {'added': 0, 'updated': 0, 'deleted': 0, 'skipped': 0, 'kept': 0}
+        to_add = []
+        for document, doc_id in zip(documents, ids):
+            if doc_id in existing_ids:
+                report['skipped'] += 1
+            else:
+                to_add.append(document)
+                report['updated' if document.metadata.get('url') in existing_sources else 'added'] += 1
+
+        # Chunks of pages that were not loaded this time are only deleted if the page is confirmed gone
+        to_delete = []
+        for doc_id, metadata in zip(existing['ids'], existing['metadatas']):
+            source = (metadata or {}).get('url')
+            if doc_id in new_ids:
+                continue
+            if source in new_sources or source in gone_urls:
+                to_delete.append(doc_id)
+            else:
+                report['kept'] += 1
+        with instrumentation.span('delete'):
+            for start in range(0, len(to_delete), batch_size):
+                self.vector_store.delete(ids=to_delete[start:start + batch_size])
+                self.version += 1
+        if to_delete and self.lexical_index is not None:
+            self.lexical_index.delete(to_delete)
+            self._lexical_index_changed()
+        instrumentation.count('chunks_deleted', len(to_delete))
+        report['deleted'] = len(to_delete)
+
+        self.add_documents(to_add, batch_size=batch_size)
+        self.flush()
+
+        print(f'--- Vector store updated: {report["added"]} added, {report["updated"]} updated, '
+              f'{report["deleted"]} deleted, {report["skipped"]} skipped, {report["kept"]} kept. ---')
+        return report
+
 
@@ -0,0 +1,19 @@
+from rag_vector_store.VectorStore import VectorStore
+from rag_chatbot.RagChatBot import RagChatBot
+from rag_chatbot.ChatServer import ChatServer
+
+
+
+# Define the address the chat server listens on
+host = '127.0.0.1'
+port = 8080
+
+if __name__ == '__main__':
+    # Load the existing vector store, it is shared by all chat sessions
+    Vector_Store = VectorStore()
+    Vector_Store.create_vector_store()
+
+    # Initialize one chatbot and serve it to many concurrent sessions over HTTP
+    # The server loads the embedding model in the background on startup, GET /ready reports when it is done
+    ChatBot = RagChatBot(Vector_Store)
+    ChatServer(ChatBot).run(host=host, port=port)
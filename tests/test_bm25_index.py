@@ -0,0 +1,109 @@
+import os
+
+from langchain.schema import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from rag_vector_store.BM25Index import BM25Index
+from rag_vector_store.HybridRetriever import HybridRetriever
+from rag_vector_store.VectorStore import VectorStore
+
+
+def make_index() -> BM25Index:
+    index = BM25Index()
+    index.add([Document(page_content='Anna Schmidt is the CEO of OneThousand.'),
+               Document(page_content='The office is in Berlin, close to the river.'),
+               Document(page_content='OneThousand builds software for the energy sector.')],
+              ['ceo', 'office', 'software'])
+    return index
+
+
+def test_search_ranks_chunks_sharing_query_terms():
+    results = make_index().search('Who is the CEO?', k=3)
+
+    assert results[0][0].page_content.startswith('Anna Schmidt')
+    assert all(score > 0 for _, score in results)
+
+
+def test_rare_terms_weigh_more_than_common_ones():
+    # 'OneThousand' appears in two chunks, 'energy' only in one
+    results = make_index().search('OneThousand energy', k=3)
+
+    assert results[0][0].page_content.startswith('OneThousand builds')
+
+
+def test_chunks_without_query_terms_are_not_returned():
+    assert make_index().search('kubernetes', k=3) == []
+
+
+def test_add_replaces_and_delete_removes_chunks():
+    index = make_index()
+    index.add([Document(page_content='The office moved to Hamburg.')], ['office'])
+    index.delete(['ceo', 'unknown'])
+
+    assert len(index) == 2
+    assert 'ceo' not in index
+    assert index.search('Berlin', k=3) == []
+    assert index.search('Hamburg', k=3)[0][0].page_content == 'The office moved to Hamburg.'
+
+
+def test_save_and_load_keep_the_ranking(tmp_path):
+    index = make_index()
+    index.delete(['office'])
+    path = str(tmp_path / 'bm25_index.json')
+    index.save(path)
+
+    loaded = BM25Index.load(path)
+    assert len(loaded) == 2
+    assert ([(document.page_content, score) for document, score in loaded.search('OneThousand CEO', k=3)] ==
+            [(document.page_content, score) for document, score in index.search('OneThousand CEO', k=3)])
+
+
+def test_reciprocal_rank_fusion_prefers_chunks_ranked_by_both():
+    a, b, c, d = (Document(page_content=text, metadata={'url': 'http://site'}) for text in 'abcd')
+
+    fused = HybridRetriever.reciprocal_rank_fusion([[a, b, c], [a, c, d]], k=3)
+
+    # c is third and second, which beats b ranking second in one list only
+    assert fused == [a, c, b]
+
+
+def test_reciprocal_rank_fusion_deduplicates_equal_chunks():
+    first = Document(page_content='same text', metadata={'url': 'http://site'})
+    copy = Document(page_content='same text', metadata={'url': 'http://site'})
+
+    fused = HybridRetriever.reciprocal_rank_fusion([[first], [copy]], k=3)
+
+    assert fused == [first]
+
+
+def test_vector_store_loads_the_lexical_index_lazily_and_saves_it_on_flush(tmp_path):
+    options = {'persist_directory': str(tmp_path / 'store'), 'embedding': DeterministicFakeEmbedding(size=16),
+               'embedding_cache_dir': None, 'backend': 'numpy'}
+    store = VectorStore([Document(page_content='Anna is the CEO.', metadata={'url': 'http://site/a'})], **options)
+    store.create_vector_store()
+    assert os.path.exists(store.lexical_index_path)
+
+    store = VectorStore(**options)
+    store.open_vector_store()
+    assert store._lexical_index is None
+
+    store.add_documents([Document(page_content='The office is in Berlin.', metadata={'url': 'http://site/b'})])
+    # The outdated file is gone until the ingest flushes the index
+    assert not os.path.exists(store.lexical_index_path)
+    store.flush()
+    assert len(BM25Index.load(store.lexical_index_path)) == 2
+    assert store.lexical_index.search('Berlin', k=1)[0][0].page_content == 'The office is in Berlin.'
+
+
+def test_hybrid_retriever_fetches_at_least_k_candidates_per_ranking():
+    documents = [Document(page_content=f'chunk {i} about the office', metadata={'url': f'http://site/{i}'})
+                 for i in range(30)]
+    index = BM25Index()
+    index.add(documents, [VectorStore.document_id(document) for document in documents])
+    # Only the lexical ranking has candidates, so fusion returns exactly what it fetched
+    retriever = HybridRetriever(lexical_index=index, k=25, fetch_k=20, mode='hybrid',
+                                vector_store=InMemoryVectorStore(DeterministicFakeEmbedding(size=16)))
+
+    assert retriever.fetch_count(5) == 20
+    assert len(retriever.invoke('office')) == 25
@@ -0,0 +1,74 @@
+import pytest
+
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+
+from rag_vector_store.CachedEmbeddings import CachedEmbeddings
+from rag_vector_store.VectorStore import VectorStore
+
+
+class CountingEmbeddings(Embeddings):
+    """Embeds documents and queries alike and records the calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(('documents', list(texts)))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        self.calls.append(('query', text))
+        return [float(len(text)), 1.0]
+
+
+class AsymmetricEmbeddings(CountingEmbeddings):
+    """Encodes queries differently from documents."""
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(('queries', list(texts)))
+        return [[float(len(text)), -1.0] for text in texts]
+
+
+def test_embed_queries_caches_query_embeddings_apart_from_documents(tmp_path):
+    model = AsymmetricEmbeddings()
+    cache = CachedEmbeddings(model, 'asymmetric', cache_dir=str(tmp_path))
+    cache.embed_documents(['who is the CEO?'])
+
+    vectors = cache.embed_queries(['who is the CEO?', 'where?', 'who is the CEO?'])
+
+    assert vectors == [[15.0, -1.0], [6.0, -1.0], [15.0, -1.0]]
+    # The distinct queries are embedded in one call, none is served from the document entries
+    assert model.calls[1:] == [('queries', ['who is the CEO?', 'where?'])]
+    assert cache.embed_query('where?') == [6.0, -1.0]
+    assert cache.embed_queries(['where?']) == [[6.0, -1.0]]
+    assert len(model.calls) == 2
+
+
+def test_embed_queries_batches_models_without_a_query_encoding(tmp_path):
+    model = CountingEmbeddings()
+    cache = CachedEmbeddings(model, 'symmetric', cache_dir=str(tmp_path))
+
+    assert cache.embed_queries(['who?', 'where?', 'who?']) == [[4.0, 1.0], [6.0, 1.0], [4.0, 1.0]]
+    assert model.calls == [('documents', ['who?', 'where?'])]
+    assert cache.embed_query('who?') == [4.0, 1.0]
+    assert len(model.calls) == 1
+
+
+@pytest.mark.parametrize('model_class', [CountingEmbeddings, AsymmetricEmbeddings])
+def test_batch_similarity_search_embeds_all_queries_in_one_call(tmp_path, model_class):
+    model = model_class()
+    store = VectorStore([Document(page_content='Anna is the CEO.', metadata={'url': 'http://site/a'})],
+                        persist_directory=str(tmp_path / 'store'), embedding=model, embedding_cache_dir=None,
+                        backend='numpy')
+    store.create_vector_store()
+    model.calls.clear()
+
+    results = store.batch_similarity_search(['who is the CEO?', 'where?'], k=1)
+
+    assert [documents[0].page_content for documents in results] == ['Anna is the CEO.'] * 2
+    assert len(model.calls) == 1
+    assert model.calls[0][1] == ['who is the CEO?', 'where?']
@@ -0,0 +1,84 @@
+from langchain_core.documents import Document
+
+from rag_chatbot.ContextPacker import ContextPacker
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def make_packer(**options) -> ContextPacker:
+    return ContextPacker(count_tokens=count_words, **options)
+
+
+def test_overlap_is_the_share_of_the_shorter_chunk_in_the_other():
+    short = ContextPacker.shingles('Anna Schmidt is the CEO')
+    long = ContextPacker.shingles('Anna Schmidt is the CEO of OneThousand since 2020.')
+
+    assert ContextPacker.overlap(short, long) == 1.0
+    assert ContextPacker.overlap(short, ContextPacker.shingles('The office is in Berlin.')) == 0.0
+    assert ContextPacker.overlap(short, set()) == 0.0
+
+
+def test_shingles_of_short_texts():
+    assert ContextPacker.shingles('Hello, World') == {('hello', 'world')}
+    assert ContextPacker.shingles('...') == set()
+
+
+def test_select_drops_near_duplicates_and_keeps_the_rank_order():
+    documents = [Document(page_content='Anna Schmidt is the CEO of OneThousand.'),
+                 Document(page_content='Anna Schmidt is the CEO of OneThousand. Contact her by mail.'),
+                 Document(page_content='The office of OneThousand is in Berlin.'),
+                 Document(page_content='OneThousand builds software for the energy sector.')]
+
+    selected, duplicates = make_packer().select(documents)
+
+    assert selected == [0, 2, 3]
+    assert duplicates == 1
+
+
+def test_select_prefers_diverse_chunks_over_redundant_ones():
+    documents = [Document(page_content='one two three four five six seven eight'),
+                 Document(page_content='one two three four five nine ten eleven'),
+                 Document(page_content='alpha beta gamma delta')]
+
+    assert make_packer(max_documents=2, mmr_lambda=0.5).select(documents)[0] == [0, 2]
+    assert make_packer(max_documents=2, mmr_lambda=1.0).select(documents)[0] == [0, 1]
+
+
+def test_trim_cuts_at_the_last_sentence_that_fits():
+    packer = make_packer()
+    text = 'First sentence here. Second sentence here. Third sentence here.'
+
+    assert packer.trim(text, 7) == 'First sentence here. Second sentence here.'
+    assert packer.trim(text, 100) == text
+    # A single sentence longer than the budget is cut at a word
+    assert packer.trim('one two three four five six', 4) == 'one two three four'
+
+
+def test_pack_trims_the_chunk_crossing_the_budget_and_reports_the_savings():
+    documents = [Document(page_content='alpha beta gamma delta epsilon zeta.', metadata={'url': 'http://site/a'}),
+                 Document(page_content='one two three four. five six seven eight.', metadata={'url': 'http://site/b'}),
+                 Document(page_content='red green blue yellow.', metadata={'url': 'http://site/c'})]
+    packer = make_packer(max_documents=3, token_budget=10, min_trimmed_tokens=2)
+
+    packed = packer.pack(documents)
+
+    assert [document.page_content for document in packed] == ['alpha beta gamma delta epsilon zeta.',
+                                                              'one two three four.']
+    assert packed[1].metadata == {'url': 'http://site/b', 'trimmed': True}
+    assert 'trimmed' not in documents[1].metadata
+    assert packed.report == {'candidates': 3, 'selected': 2, 'duplicates': 0, 'trimmed': 1,
+                             'tokens_unpacked': 18, 'tokens_packed': 10, 'tokens_saved': 8}
+    assert packer.stats['queries'] == 1
+    assert packer.stats['tokens_packed'] == 10
+
+
+def test_pack_leaves_out_chunks_trimmed_below_the_minimum():
+    documents = [Document(page_content='alpha beta gamma delta epsilon zeta.'),
+                 Document(page_content='one two three four five six.')]
+
+    packed = make_packer(token_budget=8, min_trimmed_tokens=3).pack(documents)
+
+    assert [document.page_content for document in packed] == ['alpha beta gamma delta epsilon zeta.']
+    assert packed.report['trimmed'] == 0
@@ -0,0 +1,60 @@
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from rag_chatbot.ConversationMemory import ConversationMemory
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def memory(responses: list[str], max_tokens: int = 100) -> ConversationMemory:
+    return ConversationMemory(FakeListChatModel(responses=responses), max_tokens=max_tokens, keep_ratio=0.5,
+                              count_tokens=count_words)
+
+
+def test_history_within_budget_is_kept_verbatim():
+    conversation = memory(['unused'])
+    conversation.add_turn('Who is the CEO?', 'Anna is the CEO.')
+    assert conversation.summarizations == 0
+    assert conversation.messages() == [HumanMessage(content='Who is the CEO?'),
+                                       AIMessage(content='Anna is the CEO.')]
+
+
+def test_oldest_turns_are_folded_into_the_summary():
+    conversation = memory(['The user asked about the team.'])
+    for turn in range(5):
+        conversation.add_turn(' '.join(['question'] * 10), ' '.join(['answer'] * 10) + f' {turn}')
+
+    assert conversation.summarizations == 1
+    assert conversation._tokens(conversation.messages_recent) <= 50
+    assert conversation.messages_recent[-1].content.endswith(' 4')
+    assert conversation.messages()[0] == SystemMessage(
+        content='Summary of the earlier conversation: The user asked about the team.')
+
+
+def test_summary_is_condensed_once_it_outgrows_its_share():
+    # Every summary update returns a long summary, every condensation a short one
+    long_summary, short_summary = ' '.join(['fact'] * 80), 'Short summary of the facts.'
+    conversation = memory([long_summary, short_summary])
+    for turn in range(8):
+        conversation.add_turn(' '.join(['question'] * 10), ' '.join(['answer'] * 10))
+        assert conversation.total_tokens() <= conversation.max_tokens
+
+    assert conversation.condensations >= 1
+    assert count_words(conversation.summary) <= conversation.summary_budget
+
+
+def test_summary_is_cut_if_the_model_ignores_the_limit():
+    conversation = memory([' '.join(['fact'] * 80)])
+    conversation.summary = ' '.join(['old'] * 60)
+    conversation.condense_summary()
+    assert count_words(conversation.summary) == conversation.summary_budget
+
+
+def test_last_turn_is_kept_even_if_it_exceeds_the_budget():
+    conversation = memory(['summary'], max_tokens=10)
+    conversation.add_turn('short', 'answer')
+    conversation.add_turn(' '.join(['long'] * 20), 'answer')
+    assert len(conversation.messages_recent) == 2
+    assert conversation.messages_recent[0].content.startswith('long')
@@ -0,0 +1,98 @@
+import os
+
+from rag_data_loading.CrawlCheckpoint import CrawlCheckpoint
+
+
+def start_crawl(directory) -> CrawlCheckpoint:
+    checkpoint = CrawlCheckpoint(str(directory), sync_every=1)
+    checkpoint.start(['/', '/a'], {'/': '2025-01-01', '/a': '2025-01-02'})
+    return checkpoint
+
+
+def test_new_checkpoint_has_no_crawl_in_progress(tmp_path):
+    checkpoint = CrawlCheckpoint(str(tmp_path))
+
+    assert not checkpoint.in_progress
+    assert checkpoint.pages == {}
+
+
+def test_interrupted_crawl_resumes_with_its_frontier(tmp_path):
+    checkpoint = start_crawl(tmp_path)
+    checkpoint.record('/', ['/a', '/b'], ['https://www.linkedin.com/x'])
+    checkpoint.close()
+
+    resumed = CrawlCheckpoint(str(tmp_path))
+    visited, frontier = resumed.frontier()
+
+    assert resumed.in_progress
+    assert visited == {'/', '/a', '/b'}
+    assert frontier == ['/a', '/b']
+    assert resumed.processed['/']['external_links'] == ['https://www.linkedin.com/x']
+
+
+def test_partially_written_last_line_is_ignored(tmp_path):
+    checkpoint = start_crawl(tmp_path)
+    checkpoint.record('/', ['/a'], [])
+    checkpoint.close()
+    with open(checkpoint.frontier_path, 'a', encoding='utf-8') as file:
+        file.write('{"url": "/a", "li')
+
+    resumed = CrawlCheckpoint(str(tmp_path))
+
+    assert list(resumed.processed) == ['/']
+    assert resumed.frontier()[1] == ['/a']
+
+    # The pages of the resumed crawl survive the next interrupt
+    resumed.record('/a', ['/b'], [])
+    resumed.record('/b', [], [])
+    resumed.close()
+    resumed_again = CrawlCheckpoint(str(tmp_path))
+
+    assert list(resumed_again.processed) == ['/', '/a', '/b']
+    assert resumed_again.frontier()[1] == []
+
+
+def test_complete_keeps_the_pages_for_the_next_crawl(tmp_path):
+    checkpoint = start_crawl(tmp_path)
+    checkpoint.record('/', ['/a'], [])
+    checkpoint.record('/a', ['/'], [])
+    checkpoint.complete()
+
+    assert not os.path.exists(checkpoint.frontier_path)
+    reopened = CrawlCheckpoint(str(tmp_path))
+    assert not reopened.in_progress
+    assert reopened.pages['/a'] == {'lastmod': '2025-01-02', 'links': ['/'], 'external_links': []}
+
+
+def test_unchanged_compares_the_sitemap_lastmod(tmp_path):
+    checkpoint = start_crawl(tmp_path)
+    checkpoint.record('/', ['/a'], [])
+    checkpoint.record('/a', [], [])
+    checkpoint.complete()
+
+    checkpoint.start(['/', '/a', '/new'], {'/': '2025-01-01', '/a': '2025-02-01'})
+
+    assert checkpoint.unchanged('/')['links'] == ['/a']
+    assert checkpoint.unchanged('/a') is None
+    assert checkpoint.unchanged('/new') is None
+
+
+def test_pages_without_lastmod_are_never_unchanged(tmp_path):
+    checkpoint = CrawlCheckpoint(str(tmp_path))
+    checkpoint.start(['/'], {})
+    checkpoint.record('/', [], [])
+    checkpoint.complete()
+
+    checkpoint.start(['/'], {})
+
+    assert checkpoint.unchanged('/') is None
+
+
+def test_start_discards_an_unfinished_crawl(tmp_path):
+    checkpoint = start_crawl(tmp_path)
+    checkpoint.record('/', ['/a'], [])
+
+    checkpoint.start(['/'], {})
+
+    assert checkpoint.processed == {}
+    assert CrawlCheckpoint(str(tmp_path)).frontier() == ({'/'}, ['/'])
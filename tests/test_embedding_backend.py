@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from rag_vector_store.EmbeddingBackend import EmbeddingBackend
+from rag_vector_store.ShardedVectorStore import ShardedVectorStore
+from rag_vector_store.VectorStore import VectorStore
+
+
+class FakeSentenceTransformer:
+    """Encodes a text as its length, like a model with one dimension."""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size, normalize_embeddings, convert_to_numpy):
+        self.calls.append((list(texts), batch_size))
+        return np.asarray([[float(len(text))] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def loads(monkeypatch) -> list:
+    loaded = []
+
+    def load_model(backend):
+        loaded.append(backend.runtime)
+        return FakeSentenceTransformer()
+
+    monkeypatch.setattr(EmbeddingBackend, 'load_model', load_model)
+    return loaded
+
+
+def test_backend_loads_the_model_on_first_use(loads):
+    backend = EmbeddingBackend(runtime='quantized', batch_size=2)
+    assert loads == []
+
+    assert backend.embed_documents(['a', 'bbb']) == [[1.0], [3.0]]
+    assert backend.embed_queries([]) == []
+    assert backend.embed_query('cc') == [2.0]
+    assert loads == ['quantized']
+    assert backend.model.calls[0] == (['a', 'bbb'], 2)
+
+
+def test_backend_names_the_runtime_in_the_cache_key():
+    assert EmbeddingBackend.cache_name('model') == 'model'
+    assert EmbeddingBackend.cache_name('model', 'onnx', 'onnx/model_qint8.onnx') == 'model@onnx:onnx/model_qint8.onnx'
+    with pytest.raises(ValueError):
+        EmbeddingBackend(runtime='tensorrt')
+
+
+def test_vector_store_loads_the_runtime_in_the_warm_up(tmp_path, loads):
+    store = VectorStore(persist_directory=str(tmp_path / 'store'), embedding_cache_dir=None, backend='numpy',
+                        embedding_runtime='onnx', embedding_batch_size=8)
+    store.open_vector_store()
+    assert loads == []
+    assert not store.is_ready()
+
+    store.warm_up(background=False)
+
+    assert loads == ['onnx']
+    assert store.is_ready()
+    assert store.embedding.embedding.model_name == 'sentence-transformers/all-mpnet-base-v2@onnx'
+
+
+def test_stores_reject_unknown_runtimes(tmp_path):
+    with pytest.raises(ValueError):
+        VectorStore(persist_directory=str(tmp_path / 'store'), embedding_runtime='tensorrt')
+    with pytest.raises(ValueError):
+        ShardedVectorStore(str(tmp_path / 'shards'), embedding_runtime='tensorrt')
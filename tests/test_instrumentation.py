@@ -0,0 +1,19 @@
+from rag_instrumentation.Instrumentation import Instrumentation
+
+
+def test_prometheus_text_has_one_type_line_per_metric_and_escapes_labels():
+    metrics = Instrumentation(enabled=True)
+    metrics.count('cache_hits', kind='query')
+    metrics.count('cache_hits', 2, kind='document')
+    metrics.count('errors', reason='bad "quote" \\ and\nnewline')
+    metrics.record_span('retrieve', 0.5)
+    metrics.record_span('generate', 1.0)
+
+    lines = metrics.prometheus_text().splitlines()
+
+    assert lines.count('# TYPE rag_cache_hits_total counter') == 1
+    assert lines.count('# TYPE rag_span_seconds summary') == 1
+    assert sum(line.startswith('# HELP rag_cache_hits_total ') for line in lines) == 1
+    assert 'rag_cache_hits_total{kind="document"} 2' in lines
+    assert 'rag_errors_total{reason="bad \\"quote\\" \\\\ and\\nnewline"} 1' in lines
+    assert 'rag_span_seconds_count{span="retrieve"} 1' in lines
@@ -0,0 +1,52 @@
+from rag_data_loading.MinHashLSH import MinHashLSH
+
+
+TEXT = ('OneThousand builds retrieval augmented chatbots for companies that want answers grounded in their '
+        'own documents, from crawling the website to serving the answers.')
+
+
+def test_choose_bands_threshold_not_above_similarity_threshold():
+    for threshold in (0.5, 0.7, 0.8, 0.9):
+        bands, rows = MinHashLSH.choose_bands(threshold, 128)
+        assert bands * rows == 128
+        assert (1 / bands) ** (1 / rows) <= threshold
+
+
+def test_shingles_of_short_text_is_the_whole_text():
+    index = MinHashLSH(shingle_size=3)
+    assert index.shingles('Hello, World') == {'hello world'}
+    assert index.shingles('a b c d') == {'a b c', 'b c d'}
+
+
+def test_signature_is_deterministic_and_case_insensitive():
+    index = MinHashLSH()
+    assert (index.signature(TEXT) == index.signature(TEXT.upper())).all()
+    assert (MinHashLSH(seed=1).signature(TEXT) == MinHashLSH(seed=1).signature(TEXT)).all()
+
+
+def test_query_finds_near_duplicate():
+    index = MinHashLSH(threshold=0.8)
+    signature, match, _ = index.query(TEXT)
+    assert match is None
+    index.insert(signature, key='original')
+
+    _, match, similarity = index.query(TEXT + ' Contact us.')
+    assert match == 'original'
+    assert similarity >= 0.8
+    assert len(index) == 1
+
+
+def test_query_ignores_unrelated_text():
+    index = MinHashLSH(threshold=0.8)
+    index.insert(index.signature(TEXT), key='original')
+    _, match, similarity = index.query('Our office in Berlin is closed on public holidays and between the years.')
+    assert match is None
+    assert similarity == 0.0
+
+
+def test_query_returns_most_similar_match():
+    index = MinHashLSH(threshold=0.5)
+    index.insert(index.signature(TEXT + ' Read more about our projects and our team.'), key='far')
+    index.insert(index.signature(TEXT), key='close')
+    _, match, _ = index.query(TEXT + ' Read more.')
+    assert match == 'close'
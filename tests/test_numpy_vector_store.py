@@ -0,0 +1,95 @@
+import os
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from rag_vector_store.NumpyVectorStore import NumpyVectorStore
+
+
+EMBEDDING = DeterministicFakeEmbedding(size=16)
+
+
+def open_store(directory, **options) -> NumpyVectorStore:
+    return NumpyVectorStore(EMBEDDING, persist_directory=str(directory), **options)
+
+
+def add(store: NumpyVectorStore, names: list[str]) -> None:
+    store.add_texts([f'text {name}' for name in names], metadatas=[{'name': name} for name in names], ids=names)
+
+
+def test_flushed_rows_survive_reopening(tmp_path):
+    store = open_store(tmp_path)
+    add(store, ['a', 'b', 'c'])
+    store.flush()
+
+    reopened = open_store(tmp_path)
+    assert len(reopened) == 3
+    document, score = reopened.similarity_search_with_score('text b', k=1)[0]
+    assert (document.id, document.page_content, document.metadata) == ('b', 'text b', {'name': 'b'})
+    assert score > 0.99
+
+
+def test_changes_are_only_persisted_by_flush(tmp_path):
+    store = open_store(tmp_path)
+    add(store, ['a', 'b'])
+    store.flush()
+    header_mtime = os.path.getmtime(store.metadata_path)
+
+    add(store, ['c'])
+    store.delete(['a'])
+    assert os.path.getmtime(store.metadata_path) == header_mtime
+    assert sorted(open_store(tmp_path).get()['ids']) == ['a', 'b']
+
+    store.flush()
+    assert sorted(open_store(tmp_path).get()['ids']) == ['b', 'c']
+
+
+def test_deleted_rows_are_skipped_and_compacted(tmp_path):
+    store = open_store(tmp_path, quantize=True)
+    add(store, ['a', 'b', 'c', 'd'])
+    store.delete(['a', 'c'])
+
+    assert len(store) == 2
+    assert {document.id for document in store.similarity_search('text a', k=4)} == {'b', 'd'}
+
+    store.flush()
+    reopened = open_store(tmp_path)
+    assert reopened.get() == {'ids': ['b', 'd'], 'documents': ['text b', 'text d'],
+                              'metadatas': [{'name': 'b'}, {'name': 'd'}]}
+    assert reopened.similarity_search('text d', k=1)[0].id == 'd'
+
+
+def test_record_log_is_rewritten_once_most_records_are_outdated(tmp_path):
+    store = open_store(tmp_path)
+    add(store, ['a', 'b'])
+    store.flush()
+    first_log = store.log_path
+
+    for _ in range(3):
+        add(store, ['a'])
+    store.flush()
+
+    assert not os.path.exists(first_log)
+    with open(store.log_path, encoding='utf-8') as file:
+        assert len(file.readlines()) == 2
+    assert open_store(tmp_path).similarity_search('text a', k=1)[0].page_content == 'text a'
+
+
+def test_matrix_only_grows_when_rows_do_not_fit(tmp_path):
+    store = open_store(tmp_path)
+    for batch in range(3):
+        add(store, [f'{batch}-{i}' for i in range(10)])
+
+    assert store._capacity == 1024
+
+
+def test_quantized_search_in_small_blocks_matches_one_block(tmp_path, monkeypatch):
+    names = [str(i) for i in range(50)]
+    store = open_store(tmp_path, quantize=True)
+    add(store, names)
+    store.delete(['7'])
+    expected = store.similarity_search_with_score('text 7', k=5)
+
+    monkeypatch.setattr(NumpyVectorStore, 'QUANTIZED_BLOCK_SIZE', 8)
+
+    assert store.similarity_search_with_score('text 7', k=5) == expected
+    assert '7' not in {document.id for document, _ in expected}
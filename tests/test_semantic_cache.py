@@ -0,0 +1,97 @@
+import time
+
+from langchain_core.embeddings import Embeddings
+
+from rag_chatbot.SemanticCache import SemanticCache
+
+
+class KeywordEmbedding(Embeddings):
+    """
+    Embeds a text as the counts of a few keywords, so that similar queries get similar vectors.
+    """
+
+    KEYWORDS = ['who', 'ceo', 'founded', 'office', 'berlin']
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        self.calls += 1
+        words = text.lower().replace('?', '').split()
+        return [float(words.count(keyword)) for keyword in self.KEYWORDS]
+
+
+def result(answer: str) -> dict:
+    return {'answer': answer, 'context': []}
+
+
+def test_exact_hit_after_normalisation_does_not_embed():
+    embedding = KeywordEmbedding()
+    cache = SemanticCache(embedding)
+    cache.store('Who is the CEO?', result('Anna'), cost=2.0)
+    calls = embedding.calls
+
+    cached, _ = cache.lookup('  who is   the ceo?')
+    assert cached['answer'] == 'Anna'
+    assert embedding.calls == calls
+    assert cache.stats['exact_hits'] == 1
+    assert cache.stats['saved_seconds'] > 1.9
+
+
+def test_semantic_hit_and_miss():
+    cache = SemanticCache(KeywordEmbedding(), threshold=0.95)
+    cache.store('Who is the CEO?', result('Anna'), cost=1.0)
+
+    cached, vector = cache.lookup('Who is CEO')
+    assert cached['answer'] == 'Anna'
+    assert vector is not None
+
+    cached, _ = cache.lookup('Where is the office in Berlin?')
+    assert cached is None
+    assert (cache.stats['hits'], cache.stats['exact_hits'], cache.stats['misses']) == (1, 0, 1)
+    assert cache.hit_rate() == 0.5
+
+
+def test_without_embedding_only_exact_matches_are_served():
+    cache = SemanticCache(None)
+    cache.store('Who is the CEO?', result('Anna'), cost=1.0)
+    assert cache.lookup('who is the ceo?')[0]['answer'] == 'Anna'
+    assert cache.lookup('Who is CEO') == (None, None)
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'time', lambda: now[0])
+    cache = SemanticCache(KeywordEmbedding(), ttl=60.0)
+    cache.store('Who is the CEO?', result('Anna'), cost=1.0)
+
+    now[0] += 59.0
+    assert cache.lookup('Who is the CEO?')[0] is not None
+    now[0] += 2.0
+    assert cache.lookup('Who is the CEO?')[0] is None
+
+
+def test_version_change_clears_the_cache():
+    version = [1]
+    cache = SemanticCache(KeywordEmbedding(), version_fn=lambda: version[0])
+    cache.store('Who is the CEO?', result('Anna'), cost=1.0)
+    assert cache.lookup('Who is the CEO?')[0] is not None
+
+    version[0] = 2
+    assert cache.lookup('Who is the CEO?')[0] is None
+    assert cache.stats['invalidations'] == 1
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = SemanticCache(None, max_entries=2)
+    cache.store('first', result('1'), cost=1.0)
+    cache.store('second', result('2'), cost=1.0)
+    cache.lookup('first')
+    cache.store('third', result('3'), cost=1.0)
+
+    assert cache.lookup('second')[0] is None
+    assert cache.lookup('first')[0]['answer'] == '1'
+    assert cache.lookup('third')[0]['answer'] == '3'
@@ -0,0 +1,28 @@
+from rag_chatbot.SessionStore import SessionStore
+
+
+def make_store(**options) -> SessionStore:
+    return SessionStore(memory_factory=list, **options)
+
+
+def test_unknown_session_ids_get_a_fresh_id():
+    store = make_store()
+
+    session_id, session = store.get('chosen-by-client')
+
+    assert session_id != 'chosen-by-client'
+    assert 'chosen-by-client' not in store._sessions
+    assert store.get(session_id) == (session_id, session)
+    assert len(store) == 1
+
+
+def test_least_recently_used_session_is_evicted():
+    store = make_store(max_sessions=2)
+    first, _ = store.get()
+    second, _ = store.get()
+    store.get(first)
+    store.get()
+
+    assert first in store._sessions
+    assert second not in store._sessions
+    assert store.evicted == 1
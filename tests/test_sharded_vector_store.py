@@ -0,0 +1,55 @@
+import pytest
+
+from langchain.schema import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from rag_vector_store.ShardedVectorStore import ShardedVectorStore
+
+
+def make_documents(site: str, texts: list[str]) -> list[Document]:
+    return [Document(page_content=text, metadata={'url': f'http://{site}/{i}'}) for i, text in enumerate(texts)]
+
+
+@pytest.mark.parametrize('backend', ['numpy', 'chroma'])
+def test_dropped_shard_can_be_rebuilt_under_the_same_name(tmp_path, backend):
+    root = str(tmp_path / 'shards')
+    with ShardedVectorStore(root, embedding=DeterministicFakeEmbedding(size=16), embedding_cache_dir=None,
+                            backend=backend) as store:
+        store.build_shard('a', make_documents('a', ['Anna is the CEO.', 'The office is in Berlin.']))
+        store.build_shard('b', make_documents('b', ['OneThousand builds software.']))
+
+        store.drop_shard('a')
+        assert store.shard_names() == ['b']
+        assert list(store.shards) == ['b']
+
+        report = store.build_shard('a', make_documents('a', ['The office moved to Hamburg.']))
+        assert report['added'] == 1
+        assert store.shard_names() == ['a', 'b']
+        assert store.shards['a'].document_count() == 1
+        assert store.similarity_search_with_score('The office moved to Hamburg.', k=1, shards=['a'])[0][0] \
+            .page_content == 'The office moved to Hamburg.'
+
+
+def test_load_skips_dropped_shards(tmp_path):
+    root = str(tmp_path / 'shards')
+    options = {'embedding': DeterministicFakeEmbedding(size=16), 'embedding_cache_dir': None, 'backend': 'chroma'}
+    with ShardedVectorStore(root, **options) as store:
+        store.build_shard('a', make_documents('a', ['Anna is the CEO.']))
+        store.build_shard('b', make_documents('b', ['OneThousand builds software.']))
+        store.drop_shard('a')
+
+    with ShardedVectorStore(root, **options) as store:
+        store.load()
+        assert list(store.shards) == ['b']
+        with pytest.raises(ValueError):
+            store.load(['a'])
+
+
+def test_closed_store_cannot_be_searched(tmp_path):
+    store = ShardedVectorStore(str(tmp_path / 'shards'), embedding=DeterministicFakeEmbedding(size=16),
+                               embedding_cache_dir=None, backend='numpy')
+    store.build_shard('a', make_documents('a', ['Anna is the CEO.']))
+    store.close()
+
+    with pytest.raises(RuntimeError):
+        store.batch_similarity_search(['Who is the CEO?'])
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from langchain.schema import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from rag_data_loading.DocumentPreprocessor import DocumentPreprocessor
+from rag_vector_store.StreamingIngest import StreamingIngest
+from rag_vector_store.VectorStore import VectorStore
+
+URLS = [f'http://site/{i}' for i in range(6)]
+
+
+class Interrupted(Exception):
+    pass
+
+
+class SiteCrawler:
+    """Serves the pages of a fixed site, like a crawler whose links have been discovered."""
+
+    def iter_web_pages(self, skip: set[str] = None):
+        return ((url, f'Page {url}.') for url in URLS if url not in (skip or set()))
+
+
+def make_ingest(tmp_path, monkeypatch, crash_after: int = None) -> StreamingIngest:
+    def chunk_pages(pages, batch_size=16, max_workers=1, unique_texts=None):
+        for count, (url, text) in enumerate(pages):
+            if count == crash_after:
+                raise Interrupted()
+            unique_texts.add(text)
+            yield [url], [Document(page_content=text, metadata={'url': url})], [text]
+
+    monkeypatch.setattr(DocumentPreprocessor, 'stream_clean_chunk_transform', staticmethod(chunk_pages))
+    store = VectorStore(persist_directory=str(tmp_path / 'store'), embedding=DeterministicFakeEmbedding(size=16),
+                        embedding_cache_dir=None, backend='numpy')
+    return StreamingIngest(SiteCrawler(), store, batch_size=1, checkpoint_path=str(tmp_path / 'checkpoint.jsonl'),
+                           checkpoint_every=1)
+
+
+def test_ingest_resumes_twice_after_torn_checkpoint_lines(tmp_path, monkeypatch):
+    ingest = make_ingest(tmp_path, monkeypatch, crash_after=2)
+    with pytest.raises(Interrupted):
+        ingest.run()
+    with open(ingest.checkpoint_path, 'a', encoding='utf-8') as file:
+        file.write('{"urls": ["http://site/2"], "te')
+
+    ingest = make_ingest(tmp_path, monkeypatch, crash_after=2)
+    with pytest.raises(Interrupted):
+        ingest.run()
+    assert ingest.load_checkpoint()[0] == set(URLS[:4])
+    with open(ingest.checkpoint_path, 'a', encoding='utf-8') as file:
+        file.write('{"urls": ["http://site/4"], "te')
+
+    ingest = make_ingest(tmp_path, monkeypatch)
+    report = ingest.run()
+
+    assert report == {'pages': 2, 'chunks': 2, 'resumed_pages': 4}
+    assert not os.path.exists(ingest.checkpoint_path)
+    assert ingest.vector_store.document_count() == len(URLS)
+
+
+def test_batches_are_only_checkpointed_after_a_flush(tmp_path, monkeypatch):
+    ingest = make_ingest(tmp_path, monkeypatch, crash_after=5)
+    ingest.checkpoint_every = 2
+    with pytest.raises(Interrupted):
+        ingest.run()
+
+    # The fifth page was added but not flushed, it is ingested again
+    assert ingest.load_checkpoint()[0] == set(URLS[:4])
+    ingest = make_ingest(tmp_path, monkeypatch)
+    assert ingest.run()['pages'] == 2
+    assert ingest.vector_store.document_count() == len(URLS)